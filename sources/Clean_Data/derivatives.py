@@ -0,0 +1,44 @@
+# derivatives.py - Dérivées de Savitzky-Golay (position lissée, vitesse, accélération, jerk) en une passe par axe
+# Alternative à np.gradient appliqué trois fois (process_data.py --derivatives savgol) : les différences finies
+# successives amplifient le bruit au niveau du jerk, donc de LDLJ ; ici un seul polynôme local par échantillon.
+from functools import lru_cache
+import numpy as np
+from scipy.signal import savgol_coeffs, savgol_filter
+
+SAVGOL_WINDOW = 15          # Échantillons (~0.12 s à 125 Hz), impair
+SAVGOL_POLYORDER = 3        # Ordre minimal pour un jerk non nul
+
+@lru_cache(maxsize=None)
+def savgol_bank(window, polyorder):
+    # Coefficients [position dans la fenêtre, dérivée 0..3, échantillon] pour un pas de 1 (dérivée d divisée par dt**d
+    # ensuite) : la position centrale sert à l'intérieur des essais, les autres aux bords (polynôme de la 1re / dernière fenêtre)
+    return np.array([[savgol_coeffs(window, polyorder, deriv=d, pos=p, use='dot') for d in range(4)] for p in range(window)])
+
+def savgol_kinematics(v, starts, ends, dt, window=SAVGOL_WINDOW, polyorder=SAVGOL_POLYORDER, out=None):
+    # v : valeurs de tous les essais bout à bout, essai j = [starts[j], ends[j]) de pas dt[j]
+    # -> out (len(v), 4) : position lissée, vitesse, accélération, jerk (tableau fourni réutilisé s'il est donné ;
+    # lignes contiguës pour que le produit matriciel y écrive directement)
+    n = len(v); half = window // 2
+    out = np.empty((n, 4)) if out is None else out
+    bank = savgol_bank(window, polyorder)
+    lens = ends - starts; full = lens >= window
+
+    # Intérieur : fenêtres glissantes sur tout le tableau, les 4 dérivées en un produit matriciel.
+    # Les fenêtres à cheval sur deux essais ne tombent que sur des bords, réécrits juste après
+    if n >= window: np.matmul(np.lib.stride_tricks.sliding_window_view(v, window), bank[half].T, out=out[half:n - half])
+
+    # Bords des essais : polynôme ajusté sur la première / dernière fenêtre de chaque essai (mode 'interp' de savgol_filter)
+    if full.any():
+        offsets = np.arange(window)
+        for anchor, pos, first in ((starts[full], slice(0, half), 0), (ends[full] - window, slice(half + 1, window), half + 1)):
+            windows = v[anchor[:, None] + offsets]
+            out[anchor[:, None] + first + np.arange(half)] = np.einsum('kw,pdw->kpd', windows, bank[pos])
+
+    # Essais plus courts que la fenêtre : plus grande fenêtre impaire possible
+    for a, b in zip(starts[~full], ends[~full]):
+        w = (b - a) if (b - a) % 2 else (b - a - 1)
+        for d in range(4): out[a:b, d] = savgol_filter(v[a:b], w, min(polyorder, w - 1), deriv=d, mode='interp') if w >= 1 else 0.0
+
+    dts = np.repeat(np.asarray(dt, dtype=float), lens)
+    out[:, 1] /= dts; out[:, 2] /= dts ** 2; out[:, 3] /= dts ** 3
+    return out
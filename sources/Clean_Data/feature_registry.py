@@ -0,0 +1,84 @@
+# feature_registry.py - Registre des métriques : entrées déclarées, intermédiaires calculés une fois et à la demande
+# Les métriques de process_data.py y sont déclarées ; une métrique supplémentaire s'ajoute sans toucher au moteur :
+#   @REGISTRY.feature("Mon_Score", needs=("velocity",))
+#   def mon_score(ctx): return np.add.reduceat(ctx["velocity"][2], ctx["starts"]) / ctx["lens"]
+class TrialContext:
+    """Valeurs d'un lot d'essais (tableaux segmentés) : entrées et colonnes calculées au premier accès, puis gardées."""
+    def __init__(self, registry, **base):
+        self.registry = registry; self.values = dict(base)
+
+    def __getitem__(self, name):
+        if name not in self.values: self.registry._compute(self, name)
+        return self.values[name]
+
+    def __contains__(self, name):
+        return name in self.values
+
+class FeatureRegistry:
+    """Entrées (intermédiaires partagés) et métriques déclarées avec leurs dépendances.
+
+    - input(nom, needs)                  : intermédiaire (XY filtrés, cinématique, rayon, spectre...) -> valeur quelconque
+    - feature(colonnes, needs, level)    : une ou plusieurs colonnes ; level="trial" (un tableau par colonne, un élément
+                                           par essai) ou "participant" (fonction du DataFrame des essais -> table
+                                           une ligne par ID / Task_Type, ex. Be)
+    needs peut citer des entrées ou des colonnes d'autres métriques (IPe dépend de IDe).
+    """
+    def __init__(self):
+        self.inputs = {}; self.features = {}; self._by_column = {}; self.order = []
+
+    def input(self, name, needs=()):
+        def register(func):
+            self.inputs[name] = (tuple(needs), func); return func
+        return register
+
+    def feature(self, columns, needs=(), level="trial"):
+        columns = (columns,) if isinstance(columns, str) else tuple(columns)
+        def register(func):
+            spec = {"columns": columns, "needs": tuple(needs), "level": level, "func": func}
+            self.features[func.__name__] = spec
+            for c in columns: self._by_column[c] = spec; self.order.append(c)
+            return func
+        return register
+
+    def columns(self, level=None):
+        return [c for c in self.order if level is None or self._by_column[c]["level"] == level]
+
+    def resolve(self, requested=None):
+        # Colonnes demandées -> (colonnes par essai à produire, colonnes par participant), dépendances de ces dernières
+        # comprises (Be demande IDe et Duration). Colonne inconnue -> ValueError
+        requested = self.columns() if requested is None else list(requested)
+        unknown = [c for c in requested if c not in self._by_column]
+        if unknown: raise ValueError(f"Métrique(s) inconnue(s) : {', '.join(unknown)} (disponibles : {', '.join(self.order)})")
+        trial, participant, stack = set(), set(), list(requested)
+        while stack:
+            c = stack.pop(); spec = self._by_column[c]
+            target = trial if spec["level"] == "trial" else participant
+            if c in target: continue
+            target.add(c)
+            if spec["level"] == "participant": stack.extend(n for n in spec["needs"] if n in self._by_column)
+        return [c for c in self.order if c in trial], [c for c in self.order if c in participant]
+
+    def function_of(self, column):
+        # Fonction qui produit une colonne (métriques par participant : appelée sur le DataFrame de tous les essais)
+        return self._by_column[column]["func"]
+
+    def evaluate(self, ctx, columns):
+        # {colonne: tableau} pour les colonnes par essai demandées ; seuls leurs intermédiaires sont calculés
+        return {c: ctx[c] for c in columns}
+
+    def describe(self):
+        # Une ligne par métrique : colonnes, niveau, dépendances
+        return [f"{', '.join(s['columns']):<32} {s['level']:<12} <- {', '.join(s['needs']) or '-'}" for s in self.features.values()]
+
+    def _compute(self, ctx, name):
+        if name in self.inputs:
+            needs, func = self.inputs[name]
+            for n in needs: ctx[n]
+            ctx.values[name] = func(ctx)
+        elif name in self._by_column and self._by_column[name]["level"] == "trial":
+            spec = self._by_column[name]
+            for n in spec["needs"]: ctx[n]
+            out = spec["func"](ctx)
+            if len(spec["columns"]) == 1: out = (out,)
+            for c, v in zip(spec["columns"], out): ctx.values[c] = v
+        else: raise KeyError(f"Entrée ou métrique inconnue : {name}")
@@ -0,0 +1,54 @@
+# fitts_regression.py - Régression de Fitts (MT = A + Be * IDe) de tous les groupes (participant x tâche) en une passe
+# Sommes par groupe (np.bincount) au lieu d'un linregress par masque ; intervalles de confiance de Be par bootstrap,
+# rééchantillonnages traités par matrices (tirages x essais) et par tranches pour borner la mémoire.
+import zlib
+import warnings
+import numpy as np
+
+BOOTSTRAP_SAMPLES = 1000     # Rééchantillonnages par groupe (0 = pas d'intervalle de confiance)
+BOOTSTRAP_CI = 95            # Intervalle percentile (%)
+BOOTSTRAP_SEED = 0
+BOOTSTRAP_CHUNK_CELLS = 4_000_000   # Taille max d'une matrice de rééchantillonnage (tirages x essais)
+
+def grouped_linregress(codes, x, y, n_groups=None):
+    # codes : groupe de chaque essai (0..G-1) -> dict de tableaux (G,) : n, slope, intercept, r2, x_var (somme des carrés
+    # centrés de x). Même pente / ordonnée que scipy.stats.linregress (moindres carrés, sommes centrées en deux passes)
+    n_groups = int(codes.max()) + 1 if n_groups is None else n_groups
+    n = np.bincount(codes, minlength=n_groups).astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mx = np.bincount(codes, x, n_groups) / n; my = np.bincount(codes, y, n_groups) / n
+        dx = x - mx[codes]; dy = y - my[codes]
+        sxx = np.bincount(codes, dx * dx, n_groups); syy = np.bincount(codes, dy * dy, n_groups); sxy = np.bincount(codes, dx * dy, n_groups)
+        slope = sxy / sxx
+        r2 = np.where((sxx > 0) & (syy > 0), sxy ** 2 / (sxx * syy), np.nan)
+    return {"n": n, "slope": slope, "intercept": my - slope * mx, "r2": r2, "x_var": sxx}
+
+def bootstrap_slopes(codes, x, y, names, samples=BOOTSTRAP_SAMPLES, ci=BOOTSTRAP_CI, seed=BOOTSTRAP_SEED):
+    # IC percentile de la pente de chaque groupe. Tirages propres à chaque groupe (graine = seed + nom du groupe) :
+    # l'intervalle d'un participant ne change pas quand d'autres participants sont ajoutés. -> (bas, haut) (G,)
+    n_groups = len(names)
+    low = np.full(n_groups, np.nan); high = np.full(n_groups, np.nan)
+    if samples <= 0 or len(codes) == 0: return low, high
+    order = np.argsort(codes, kind='stable'); codes = codes[order]; x = np.asarray(x, float)[order]; y = np.asarray(y, float)[order]
+    counts = np.bincount(codes, minlength=n_groups); starts = np.cumsum(counts) - counts
+    groups = [g for g in range(n_groups) if counts[g] > 2]
+    if not groups: return low, high
+    rngs = {g: np.random.default_rng([seed, zlib.crc32(str(names[g]).encode())]) for g in groups}
+    lens = counts[groups]; seg_starts = np.cumsum(lens) - lens; rep = np.repeat(np.arange(len(groups)), lens)
+    slopes = np.empty((samples, len(groups)))
+    chunk = max(1, BOOTSTRAP_CHUNK_CELLS // int(lens.sum()))
+    for b0 in range(0, samples, chunk):
+        b1 = min(samples, b0 + chunk)
+        # Matrice (tirages, essais) d'indices tirés avec remise à l'intérieur de chaque groupe
+        idx = np.concatenate([starts[g] + rngs[g].integers(0, counts[g], size=(b1 - b0, counts[g])) for g in groups], axis=1)
+        xb = x[idx]; yb = y[idx]
+        mx = np.add.reduceat(xb, seg_starts, axis=1) / lens; my = np.add.reduceat(yb, seg_starts, axis=1) / lens
+        dx = xb - mx[:, rep]; dy = yb - my[:, rep]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slopes[b0:b1] = np.add.reduceat(dx * dy, seg_starts, axis=1) / np.add.reduceat(dx * dx, seg_starts, axis=1)
+    slopes[~np.isfinite(slopes)] = np.nan      # Rééchantillonnage sans variabilité de IDe
+    alpha = (100 - ci) / 2
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)     # Groupe sans aucune pente valide -> NaN
+        low[groups], high[groups] = np.nanpercentile(slopes, [alpha, 100 - alpha], axis=0)
+    return low, high
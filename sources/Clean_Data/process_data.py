@@ -1,10 +1,17 @@
 # process_data.py - VERSION FINALE (Ancienneté + IPe + IDe + Coefficient Be)
 import os
+import sys
+import re
+import json
+import hashlib
+import argparse
+from functools import partial, lru_cache
+from concurrent.futures import ProcessPoolExecutor
 import glob
+import shutil
 import pandas as pd
 import numpy as np
-from scipy.signal import butter, filtfilt
-from scipy import stats # Nécessaire pour la régression linéaire (Be)
+from scipy.signal import butter, sosfiltfilt
 
 # --- CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -12,24 +19,173 @@ RAW_PATH = os.path.join(BASE_DIR, "data", "raw")
 CLEAN_PATH = os.path.join(BASE_DIR, "data", "clean")
 META_PATH = os.path.join(BASE_DIR, "data", "metadata.csv")
 OUTPUT_PATH = os.path.join(BASE_DIR, "data", "features")
+CACHE_PATH = os.path.join(OUTPUT_PATH, "cache")
+MANIFEST_FILE = os.path.join(OUTPUT_PATH, "manifest.json")
+SUBJECTS_FILE = os.path.join(OUTPUT_PATH, "dataset_subjects.csv")   # Paramètres de Fitts par participant et tâche
 
-for p in [CLEAN_PATH, OUTPUT_PATH]:
+for p in [CLEAN_PATH, OUTPUT_PATH, CACHE_PATH]:
     if not os.path.exists(p): os.makedirs(p)
 
+# Géométrie du tunnel partagée avec l'acquisition
+sys.path.append(os.path.join(BASE_DIR, "sources", "Passation_Test"))
+from tunnel_geometry import TunnelGeometry
+from online_features import FEATURE_COLUMNS, FEATURE_VERSION
+from spectral import spectral_features, SpectrumCache, SPECTRAL_METHODS
+from columnar_store import ColumnStore, read_frame, iter_frames
+from compact_schema import compact_frame, frame_memory, memory_report, TRAJECTORY_SCHEMA, FEATURES_SCHEMA
+import tunnel_geometry, online_features, columnar_store, spectral, compact_schema
+from resampling import resample_trials, RESAMPLE_METHODS
+from feature_registry import FeatureRegistry, TrialContext
+from derivatives import savgol_kinematics
+from fitts_regression import grouped_linregress, bootstrap_slopes, BOOTSTRAP_SAMPLES
+import resampling, feature_registry, derivatives, fitts_regression
+
+# Filtre passe-bas appliqué aux RAW (X, Y, P_Raw)
+FILTER_CUTOFF_HZ = 10
+FILTER_ORDER = 2
+FS_RESOLUTION_HZ = 1.0     # fs de chaque essai arrondie au Hz : un jeu de coefficients par cadence effective
+
 TUNNEL_LEVELS_REF = [
     {"R": 250, "W": 100}, {"R": 400, "W": 100},
     {"R": 250, "W": 50},  {"R": 400, "W": 50},
     {"R": 400, "W": 30}
 ]
 
-def butter_lowpass_filter(data, cutoff, fs, order=2):
-    if len(data) < 15: return data 
-    nyq = 0.5 * fs
-    normal_cutoff = cutoff / nyq
-    b, a = butter(order, normal_cutoff, btype='low', analog=False)
-    return filtfilt(b, a, data)
+# Seuils de timing d'acquisition ({ID}_TIMING.csv) au-delà desquels un essai est marqué "dégradé"
+TIMING_MAX_TICK_P95_FACTOR = 2.0   # Tick p95 > 2 x période nominale
+TIMING_MAX_MISSED_PCT = 5.0        # Plus de 5 % de ticks manqués
+TIMING_MAX_LATENCY_P95_MS = 20.0   # Latence événement -> échantillon p95 > 20 ms
+
+def find_raw_files(raw_dir):
+    # Un RAW par participant : table colonne {ID}_RAW.cols de préférence, sinon {ID}_RAW.csv (ancien format / export)
+    raw = {}
+    for path in sorted(glob.glob(os.path.join(raw_dir, "*_RAW.csv")) + glob.glob(os.path.join(raw_dir, "*_RAW.cols"))):
+        stem = re.sub(r"_RAW\.(csv|cols)$", "", path)
+        if stem not in raw or path.endswith(".cols"): raw[stem] = path
+    return [raw[k] for k in sorted(raw)]
+
+def sidecar(raw_file, suffix):
+    # Fichier écrit à côté du RAW pendant l'acquisition (ex. "_TIMING.csv")
+    return re.sub(r"_RAW\.(csv|cols)$", suffix, raw_file)
+
+# --- TRAITEMENT INCRÉMENTAL (manifest.json) ---
+SIDECAR_SUFFIXES = ["_TIMING.csv", "_TUNNEL.jsonl", "_FEATURES.csv"]
+
+def file_hash(path, h=None):
+    # Empreinte du contenu (dossier .cols : tous ses fichiers, dans l'ordre des noms)
+    h = h or hashlib.blake2b(digest_size=16)
+    paths = [os.path.join(path, n) for n in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+    for p in paths:
+        h.update(os.path.basename(p).encode())
+        with open(p, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""): h.update(chunk)
+    return h.hexdigest()
+
+def raw_content_hash(raw_file):
+    # RAW + fichiers écrits à côté pendant l'acquisition (timing, géométrie, métriques en ligne)
+    h = hashlib.blake2b(digest_size=16); file_hash(raw_file, h)
+    for suffix in SIDECAR_SUFFIXES:
+        side = sidecar(raw_file, suffix)
+        if os.path.exists(side): file_hash(side, h)
+    return h.hexdigest()
+
+def params_hash(online_columns, engine="batch", resample_hz=0, resample_method="linear", spectral_method="periodogram", columns=None,
+                derivative_method="gradient", compact=False):
+    # Paramètres de traitement + code qui calcule les métriques : toute modification invalide le cache
+    # (columns : métriques par essai seulement, celles par participant sont recalculées à chaque passage)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps({"cutoff": FILTER_CUTOFF_HZ, "order": FILTER_ORDER, "feature_version": FEATURE_VERSION, "online_columns": online_columns, "engine": engine,
+                         "resample": [resample_hz, resample_method] if resample_hz else None, "spectral": spectral_method,
+                         "columns": columns, "derivatives": derivative_method, "compact": compact,
+                         "timing": [TIMING_MAX_TICK_P95_FACTOR, TIMING_MAX_MISSED_PCT, TIMING_MAX_LATENCY_P95_MS]}).encode())
+    for path in (__file__, tunnel_geometry.__file__, online_features.__file__, columnar_store.__file__, spectral.__file__,
+                 resampling.__file__, feature_registry.__file__, derivatives.__file__, compact_schema.__file__): file_hash(path, h)
+    return h.hexdigest()
+
+def subjects_hash(params, columns, bootstrap):
+    # Lignes d'un participant dans dataset_subjects.csv : paramètres des métriques par essai + métriques par participant,
+    # --bootstrap et code de la régression (IC tirés par groupe : recalculer les autres participants ne les change pas)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps({"params": params, "columns": columns, "bootstrap": bootstrap}).encode())
+    file_hash(fitts_regression.__file__, h)
+    return h.hexdigest()
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_FILE): return {}
+    try:
+        with open(MANIFEST_FILE) as fh: return json.load(fh)
+    except ValueError: return {}
+
+def cache_file(raw_file, suffix=".pkl"):
+    # Cache du participant : métriques (.pkl) ou spectres par essai (_SPECTRAL.pkl)
+    return os.path.join(CACHE_PATH, re.sub(r"_RAW\.(csv|cols)$", suffix, os.path.basename(raw_file)))
+
+def load_timing_flags(raw_file):
+    # {(Bloc, Trial_in_Bloc): 0/1} à partir du fichier TIMING écrit à côté du RAW (absent = pas d'information)
+    timing_file = sidecar(raw_file, "_TIMING.csv")
+    if not os.path.exists(timing_file): return {}
+    tm = pd.read_csv(timing_file)
+    degraded = (tm['Tick_P95_ms'] > TIMING_MAX_TICK_P95_FACTOR * tm['Tick_Nominal_ms']) | \
+               (tm['Missed_Ticks'] > TIMING_MAX_MISSED_PCT / 100 * tm['Ticks'].clip(lower=1)) | \
+               (tm['Lat_P95_ms'].fillna(0) > TIMING_MAX_LATENCY_P95_MS)
+    return {(str(b), int(t)): int(d) for b, t, d in zip(tm['Bloc'], tm['Trial_in_Bloc'], degraded)}
+
+def load_tunnel_geometries(raw_file):
+    # {(Bloc, Trial_in_Bloc): TunnelGeometry} à partir du {ID}_TUNNEL.jsonl écrit à l'acquisition (absent = ancien format)
+    tunnel_file = sidecar(raw_file, "_TUNNEL.jsonl")
+    if not os.path.exists(tunnel_file): return {}
+    geometries, cache = {}, {}
+    with open(tunnel_file) as fh:
+        for line in fh:
+            if not line.strip(): continue
+            rec = json.loads(line); spec_key = json.dumps(rec["Geometry"], sort_keys=True)
+            if spec_key not in cache: cache[spec_key] = TunnelGeometry.from_dict(rec["Geometry"])
+            geometries[(str(rec["Bloc"]), int(rec["Trial_in_Bloc"]))] = cache[spec_key]
+    return geometries
+
+def load_online_features(raw_file):
+    # {(Bloc, Trial_in_Bloc): {métrique: valeur}} calculés pendant l'acquisition ({ID}_FEATURES.csv, version courante).
+    # Définitions causales (voir online_features) : valeurs indicatives, jamais substituées aux métriques différées
+    features_file = sidecar(raw_file, "_FEATURES.csv")
+    if not os.path.exists(features_file): return {}
+    ft = pd.read_csv(features_file)
+    ft = ft[ft['Feature_Version'] == FEATURE_VERSION]
+    return {(str(r['Bloc']), int(r['Trial_in_Bloc'])): {c: r[c] for c in FEATURE_COLUMNS} for _, r in ft.iterrows()}
+
+@lru_cache(maxsize=None)
+def lowpass_sos(cutoff, fs, order=2):
+    # Sections d'ordre 2 calculées une fois par (coupure, cadence, ordre)
+    return butter(order, cutoff, btype='low', fs=fs, output='sos')
 
-def get_kinematics(x, y, dt):
+def trial_bounds(df):
+    # Essais = suites contiguës de lignes : changement de Bloc / Trial_in_Bloc ou retour en arrière de Time_Rel
+    n = len(df); change = np.zeros(n, dtype=bool); change[:1] = True
+    for k in ('Bloc', 'Trial_in_Bloc'):
+        if k in df.columns: v = df[k].to_numpy(); change[1:] |= v[1:] != v[:-1]
+    if 'Time_Rel' in df.columns: change[1:] |= np.diff(df['Time_Rel'].to_numpy(dtype=float)) < -0.5
+    starts = np.flatnonzero(change)
+    return starts, np.append(starts[1:], n)
+
+def filter_trials(df, columns, cutoff=FILTER_CUTOFF_HZ, order=FILTER_ORDER):
+    # Passe-bas sans déphasage (sosfiltfilt) essai par essai : rien ne déborde d'un essai sur l'autre ni sur les pauses,
+    # fs mesurée à l'intérieur de l'essai. Un appel par essai, toutes les colonnes ensemble -> {colonne: tableau}
+    starts, ends = trial_bounds(df)
+    t = df['Time_Abs'].to_numpy(dtype=float)
+    data = np.vstack([df[c].to_numpy(dtype=float) for c in columns])
+    out = data.copy()
+    for a, b in zip(starts, ends):
+        if b - a < 15: continue     # Trop court pour le remplissage aux bords : laissé brut
+        dt = (t[b - 1] - t[a]) / (b - a - 1)
+        fs = round(1 / dt / FS_RESOLUTION_HZ) * FS_RESOLUTION_HZ if dt > 0 else 120.0
+        if fs <= 2 * cutoff: continue
+        out[:, a:b] = sosfiltfilt(lowpass_sos(cutoff, fs, order), data[:, a:b], axis=-1)
+    return dict(zip(columns, out))
+
+def get_kinematics(x, y, dt, method="gradient"):
+    if method == "savgol":
+        # Savitzky-Golay : les trois dérivées d'un même polynôme local, une passe par axe
+        n = len(x); kx = savgol_kinematics(x, np.array([0]), np.array([n]), [dt]); ky = savgol_kinematics(y, np.array([0]), np.array([n]), [dt])
+        return np.hypot(kx[:, 1], ky[:, 1]), np.hypot(kx[:, 2], ky[:, 2]), np.hypot(kx[:, 3], ky[:, 3])
     vx = np.gradient(x, dt); vy = np.gradient(y, dt)
     ax = np.gradient(vx, dt); ay = np.gradient(vy, dt)
     jx = np.gradient(ax, dt); jy = np.gradient(ay, dt)
@@ -38,30 +194,42 @@ def get_kinematics(x, y, dt):
     jerk = np.sqrt(jx**2 + jy**2)
     return velocity, acceleration, jerk
 
-def calculate_f95(data, fs):
-    n = len(data)
-    if n < 2: return 0
-    fft_vals = np.fft.fft(data)
-    psd = np.abs(fft_vals)**2
-    freqs = np.fft.fftfreq(n, d=1/fs)
-    pos_mask = freqs > 0
-    freqs = freqs[pos_mask]
-    psd = psd[pos_mask]
-    if len(psd) == 0: return 0
-    cum_power = np.cumsum(psd)
-    total_power = cum_power[-1]
-    idx_95 = np.searchsorted(cum_power, 0.95 * total_power)
-    return freqs[idx_95] if idx_95 < len(freqs) else freqs[-1]
-
-def process_single_trial(df_trial, metadata, pid):
+def subject_info(metadata, pid):
+    # (Group, Experience_Years) du participant dans metadata.csv
+    try:
+        subject_row = metadata[metadata['ID'].str.upper() == pid.upper()]
+        group = subject_row.iloc[0]['Group'] if not subject_row.empty else "Unknown"
+        experience = subject_row.iloc[0]['Experience_Years'] if not subject_row.empty and 'Experience_Years' in subject_row.columns else np.nan
+    except: group = "Unknown"; experience = np.nan
+    return group, experience
+
+IDENTITY_COLUMNS = ['ID', 'Group', 'Experience_Years', 'Condition', 'Task_Type', 'Trial']
+
+def trial_identity(condition, trial, metadata, pid, group_info=None):
+    # Colonnes d'identification communes au calcul différé, au moteur vectorisé et aux métriques de l'acquisition
+    group, experience = group_info if group_info is not None else subject_info(metadata, pid)
+
+    # Simplification de la condition pour regrouper VP_FB et VP_NoFB sous "VP" lors du calcul du Be
+    task_type = 'FVP' if condition.startswith('FVP') else 'VP'
+
+    return {
+        'ID': pid, 'Group': group, 'Experience_Years': experience,
+        'Condition': condition,
+        'Task_Type': task_type,
+        'Trial': trial,
+    }
+
+def process_single_trial(df_trial, metadata, pid, geometry=None, spectral_method="periodogram", spectral_cache=None,
+                         derivative_method="gradient", unfiltered=None):
+    # unfiltered : X / Y de l'essai avant le passe-bas (bande du tremblement) ; None -> positions filtrées de df_trial
     time = df_trial['Time_Abs'].values
     if len(time) < 5: return None
     dt = np.mean(np.diff(time))
     fs = 1 / dt if dt > 0 else 120.0
 
-    x_clean = df_trial['X'].values
-    y_clean = df_trial['Y'].values
-    p_clean = df_trial['P_Raw'].values if 'P_Raw' in df_trial.columns else np.zeros(len(time))
+    x_clean = df_trial['X'].to_numpy(dtype=float)     # float64 même si le CLEAN est gardé en float32 (--compact)
+    y_clean = df_trial['Y'].to_numpy(dtype=float)
+    p_clean = df_trial['P_Raw'].to_numpy(dtype=float) if 'P_Raw' in df_trial.columns else np.zeros(len(time))
 
     if 'R' in df_trial.columns:
         R_target = df_trial['R'].iloc[0]; W_target = df_trial['W'].iloc[0]
@@ -74,7 +242,7 @@ def process_single_trial(df_trial, metadata, pid):
     
     thickness = df_trial['Thickness'].mean() if 'Thickness' in df_trial.columns else 4.0
 
-    vel, acc, jerk = get_kinematics(x_clean, y_clean, dt)
+    vel, acc, jerk = get_kinematics(x_clean, y_clean, dt, derivative_method)
     
     duration = df_trial['Time_Rel'].max() - df_trial['Time_Rel'].min() # C'est le MT/lap
     path_length = np.sum(np.sqrt(np.diff(x_clean)**2 + np.diff(y_clean)**2))
@@ -91,38 +259,41 @@ def process_single_trial(df_trial, metadata, pid):
     cx = (df_trial['X'].max() + df_trial['X'].min()) / 2
     cy = (df_trial['Y'].max() + df_trial['Y'].min()) / 2
     radial_pos = np.sqrt((x_clean - cx)**2 + (y_clean - cy)**2)
-    f95 = calculate_f95(radial_pos, fs)
+    f95 = spectral_features(radial_pos, [0], [len(radial_pos)], fs, spectral_method, spectral_cache)[0, 0]
+    # Tremblement (8-12 Hz) : rayon non filtré, même centre (le passe-bas à FILTER_CUTOFF_HZ atténue la bande)
+    if unfiltered is not None:
+        radial_pos = np.hypot(unfiltered['X'].to_numpy(dtype=float) - cx, unfiltered['Y'].to_numpy(dtype=float) - cy)
+    tremor_power, tremor_pct = spectral_features(radial_pos, [0], [len(radial_pos)], fs, spectral_method, spectral_cache)[0, 1:]
 
     # --- 4. CALCULS ISO 9241-9 (Fitts) ---
     Ri = np.sqrt((x_clean - cx)**2 + (y_clean - cy)**2)
-    Re = np.mean(Ri)
-    sigma_R = np.std(Ri)
-    Te = 4.133 * sigma_R
-    
-    # IDe (Effective Index of Difficulty)
-    IDe = np.log2((2 * np.pi * Re) / Te) if Te > 0 else 0
+    if geometry is not None and geometry.kind != "circle":
+        # Chemin quelconque : dispersion du décalage latéral signé autour de la ligne centrale, longueur du chemin
+        dist_c, _, half_w, offset = geometry.project(x_clean, y_clean)
+        sigma_R = np.std(offset)
+        Te = 4.133 * sigma_R
+        IDe = np.log2(geometry.length / Te) if Te > 0 else 0
+    else:
+        Re = np.mean(Ri)
+        sigma_R = np.std(Ri)
+        Te = 4.133 * sigma_R
+        # IDe (Effective Index of Difficulty)
+        IDe = np.log2((2 * np.pi * Re) / Te) if Te > 0 else 0
     # IPe (Effective Information Processing Rate - Remplacement de Throughput_ISO)
     IPe = IDe / duration if duration > 0 else 0
     
-    error_radial = np.abs(Ri - R_target)
-    is_out = (error_radial + thickness/2) > (W_target / 2)
+    if geometry is not None:
+        # Géométrie enregistrée : distance exacte à la ligne centrale et largeur locale W(s)
+        if geometry.kind == "circle": dist_c, _, half_w, _ = geometry.project(x_clean, y_clean)
+        is_out = (dist_c + thickness/2) > half_w
+    else:
+        error_radial = np.abs(Ri - R_target)
+        is_out = (error_radial + thickness/2) > (W_target / 2)
     error_rate = np.mean(is_out) * 100
 
-    try:
-        subject_row = metadata[metadata['ID'].str.upper() == pid.upper()]
-        group = subject_row.iloc[0]['Group'] if not subject_row.empty else "Unknown"
-        experience = subject_row.iloc[0]['Experience_Years'] if not subject_row.empty and 'Experience_Years' in subject_row.columns else np.nan
-    except: group = "Unknown"; experience = np.nan
-
-    condition = str(df_trial['Bloc'].iloc[0]) if 'Bloc' in df_trial.columns else "VP"
-    # Simplification de la condition pour regrouper VP_FB et VP_NoFB sous "VP" lors du calcul du Be
-    task_type = 'FVP' if condition.startswith('FVP') else 'VP'
-
     return {
-        'ID': pid, 'Group': group, 'Experience_Years': experience,
-        'Condition': condition,
-        'Task_Type': task_type,
-        'Trial': df_trial['Trial_in_Bloc'].iloc[0] if 'Trial_in_Bloc' in df_trial.columns else 0,
+        **trial_identity(str(df_trial['Bloc'].iloc[0]) if 'Bloc' in df_trial.columns else "VP",
+                         df_trial['Trial_in_Bloc'].iloc[0] if 'Trial_in_Bloc' in df_trial.columns else 0, metadata, pid),
         
         # --- NOUVELLES MÉTRIQUES EXACTES ---
         'IDe': IDe,             # G. Effective index of difficulty (bit/lap)
@@ -135,83 +306,515 @@ def process_single_trial(df_trial, metadata, pid):
         'F95': f95,
         'Error_Rate': error_rate,
         'Te': Te,
+        'IDc': geometry.index_of_difficulty if geometry is not None else np.nan,
         'Path_Length': path_length,
         'Mean_Velocity': np.mean(vel),
-        'Force_SD': np.std(p_clean)
+        'Force_SD': np.std(p_clean),
+        'Tremor_Power': tremor_power,   # Puissance 8-12 Hz (tremblement physiologique, px²)
+        'Tremor_Pct': tremor_pct        # Part de la puissance totale dans cette bande (%)
     }
 
-if __name__ == "__main__":
-    print("--- TRAITEMENT, SAUVEGARDE CLEAN ET CALCUL DES MÉTRIQUES (FITTS) ---")
-    try:
-        meta_df = pd.read_csv(META_PATH, sep=None, engine='python', encoding='utf-8-sig')
-        meta_df.columns = meta_df.columns.str.strip()
-        meta_df['ID'] = meta_df['ID'].astype(str).str.strip().str.upper()
-    except: meta_df = pd.DataFrame(columns=['ID', 'Group'])
+# --- MOTEUR VECTORISÉ : TOUS LES ESSAIS D'UN PARTICIPANT EN UNE PASSE ---
+def segment_gradient(v, dt_samples, starts, ends, dt):
+    # np.gradient(v, dt) appliqué indépendamment à chaque essai (différences centrées, ordre 1 aux bords)
+    out = np.empty_like(v)
+    out[1:-1] = (v[2:] - v[:-2]) / (2. * dt_samples[1:-1])
+    out[starts] = (v[starts + 1] - v[starts]) / dt
+    out[ends - 1] = (v[ends - 1] - v[ends - 2]) / dt
+    return out
 
-    raw_files = glob.glob(os.path.join(RAW_PATH, "*_RAW.csv"))
-    all_features = []
+def segment_std(v, seg, starts, lens):
+    # np.std (population) par essai, même calcul en deux passes
+    mean = np.add.reduceat(v, starts) / lens
+    return np.sqrt(np.add.reduceat((v - mean[seg]) ** 2, starts) / lens), mean
 
-    for f in raw_files:
+# --- REGISTRE DES MÉTRIQUES (moteur vectorisé) ---
+# Chaque entrée / métrique déclare ce qu'elle lit ; un passage ne calcule que ce que demandent les colonnes voulues.
+# Tableaux segmentés : valeurs de tous les essais bout à bout, essai j = [starts[j], ends[j]), seg = essai de chaque ligne
+REGISTRY = FeatureRegistry()
+
+@REGISTRY.input("t")
+def _time(ctx): return ctx["col"]('Time_Abs')
+
+@REGISTRY.input("xy")
+def _xy(ctx): return ctx["col"]('X'), ctx["col"]('Y')
+
+@REGISTRY.input("inner", needs=("t",))
+def _inner(ctx):
+    # Différences internes à un essai
+    inner = np.ones(len(ctx["t"]) - 1, dtype=bool); inner[ctx["ends"][:-1] - 1] = False
+    return inner
+
+@REGISTRY.input("dt", needs=("t", "inner"))
+def _dt(ctx): return np.add.reduceat(np.where(ctx["inner"], np.diff(ctx["t"]), 0.0), ctx["starts"]) / (ctx["lens"] - 1)
+
+@REGISTRY.input("fs", needs=("dt",))
+def _fs(ctx):
+    dt = ctx["dt"]
+    return np.where(dt > 0, 1 / np.where(dt > 0, dt, 1), 120.0)
+
+@REGISTRY.input("savgol", needs=("xy", "dt"))
+def _savgol(ctx):
+    # (position lissée, vitesse, accélération, jerk) par axe, écrits dans un seul tableau (2, n, 4)
+    (x, y), out = ctx["xy"], np.empty((2, len(ctx["seg"]), 4))
+    for axis, v in enumerate((x, y)): savgol_kinematics(v, ctx["starts"], ctx["ends"], ctx["dt"], out=out[axis])
+    return out
+
+@REGISTRY.input("velocity", needs=("xy", "dt"))
+def _velocity(ctx):
+    if ctx["derivative_method"] == "savgol":
+        k = ctx["savgol"]; return k[0, :, 1], k[1, :, 1], np.hypot(k[0, :, 1], k[1, :, 1])
+    (x, y), dt, starts, ends = ctx["xy"], ctx["dt"], ctx["starts"], ctx["ends"]; dts = dt[ctx["seg"]]
+    vx = segment_gradient(x, dts, starts, ends, dt); vy = segment_gradient(y, dts, starts, ends, dt)
+    return vx, vy, np.sqrt(vx**2 + vy**2)
+
+@REGISTRY.input("jerk", needs=("velocity", "dt"))
+def _jerk(ctx):
+    if ctx["derivative_method"] == "savgol":
+        k = ctx["savgol"]; return np.hypot(k[0, :, 3], k[1, :, 3])
+    (vx, vy, _), dt, starts, ends = ctx["velocity"], ctx["dt"], ctx["starts"], ctx["ends"]; dts = dt[ctx["seg"]]
+    ax = segment_gradient(vx, dts, starts, ends, dt); ay = segment_gradient(vy, dts, starts, ends, dt)
+    jx = segment_gradient(ax, dts, starts, ends, dt); jy = segment_gradient(ay, dts, starts, ends, dt)
+    return np.sqrt(jx**2 + jy**2)
+
+@REGISTRY.input("center", needs=("xy",))
+def _center(ctx):
+    # Centre de la boîte englobante (positions filtrées) de chaque essai
+    (x, y), starts = ctx["xy"], ctx["starts"]
+    return (np.maximum.reduceat(x, starts) + np.minimum.reduceat(x, starts)) / 2, (np.maximum.reduceat(y, starts) + np.minimum.reduceat(y, starts)) / 2
+
+@REGISTRY.input("radius", needs=("xy", "center"))
+def _radius(ctx):
+    # Rayon autour du centre de la boîte englobante de chaque essai
+    (x, y), (cx, cy), seg = ctx["xy"], ctx["center"], ctx["seg"]
+    return np.sqrt((x - cx[seg])**2 + (y - cy[seg])**2)
+
+@REGISTRY.input("radius_unfiltered", needs=("center",))
+def _radius_unfiltered(ctx):
+    # Même rayon sur les positions avant le passe-bas (rééchantillonnées seulement) : bande du tremblement intacte
+    (cx, cy), seg = ctx["center"], ctx["seg"]
+    return np.sqrt((ctx["unfiltered"]('X') - cx[seg])**2 + (ctx["unfiltered"]('Y') - cy[seg])**2)
+
+@REGISTRY.input("targets")
+def _targets(ctx):
+    # Cibles R / W (anciens fichiers sans colonnes R, W : niveau IDc_Lvl) et épaisseur moyenne du trait
+    df_clean, col, starts, lens, n = ctx["df"], ctx["col"], ctx["starts"], ctx["lens"], len(ctx["starts"])
+    if 'R' in df_clean.columns:
+        R_target = col('R')[starts]; W_target = col('W')[starts]
+    else:
         try:
-            df = pd.read_csv(f)
-            pid = str(df['ID'].iloc[0]).strip().upper()
-            
-            # --- ÉTAPE A : FILTRAGE ---
-            time_arr = df['Time_Abs'].values
-            fs = 120.0
-            if len(time_arr) > 2:
-                dt = np.mean(np.diff(time_arr))
-                if dt > 0: fs = 1/dt
-                
-            df_clean = df.copy()
-            df_clean['X'] = butter_lowpass_filter(df['X'].values, 10, fs)
-            df_clean['Y'] = butter_lowpass_filter(df['Y'].values, 10, fs)
-            if 'P_Raw' in df.columns:
-                df_clean['P_Raw'] = butter_lowpass_filter(df['P_Raw'].values, 10, fs)
-            
-            clean_file_path = os.path.join(CLEAN_PATH, f"{pid}_CLEAN.csv")
-            df_clean.to_csv(clean_file_path, index=False)
-            
+            lvl = np.clip(col('IDc_Lvl')[starts].astype(int) - 1, 0, 4)
+            R_target = np.array([TUNNEL_LEVELS_REF[i]["R"] for i in lvl], dtype=float); W_target = np.array([TUNNEL_LEVELS_REF[i]["W"] for i in lvl], dtype=float)
+        except: R_target = np.full(n, 250.0); W_target = np.full(n, 100.0)
+    thickness = np.add.reduceat(col('Thickness'), starts) / lens if 'Thickness' in df_clean.columns else np.full(n, 4.0)
+    return R_target, W_target, thickness
+
+@REGISTRY.input("projection", needs=("xy",))
+def _projection(ctx):
+    # Géométrie enregistrée : projection groupée par géométrie (tous les essais qui la partagent en un appel)
+    # -> [(géométrie, essais, lignes, distance à la ligne centrale, demi-largeur, décalage signé)]
+    (x, y), starts, ends = ctx["xy"], ctx["starts"], ctx["ends"]
+    by_geo = {}
+    for j, key in enumerate(ctx["keys"]):
+        geo = ctx["geometries"].get(key)
+        if geo is not None: by_geo.setdefault(id(geo), (geo, []))[1].append(j)
+    out = []
+    for geo, js in by_geo.values():
+        rows = np.concatenate([np.arange(starts[j], ends[j]) for j in js])
+        dist_c, _, half_w, offset = geo.project(x[rows], y[rows])
+        out.append((geo, js, rows, dist_c, half_w, offset))
+    return out
+
+@REGISTRY.input("spread", needs=("radius", "projection"))
+def _spread(ctx):
+    # Dispersion latérale et longueur de référence : cercle (rayon moyen) ou chemin quelconque (décalage signé)
+    sigma_R, Re = segment_std(ctx["radius"], ctx["seg"], ctx["starts"], ctx["lens"])
+    ref = 2 * np.pi * Re
+    for geo, js, rows, _, _, offset in ctx["projection"]:
+        if geo.kind == "circle": continue
+        sub_lens = ctx["lens"][js]; sub_starts = np.cumsum(sub_lens) - sub_lens
+        sigma_R[js], _ = segment_std(offset, np.repeat(np.arange(len(js)), sub_lens), sub_starts, sub_lens)
+        ref[js] = geo.length
+    return sigma_R, ref
+
+@REGISTRY.feature("IDe", needs=("spread", "Te"))
+def effective_id(ctx):
+    Te, ref = ctx["Te"], ctx["spread"][1]
+    with np.errstate(divide='ignore', invalid='ignore'): return np.where(Te > 0, np.log2(ref / np.where(Te > 0, Te, 1)), 0)
+
+@REGISTRY.feature("IPe", needs=("IDe", "Duration"))
+def effective_ip(ctx):
+    duration = ctx["Duration"]
+    return np.where(duration > 0, ctx["IDe"] / np.where(duration > 0, duration, 1), 0)
+
+@REGISTRY.feature("Duration")
+def duration(ctx):
+    t_rel = ctx["df"]['Time_Rel'].to_numpy()[ctx["order"]]      # Type d'origine (float32 d'une table colonne), comme Series.max()
+    return (np.maximum.reduceat(t_rel, ctx["starts"]) - np.minimum.reduceat(t_rel, ctx["starts"])).astype(float)
+
+@REGISTRY.feature("Mean_Jerk", needs=("jerk",))
+def mean_jerk(ctx): return np.add.reduceat(ctx["jerk"], ctx["starts"]) / ctx["lens"]
+
+@REGISTRY.feature("LDLJ", needs=("jerk", "dt", "Duration", "Path_Length"))
+def ldlj(ctx):
+    duration, path_length = ctx["Duration"], ctx["Path_Length"]
+    integral_jerk_squared = np.add.reduceat(ctx["jerk"]**2, ctx["starts"]) * ctx["dt"]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        arg_log = (duration**5 / path_length**2) * integral_jerk_squared
+        return np.where((path_length > 0) & (duration > 0) & (arg_log > 1e-9), np.log(arg_log), 0.0)
+
+@REGISTRY.feature("F95", needs=("radius", "fs"))
+def f95(ctx):
+    return spectral_features(ctx["radius"], ctx["starts"], ctx["ends"], ctx["fs"], ctx["spectral_method"], ctx["spectral_cache"])[:, 0]
+
+@REGISTRY.feature(["Tremor_Power", "Tremor_Pct"], needs=("radius_unfiltered", "fs"))
+def tremor(ctx):
+    # 8-12 Hz sur le rayon non filtré : le passe-bas à FILTER_CUTOFF_HZ (gain 0.71 à 8 Hz, 0.33 à 12 Hz) écraserait la bande
+    return spectral_features(ctx["radius_unfiltered"], ctx["starts"], ctx["ends"], ctx["fs"], ctx["spectral_method"], ctx["spectral_cache"])[:, 1:].T
+
+@REGISTRY.feature("Error_Rate", needs=("radius", "targets", "projection"))
+def error_rate(ctx):
+    R_target, W_target, thickness = ctx["targets"]; seg = ctx["seg"]
+    is_out = (np.abs(ctx["radius"] - R_target[seg]) + thickness[seg] / 2) > (W_target[seg] / 2)
+    for _, _, rows, dist_c, half_w, _ in ctx["projection"]:
+        is_out[rows] = (dist_c + thickness[seg[rows]] / 2) > half_w    # Distance exacte et largeur locale W(s)
+    return np.add.reduceat(is_out.astype(float), ctx["starts"]) / ctx["lens"] * 100
+
+@REGISTRY.feature("Te", needs=("spread",))
+def effective_width(ctx): return 4.133 * ctx["spread"][0]
+
+@REGISTRY.feature("IDc")
+def nominal_id(ctx):
+    return np.array([g.index_of_difficulty if (g := ctx["geometries"].get(k)) is not None else np.nan for k in ctx["keys"]], dtype=float)
+
+@REGISTRY.feature("Path_Length", needs=("xy", "inner"))
+def path_length(ctx):
+    x, y = ctx["xy"]
+    return np.add.reduceat(np.where(ctx["inner"], np.sqrt(np.diff(x)**2 + np.diff(y)**2), 0.0), ctx["starts"])
+
+@REGISTRY.feature("Mean_Velocity", needs=("velocity",))
+def mean_velocity(ctx): return np.add.reduceat(ctx["velocity"][2], ctx["starts"]) / ctx["lens"]
+
+@REGISTRY.feature("Force_SD")
+def force_sd(ctx):
+    p = ctx["col"]('P_Raw') if 'P_Raw' in ctx["df"].columns else np.zeros(len(ctx["seg"]))
+    return segment_std(p, ctx["seg"], ctx["starts"], ctx["lens"])[0]
+
+def fitts_groups(trials):
+    # Groupes (participant, grande condition VP / FVP) -> (code de groupe par essai, table ID / Task_Type / Group / N_Trials)
+    keys = trials.groupby(['ID', 'Task_Type'], sort=True, observed=True)
+    table = keys.agg(Group=('Group', 'first'), N_Trials=('IDe', 'size')).reset_index()
+    return keys.ngroup().to_numpy(), table
+
+@REGISTRY.feature(["Be", "Be_Intercept", "Be_R2"], needs=("IDe", "Duration"), level="participant")
+def fitts_parameters(trials, **options):
+    # Régression MT (Duration) = A + Be * IDe de tous les participants x grande condition en une passe.
+    # Il faut au moins 3 essais avec des IDe différents pour tracer une droite, sinon Be = 0 (ordonnée et r² vides)
+    codes, table = fitts_groups(trials)
+    fit = grouped_linregress(codes, trials['IDe'].to_numpy(float), trials['Duration'].to_numpy(float), len(table))
+    valid = (fit["n"] > 2) & (fit["x_var"] > 0)
+    table['Be'] = np.where(valid, fit["slope"], 0.0)
+    table['Be_Intercept'] = np.where(valid, fit["intercept"], np.nan); table['Be_R2'] = np.where(valid, fit["r2"], np.nan)
+    return table
+
+@REGISTRY.feature(["Be_CI_Low", "Be_CI_High"], needs=("IDe", "Duration"), level="participant")
+def fitts_confidence(trials, bootstrap=BOOTSTRAP_SAMPLES, **options):
+    # Intervalle de confiance percentile de Be (rééchantillonnage des essais de chaque participant x condition)
+    codes, table = fitts_groups(trials)
+    names = (table['ID'].astype(str) + "|" + table['Task_Type'].astype(str)).tolist()
+    table['Be_CI_Low'], table['Be_CI_High'] = bootstrap_slopes(codes, trials['IDe'].to_numpy(float), trials['Duration'].to_numpy(float),
+                                                               names, samples=bootstrap)
+    return table
+
+def segment_features(df_clean, group_keys, metadata, pid, geometries=None, skip=(), spectral_method="periodogram", spectral_cache=None,
+                     columns=None, derivative_method="gradient", unfiltered=None):
+    # Mêmes métriques que process_single_trial pour chaque groupe de groupby(group_keys), dans le même ordre, à partir
+    # des tableaux complets du participant et des bornes de chaque essai (réductions segmentées np.add.reduceat).
+    # columns : métriques par essai à calculer (toutes par défaut ; seuls leurs intermédiaires sont évalués)
+    # unfiltered : X / Y avant le passe-bas, mêmes lignes que df_clean (bande du tremblement) ; None -> positions de df_clean
+    # -> liste de (clé (Bloc, Trial_in_Bloc), dict de métriques | None si l'essai est dans skip)
+    geometries = geometries or {}
+    columns = REGISTRY.columns("trial") if columns is None else columns
+    g = df_clean.groupby(group_keys, observed=True, sort=True).ngroup().to_numpy()
+    counts = np.bincount(g); n_groups = len(counts)
+    order = np.argsort(g, kind='stable')
+    first_idx = order[np.concatenate(([0], np.cumsum(counts)[:-1]))]
+    firsts = lambda name: df_clean[name].to_numpy()[first_idx]
+    blocs = [str(b) for b in firsts('Bloc')] if 'Bloc' in df_clean.columns else ["VP"] * n_groups
+    trials = firsts('Trial_in_Bloc') if 'Trial_in_Bloc' in df_clean.columns else np.zeros(n_groups, dtype=int)
+    keys = [(b, int(t)) for b, t in zip(blocs, trials)]
+
+    # Essais calculés : au moins 5 échantillons (comme process_single_trial) et absents de skip
+    keep = (counts >= 5) & np.array([k not in skip for k in keys], dtype=bool)
+    sel = np.flatnonzero(keep)
+    results = [(k, None) for k in keys]
+    if len(sel) == 0: return results
+    order = order[keep[g[order]]]
+    lens = counts[sel]; ends = np.cumsum(lens); starts = ends - lens
+    ctx = TrialContext(REGISTRY, df=df_clean, order=order, starts=starts, ends=ends, lens=lens,
+                       seg=np.repeat(np.arange(len(sel)), lens), keys=[keys[k] for k in sel], geometries=geometries,
+                       col=lambda name: df_clean[name].to_numpy()[order].astype(float),
+                       unfiltered=lambda name: (df_clean if unfiltered is None else unfiltered)[name].to_numpy()[order].astype(float),
+                       spectral_method=spectral_method, spectral_cache=spectral_cache, derivative_method=derivative_method)
+    values = REGISTRY.evaluate(ctx, sorted(columns, key=column_rank))
+
+    group_info = subject_info(metadata, pid)
+    for j, k in enumerate(sel):
+        results[k] = (keys[k], {**trial_identity(blocs[k], trials[k], metadata, pid, group_info), **{c: v[j] for c, v in values.items()}})
+    return results
+
+def column_rank(c):
+    # Ordre des colonnes du dataset : celui de FEATURE_COLUMNS, puis les métriques ajoutées au registre
+    return FEATURE_COLUMNS.index(c) if c in FEATURE_COLUMNS else len(FEATURE_COLUMNS) + REGISTRY.order.index(c)
+
+def stream_trials(raw_file, chunk_rows):
+    # Blocs d'essais complets lus par tranches : l'essai coupé en fin de tranche est recollé au début de la suivante.
+    # Mémoire bornée par la tranche + le plus long essai, et non par la session
+    pending = None
+    for chunk in iter_frames(raw_file, chunk_rows):
+        if chunk.empty: continue
+        if pending is not None: chunk = pd.concat([pending, chunk], ignore_index=True)
+        last = trial_bounds(chunk)[0][-1]
+        if last > 0: yield chunk.iloc[:last]
+        pending = chunk.iloc[last:].reset_index(drop=True)
+    if pending is not None and len(pending): yield pending
+
+def process_participant(raw_file, meta_df, online_columns=False, export_csv=False, engine="batch", chunk_rows=0,
+                        resample_hz=0, resample_method="linear", spectral_method="periodogram", columns=None,
+                        derivative_method="gradient", compact=False):
+    # Un participant de bout en bout (filtrage, CLEAN, métriques par essai) -> (lignes de métriques, message console).
+    # Indépendant des autres participants : exécutable dans un processus séparé (--jobs).
+    # chunk_rows > 0 : lecture en flux par blocs d'essais complets, CLEAN écrit au fur et à mesure.
+    # resample_hz > 0 : essais rééchantillonnés sur une grille exacte avant filtrage (Src_Index -> ligne du RAW).
+    # columns : métriques par essai demandées (REGISTRY.resolve), toutes par défaut
+    # compact : RAW et CLEAN gardés en mémoire en float32 / catégories (compact_schema.TRAJECTORY_SCHEMA)
+    # online_columns : métriques de l'acquisition ajoutées en colonnes Online_<métrique>, à côté des métriques recalculées
+    f = raw_file; features = []
+    columns = sorted(REGISTRY.columns("trial") if columns is None else columns, key=column_rank)
+    identity = IDENTITY_COLUMNS + columns
+    try:
+        blocks = stream_trials(f, chunk_rows) if chunk_rows > 0 else iter([read_frame(f)])
+        timing_flags = load_timing_flags(f)
+        geometries = load_tunnel_geometries(f)
+        online = load_online_features(f) if online_columns else {}
+        spectra = SpectrumCache(cache_file(f, "_SPECTRAL.pkl"))      # Spectres des essais inchangés repris tels quels
+        n_degraded = 0; n_online = 0; n_auto = 0; n_rows = 0; pid = None; mem = [0, 0]
+
+        for df in blocks:
+            if df.empty: continue
+            if pid is None:
+                pid = str(df['ID'].iloc[0]).strip().upper()
+                clean_file = os.path.join(CLEAN_PATH, f"{pid}_CLEAN")
+                if os.path.exists(clean_file + ".cols.tmp"): shutil.rmtree(clean_file + ".cols.tmp")
+                clean_store = ColumnStore(clean_file + ".cols.tmp"); first = True
+                cats = getattr(df['Bloc'].dtype, 'categories', None) if 'Bloc' in df.columns else None
+                bloc_rank = {str(c): i for i, c in enumerate(cats)} if cats is not None else {}
+
+            # --- ÉTAPE A : RÉÉCHANTILLONNAGE (optionnel) ET FILTRAGE (par essai) ---
+            if resample_hz > 0:
+                n_src = len(df)
+                df = resample_trials(df, *trial_bounds(df), resample_hz, resample_method, index_offset=n_rows); n_rows += n_src
+            cols = [c for c in ('X', 'Y', 'P_Raw') if c in df.columns]
+            df_clean = df.assign(**filter_trials(df, cols))
+            unfiltered = df[['X', 'Y']]         # Positions avant le passe-bas : spectre du tremblement (8-12 Hz)
+            if compact:
+                # Seuls le CLEAN et les positions non filtrées restent en mémoire, compacts (reste du RAW du bloc libéré)
+                mem[0] += frame_memory(df_clean) + frame_memory(unfiltered)
+                df_clean = compact_frame(df_clean, TRAJECTORY_SCHEMA); unfiltered = compact_frame(unfiltered, TRAJECTORY_SCHEMA)
+                mem[1] += frame_memory(df_clean) + frame_memory(unfiltered)
+                df = None
+
+            # CLEAN en table colonne (float32, Bloc/ID catégoriels), ajouté bloc par bloc ; CSV seulement sur demande
+            clean_store.append(df_clean, durable=False)
+            if export_csv: df_clean.to_csv(clean_file + ".csv", index=False, mode='w' if first else 'a', header=first)
+            first = False
+
             # --- ÉTAPE B : MÉTRIQUES PAR ESSAI ---
             if 'Trial_in_Bloc' not in df_clean.columns:
                 df_clean['New_Trial'] = (df_clean['Time_Rel'].diff() < -0.5) | (df_clean['Time_Rel'].shift(1).isna())
-                df_clean['Trial_Auto'] = df_clean['New_Trial'].cumsum()
+                df_clean['Trial_Auto'] = df_clean['New_Trial'].cumsum() + n_auto     # Numérotation continue d'un bloc à l'autre
+                n_auto = int(df_clean['Trial_Auto'].iloc[-1])
                 group_col = 'Trial_Auto'
             else: group_col = 'Trial_in_Bloc'
-            
+
             group_keys = [group_col]
             if 'Bloc' in df_clean.columns: group_keys.append('Bloc')
 
-            for name, data_essai in df_clean.groupby(group_keys):
-                feat = process_single_trial(data_essai, meta_df, pid)
-                if feat: all_features.append(feat)
-            
-            print(f"-> Essais traités pour : {pid}")
+            if engine == "batch": trial_rows = segment_features(df_clean, group_keys, meta_df, pid, geometries,
+                                                            spectral_method=spectral_method, spectral_cache=spectra, columns=columns,
+                                                            derivative_method=derivative_method, unfiltered=unfiltered)
+            else:
+                # Référence : un appel de process_single_trial par groupe
+                trial_rows = []
+                for _, data_essai in df_clean.groupby(group_keys, observed=True):
+                    trial_key = (str(data_essai['Bloc'].iloc[0]) if 'Bloc' in data_essai.columns else "VP",
+                                 int(data_essai['Trial_in_Bloc'].iloc[0]) if 'Trial_in_Bloc' in data_essai.columns else 0)
+                    trial_rows.append((trial_key, process_single_trial(data_essai, meta_df, pid, geometries.get(trial_key), spectral_method,
+                                                                       spectra, derivative_method, unfiltered.loc[data_essai.index])))
+            for trial_key, feat in trial_rows:
+                if feat:
+                    feat = {c: feat[c] for c in identity if c in feat}      # Colonnes demandées seulement (moteur loop)
+                    feat['Timing_Degraded'] = timing_flags.get((feat['Condition'], int(feat['Trial'])), np.nan)
+                    n_degraded += feat['Timing_Degraded'] == 1
+                    if trial_key in online:
+                        feat.update({f"Online_{c}": online[trial_key][c] for c in columns if c in online[trial_key]}); n_online += 1
+                    features.append(feat)
 
-        except Exception as e: print(f"Erreur sur {os.path.basename(f)}: {e}")
+        # RAW sans aucune ligne (ex. table tronquée à 0 par la reprise après un crash au premier essai)
+        if pid is None: return [], f"RAW vide : {os.path.basename(f)} (aucun échantillon, ignoré)"
 
-    # --- ÉTAPE C : CALCUL DU COEFFICIENT Be POUR CHAQUE PARTICIPANT ---
-    if all_features:
-        features_df = pd.DataFrame(all_features)
-        
-        # Initialisation de la colonne Be
-        features_df['Be'] = np.nan
-        
-        # On calcule Be par participant et par grande condition (VP vs FVP)
-        for pid in features_df['ID'].unique():
-            for task in ['VP', 'FVP']:
-                mask = (features_df['ID'] == pid) & (features_df['Task_Type'] == task)
-                subset = features_df[mask]
-                
-                # Il faut au moins 2 points avec des IDe différents pour tracer une droite
-                if len(subset) > 2 and subset['IDe'].nunique() > 1:
-                    # Régression linéaire : MT (Duration) = A + Be * IDe
-                    slope, intercept, r_value, p_value, std_err = stats.linregress(subset['IDe'], subset['Duration'])
-                    # On assigne la pente (slope) à la colonne Be pour tous les essais de ce participant/condition
-                    features_df.loc[mask, 'Be'] = slope
-                elif len(subset) > 0:
-                    features_df.loc[mask, 'Be'] = 0.0 # Pas assez de variabilité pour calculer Be
+        # Lecture en flux : même ordre que le groupby sur le fichier entier (Trial_in_Bloc, puis Bloc)
+        if chunk_rows > 0 and group_col == 'Trial_in_Bloc':
+            features.sort(key=lambda r: (r['Trial'], bloc_rank.get(r['Condition'], r['Condition'])))
+
+        spectra.save()
+
+        # CLEAN complet : remplace l'ancien d'un coup (même renommage que ColumnStore.write)
+        if os.path.exists(clean_file + ".cols"): shutil.rmtree(clean_file + ".cols")
+        os.rename(clean_file + ".cols.tmp", clean_file + ".cols")
+
+        return features, (f"-> Essais traités pour : {pid}" + (f" ({n_degraded} essai(s) au timing dégradé)" if n_degraded else "")
+                          + (f" ({n_online} essai(s) avec colonnes Online_* de l'acquisition)" if n_online else "")
+                          + (f" ({memory_report('CLEAN en mémoire', *mem)})" if compact else ""))
+
+    except Exception as e: return [], f"Erreur sur {os.path.basename(f)}: {e}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filtrage des RAW et calcul des métriques par essai.")
+    parser.add_argument("--online-columns", "--reuse-online", dest="online_columns", action="store_true",
+                        help="Ajoute les métriques calculées pendant l'acquisition ({ID}_FEATURES.csv) en colonnes Online_<métrique> ; "
+                             "filtre causal, définitions non identiques : les métriques recalculées ne sont jamais remplacées")
+    parser.add_argument("--csv", action="store_true",
+                        help="Exporte aussi les CLEAN en CSV ({ID}_CLEAN.csv, pour Excel) en plus des tables colonne")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Nombre de processus pour traiter les participants en parallèle (0 = tous les cœurs)")
+    parser.add_argument("--engine", choices=["batch", "loop"], default="batch",
+                        help="batch : tous les essais d'un participant en une passe vectorisée ; loop : process_single_trial par essai (référence)")
+    parser.add_argument("--chunk-rows", type=int, default=0,
+                        help="Lit les RAW en flux par tranches de N lignes (mémoire bornée par le plus long essai) ; 0 = fichier entier")
+    parser.add_argument("--resample", type=float, default=0, metavar="HZ",
+                        help="Rééchantillonne chaque essai sur une grille uniforme à HZ (ex. 125) avant filtrage ; 0 = échantillons d'origine")
+    parser.add_argument("--resample-method", choices=RESAMPLE_METHODS, default="linear",
+                        help="Interpolation utilisée par --resample")
+    parser.add_argument("--spectral", choices=SPECTRAL_METHODS, default="periodogram",
+                        help="Spectre utilisé pour F95 et la bande du tremblement (8-12 Hz) : périodogramme ou Welch")
+    parser.add_argument("--derivatives", choices=["gradient", "savgol"], default="gradient",
+                        help="Vitesse / jerk : np.gradient successifs ou dérivées de Savitzky-Golay (moins de bruit sur LDLJ)")
+    parser.add_argument("--features", default=None,
+                        help="Métriques à calculer, séparées par des virgules (ex. IPe,Be,LDLJ,Te,Force_SD) ; toutes par défaut")
+    parser.add_argument("--bootstrap", type=int, default=BOOTSTRAP_SAMPLES,
+                        help="Rééchantillonnages pour l'intervalle de confiance de Be (Be_CI_Low / Be_CI_High) ; 0 = sans intervalle")
+    parser.add_argument("--compact", action="store_true",
+                        help="Trajectoires et métriques gardées en float32 / catégories (schéma déclaré dans compact_schema.py) ; rapport mémoire")
+    parser.add_argument("--list-features", action="store_true", help="Affiche les métriques du registre et leurs dépendances")
+    parser.add_argument("--force", action="store_true",
+                        help="Ignore le manifeste et retraite tous les participants")
+    args = parser.parse_args()
+    if args.list_features:
+        print("\n".join(REGISTRY.describe())); sys.exit(0)
+    try: trial_columns, participant_columns = REGISTRY.resolve(args.features.split(",") if args.features else None)
+    except ValueError as e: parser.error(str(e))
+    print("--- TRAITEMENT, SAUVEGARDE CLEAN ET CALCUL DES MÉTRIQUES (FITTS) ---")
+    try:
+        meta_df = pd.read_csv(META_PATH, sep=None, engine='python', encoding='utf-8-sig')
+        meta_df.columns = meta_df.columns.str.strip()
+        meta_df['ID'] = meta_df['ID'].astype(str).str.strip().str.upper()
+    except: meta_df = pd.DataFrame(columns=['ID', 'Group'])
+
+    raw_files = find_raw_files(RAW_PATH)
+
+    # Participants inchangés (même contenu RAW + fichiers associés, mêmes paramètres) : métriques reprises du cache
+    manifest = {} if args.force else load_manifest()
+    params = params_hash(args.online_columns, args.engine, args.resample, args.resample_method, args.spectral,
+                         trial_columns, args.derivatives, args.compact)
+    hashes = {f: raw_content_hash(f) for f in raw_files}
+    cached = {}
+    for f in raw_files:
+        entry = manifest.get(os.path.basename(f))
+        if entry is None or entry["hash"] != hashes[f] or entry["params"] != params or not os.path.exists(cache_file(f)): continue
+        clean = os.path.join(CLEAN_PATH, f"{entry['ID']}_CLEAN")
+        if not os.path.exists(clean + ".cols") or (args.csv and not os.path.exists(clean + ".csv")): continue
+        cached[f] = pd.read_pickle(cache_file(f))
+    to_process = [f for f in raw_files if f not in cached]
+    new_features = {}
+
+    # Participants indépendants jusqu'au calcul du Be : répartis sur un pool de processus si --jobs > 1.
+    # map() rend les résultats dans l'ordre des fichiers -> même dataset (et mêmes messages) qu'en séquentiel
+    n_jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    task = partial(process_participant, meta_df=meta_df, online_columns=args.online_columns, export_csv=args.csv, engine=args.engine, chunk_rows=args.chunk_rows,
+                   resample_hz=args.resample, resample_method=args.resample_method, spectral_method=args.spectral,
+                   columns=trial_columns, derivative_method=args.derivatives, compact=args.compact)
+    if n_jobs > 1 and len(to_process) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(to_process))) as pool:
+            for f, (features, message) in zip(to_process, pool.map(task, to_process)):
+                print(message); new_features[f] = features
+    else:
+        for f, (features, message) in zip(to_process, map(task, to_process)):
+            print(message); new_features[f] = features
+    if cached: print(f"♻️ {len(cached)} participant(s) inchangé(s) : métriques reprises du cache ({os.path.relpath(MANIFEST_FILE, BASE_DIR)})")
+
+    # Fusion dans l'ordre des fichiers (identique à un traitement complet) ; Group / Experience_Years relus dans metadata
+    frames, origin = [], []
+    for f in raw_files:
+        if f in cached:
+            frame = cached[f].copy()
+            frame['Group'], frame['Experience_Years'] = subject_info(meta_df, str(frame['ID'].iloc[0]))
+        elif new_features.get(f): frame = pd.DataFrame(new_features[f])
+        else: continue
+        frames.append(frame); origin.extend([f] * len(frame))
+
+    # --- ÉTAPE C : COEFFICIENT Be (ET AUTRES MÉTRIQUES PAR PARTICIPANT) ---
+    if frames:
+        features_df = pd.concat(frames, ignore_index=True)
+        origin = pd.Series(origin)
+        # Anciens caches : Be répété sur chaque essai -> retiré, les paramètres par participant vont dans leur propre table
+        features_df = features_df.drop(columns=[c for c in REGISTRY.columns("participant") if c in features_df.columns])
+        if args.compact:
+            before = frame_memory(features_df); features_df = compact_frame(features_df, FEATURES_SCHEMA)
+            print(memory_report("Métriques en mémoire", before, frame_memory(features_df)))
+
+        # Participants inchangés (même empreinte RAW et mêmes paramètres, cf. manifeste) : leurs lignes de dataset_subjects.csv
+        # sont reprises ; les autres x grandes conditions (VP vs FVP) en une passe par métrique, une ligne par participant et par tâche
+        subject_params = subjects_hash(params, participant_columns, args.bootstrap)
+        kept = pd.DataFrame()
+        if cached and participant_columns and os.path.exists(SUBJECTS_FILE):
+            previous = pd.read_csv(SUBJECTS_FILE, dtype={'ID': str}, float_precision='round_trip')
+            reuse = {manifest[os.path.basename(f)]["ID"] for f in cached if manifest[os.path.basename(f)].get("subjects") == subject_params}
+            if all(c in previous.columns for c in participant_columns):
+                kept = previous[previous['ID'].isin(reuse)].copy()
+                kept['Group'] = [subject_info(meta_df, pid)[0] for pid in kept['ID']]     # Groupe relu dans metadata
+        todo = features_df[~features_df['ID'].astype(str).isin(set(kept['ID']) if len(kept) else set())]
+        subjects_df = None
+        if len(todo):
+            for func in dict.fromkeys(REGISTRY.function_of(c) for c in participant_columns):
+                table = func(todo, bootstrap=args.bootstrap)
+                subjects_df = table if subjects_df is None else subjects_df.merge(table.drop(columns=['Group', 'N_Trials']), on=['ID', 'Task_Type'])
+        if len(kept): subjects_df = kept if subjects_df is None else pd.concat([kept, subjects_df.astype({'ID': str, 'Task_Type': str})])
+        if subjects_df is not None:
+            subjects_df = subjects_df[[c for c in subjects_df.columns if c in ('ID', 'Task_Type', 'Group', 'N_Trials') or c in participant_columns]]
+            subjects_df = subjects_df.sort_values(['ID', 'Task_Type'], ignore_index=True)
+            if len(kept): print(f"♻️ {kept['ID'].nunique()} participant(s) inchangé(s) : paramètres par participant repris de {os.path.relpath(SUBJECTS_FILE, BASE_DIR)}")
+
+        # Cache par participant + manifeste (les fichiers en erreur ne sont pas mémorisés : retentés au prochain passage)
+        for f in to_process:
+            rows = features_df[(origin == f).values]
+            if rows.empty: continue
+            rows.to_pickle(cache_file(f))
+            manifest[os.path.basename(f)] = {"hash": hashes[f], "params": params, "ID": str(rows['ID'].iloc[0])}
+        for f in raw_files:
+            entry = manifest.get(os.path.basename(f))
+            if entry is None: continue
+            if subjects_df is not None: entry["subjects"] = subject_params
+            else: entry.pop("subjects", None)       # Aucune ligne écrite : rien à reprendre au prochain passage
+        manifest = {k: v for k, v in manifest.items() if k in {os.path.basename(f) for f in raw_files}}
+        with open(MANIFEST_FILE, 'w') as fh: json.dump(manifest, fh, indent=1)
 
         # Sauvegarde finale
         features_df.to_csv(os.path.join(OUTPUT_PATH, "dataset_features.csv"), index=False)
-        print(f"\nSUCCÈS ! Dataset généré avec IPe, IDe et le coefficient Be calculé par régression linéaire.")
\ No newline at end of file
+        ColumnStore.write(os.path.join(OUTPUT_PATH, "dataset_features.cols"), features_df)
+        if subjects_df is not None: subjects_df.to_csv(SUBJECTS_FILE, index=False)
+        elif os.path.exists(SUBJECTS_FILE): os.remove(SUBJECTS_FILE)   # Table d'un passage précédent (autres réglages) : jamais fusionnée
+        computed = ", ".join([c for c in ("IPe", "IDe") if c in trial_columns] or trial_columns)
+        print(f"\nSUCCÈS ! Dataset généré avec {computed}" + (" et le coefficient Be calculé par régression linéaire." if 'Be' in participant_columns
+                                                            else " (sans coefficient Be)." if not participant_columns else "."))
+        if subjects_df is not None: print(f"Paramètres de Fitts par participant : {os.path.relpath(SUBJECTS_FILE, BASE_DIR)}")
\ No newline at end of file
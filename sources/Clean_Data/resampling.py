@@ -0,0 +1,48 @@
+# resampling.py - Rééchantillonnage des essais sur une grille temporelle exacte (QTimer(8) -> pas irrégulier)
+# Utilisé par process_data.py (--resample HZ) avant le filtrage : dt devient exactement 1/HZ dans chaque essai.
+import numpy as np
+import pandas as pd
+
+RESAMPLE_METHODS = ("linear", "nearest", "cubic")
+ANGULAR_COLUMNS = {"Angle", "Rotation"}     # Angles (repliement à 360°) : échantillon le plus proche, jamais interpolés
+SIGNAL_COLUMNS = {"Time_Rel", "X", "Y", "P_Raw"}   # Toujours interpolées, même lues comme entiers (CSV)
+
+def uniform_grid(t, starts, ends, rate):
+    # Grille t0 + k/rate de chaque essai, sur un axe commun où les essais sont mis bout à bout (écart de 1 s entre deux) :
+    # un seul np.interp / searchsorted sert alors tous les essais. -> (axe des échantillons, axe de la grille, essai, k)
+    t0 = t[starts]; span = t[ends - 1] - t0
+    n_grid = np.floor(span * rate + 1e-9).astype(int) + 1
+    base = np.concatenate(([0.0], np.cumsum(span + 1.0)[:-1]))
+    src_seg = np.repeat(np.arange(len(starts)), ends - starts)
+    seg = np.repeat(np.arange(len(starts)), n_grid)
+    k = np.arange(n_grid.sum()) - np.repeat(np.cumsum(n_grid) - n_grid, n_grid)
+    return t - t0[src_seg] + base[src_seg], base[seg] + k / rate, seg, k
+
+def resample_trials(df, starts, ends, rate, method="linear", index_offset=0):
+    # Essais [starts, ends) de df interpolés à rate Hz. Colonnes réelles interpolées (sauf angles), autres colonnes
+    # (identifiants, InT...) reprises de l'échantillon d'origine le plus proche, dont l'indice est gardé dans Src_Index
+    if method not in RESAMPLE_METHODS: raise ValueError(f"Méthode de rééchantillonnage inconnue : {method}")
+    t = df['Time_Abs'].to_numpy(dtype=float)
+    tt, tg, seg, k = uniform_grid(t, starts, ends, rate)
+
+    # Échantillon d'origine le plus proche de chaque point de la grille (toujours dans le même essai)
+    right = np.clip(np.searchsorted(tt, tg), 0, len(tt) - 1); left = np.maximum(right - 1, 0)
+    src = np.where(np.abs(tg - tt[left]) <= np.abs(tt[right] - tg), left, right)
+
+    out = df.iloc[src].reset_index(drop=True)     # "nearest" : rien de plus à faire
+    interp = [c for c in df.columns if (c in SIGNAL_COLUMNS or df[c].dtype.kind == 'f') and c != 'Time_Abs' and c not in ANGULAR_COLUMNS]
+    if method == "linear":
+        for c in interp: out[c] = np.interp(tg, tt, df[c].to_numpy(dtype=float))
+    elif method == "cubic" and interp:
+        # Spline cubique essai par essai (toutes les colonnes d'un coup) ; essais de moins de 4 échantillons : linéaire
+        from scipy.interpolate import CubicSpline
+        values = np.column_stack([df[c].to_numpy(dtype=float) for c in interp]); res = np.empty((len(tg), len(interp)))
+        g_ends = np.cumsum(np.bincount(seg, minlength=len(starts))); g_starts = np.concatenate(([0], g_ends[:-1]))
+        for a, b, ga, gb in zip(starts, ends, g_starts, g_ends):
+            x = tt[a:b]; keep = np.concatenate(([True], np.diff(x) > 0))     # Horodatages dupliqués écartés
+            if keep.sum() >= 4: res[ga:gb] = CubicSpline(x[keep], values[a:b][keep], axis=0)(tg[ga:gb])
+            else: res[ga:gb] = np.column_stack([np.interp(tg[ga:gb], x, values[a:b, j]) for j in range(len(interp))])
+        for j, c in enumerate(interp): out[c] = res[:, j]
+    out['Time_Abs'] = t[starts][seg] + k / rate
+    out['Src_Index'] = src + index_offset
+    return out
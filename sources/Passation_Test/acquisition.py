@@ -0,0 +1,106 @@
+# acquisition.py - Primitives temps-réel de la boucle d'acquisition (steering_task.py)
+import math
+import numpy as np
+
+TWO_PI = 2 * math.pi
+
+# --- COMPTEUR DE TOURS INCRÉMENTAL ---
+class LapTracker:
+    """Déroule l'angle échantillon par échantillon (équivalent de np.unwrap) en O(1).
+
+    L'essai s'arrête au premier tour complet : sa durée est le MT du fichier SCORES, aucun temps intermédiaire n'est gardé.
+    """
+    __slots__ = ("n", "prev_angle", "cum_angle")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.n = 0; self.prev_angle = None
+        self.cum_angle = 0.0        # Angle déroulé cumulé depuis le premier échantillon (rad)
+
+    def update(self, angle):
+        if self.prev_angle is None:
+            self.n = 1; self.prev_angle = angle
+            return 0.0
+
+        # Même règle que np.unwrap : un saut > pi est un passage de -pi à +pi (ou l'inverse)
+        d = angle - self.prev_angle
+        if d > math.pi: d -= TWO_PI
+        elif d < -math.pi: d += TWO_PI
+        self.cum_angle += d; self.prev_angle = angle; self.n += 1
+        return self.laps
+
+    @property
+    def laps(self):
+        return abs(self.cum_angle) / TWO_PI
+
+# --- BUFFER D'ÉCHANTILLONS PRÉALLOUÉ ---
+# Une ligne par échantillon, mêmes colonnes (et même ordre) que la partie "mesures" du RAW.csv
+RAW_FIELDS = [("Time_Abs", "f8"), ("Time_Rel", "f8"), ("X", "f8"), ("Y", "f8"), ("P_Raw", "f8"),
+              ("Thickness", "f8"), ("Err_Radiale", "f8"), ("InT", "i1"), ("Angle", "f8"),
+              ("X_Tilt", "f4"), ("Y_Tilt", "f4"), ("Rotation", "f4")]
+RAW_DTYPE = np.dtype(RAW_FIELDS)
+
+class SampleBuffer:
+    """Tableau structuré NumPy réutilisé d'un essai à l'autre : aucune allocation par échantillon."""
+    __slots__ = ("n", "_data")
+
+    def __init__(self, capacity, dtype=RAW_DTYPE):
+        self.n = 0
+        self._data = np.zeros(max(int(capacity), 16), dtype=dtype)
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def capacity(self):
+        return len(self._data)
+
+    def append(self, *values):
+        if self.n == len(self._data): self._grow()
+        self._data[self.n] = values; self.n += 1
+
+    def _grow(self):
+        # Cas exceptionnel (essai plus long/rapide que prévu) : doublement, coût amorti O(1)
+        bigger = np.zeros(2 * len(self._data), dtype=self._data.dtype)
+        bigger[:self.n] = self._data[:self.n]; self._data = bigger
+
+    def view(self):
+        # Vue sans copie sur les échantillons valides (invalidée par reset())
+        return self._data[:self.n]
+
+    def reset(self):
+        self.n = 0
+
+# --- FILE D'ÉVÉNEMENTS STYLET ---
+# Un événement tablette = horodatage (s, base perf_counter), position, pression (0-1), inclinaisons et rotation (deg)
+STYLUS_DTYPE = np.dtype([("t", "f8"), ("x", "f8"), ("y", "f8"), ("p", "f8"),
+                         ("x_tilt", "f4"), ("y_tilt", "f4"), ("rot", "f4")])
+
+class StylusQueue:
+    """File circulaire préallouée : tabletEvent pousse, game_loop vide. Sans verrou (un seul producteur/consommateur)."""
+    __slots__ = ("_buf", "_head", "_tail", "dropped")
+
+    def __init__(self, capacity=4096):
+        self._buf = np.zeros(capacity, dtype=STYLUS_DTYPE)
+        self._head = 0; self._tail = 0
+        self.dropped = 0            # Événements écrasés faute d'avoir été consommés à temps
+
+    def __len__(self):
+        return self._head - self._tail
+
+    def push(self, t, x, y, p, x_tilt=0.0, y_tilt=0.0, rot=0.0):
+        cap = len(self._buf)
+        if self._head - self._tail >= cap: self._tail += 1; self.dropped += 1
+        self._buf[self._head % cap] = (t, x, y, p, x_tilt, y_tilt, rot); self._head += 1
+
+    def drain(self):
+        # Événements en attente, dans l'ordre d'arrivée (vue sans copie sauf si la file a rebouclé)
+        cap = len(self._buf); n = self._head - self._tail
+        i = self._tail % cap; self._tail = self._head
+        if i + n <= cap: return self._buf[i:i + n]
+        return np.concatenate((self._buf[i:], self._buf[:(i + n) % cap]))
+
+    def clear(self):
+        self._tail = self._head
@@ -0,0 +1,166 @@
+# columnar_store.py - Stockage colonne binaire des trajectoires (un .npy par colonne), lecture par memory mapping
+# Partagé par l'acquisition (RAW), process_data.py (RAW -> CLEAN) et le banc de rejeu. Export CSV à la demande :
+#   python columnar_store.py export ../../data/raw/P01_RAW.cols [P01_RAW.csv]
+#
+# Format d'un dossier <nom>.cols/ :
+#   schema.json   {"format": "haptimed-columnar", "version": 1, "rows": N,
+#                  "columns": [{"name": "X", "dtype": "<f4"}, {"name": "Bloc", "dtype": "<i2", "categories": [...]}, ...]}
+#   <colonne>.npy tableau 1D standard (np.load(..., mmap_mode='r')), en-tête de taille fixe réécrit à chaque ajout
+# "rows" fait foi : des octets au-delà (ajout interrompu) sont ignorés puis écrasés au prochain ajout.
+import io
+import os
+import sys
+import json
+import shutil
+import numpy as np
+
+FORMAT = "haptimed-columnar"; VERSION = 1
+HEADER_BYTES = 128                   # En-tête .npy v1.0 : 128 octets quel que soit le nombre de lignes
+FLOAT64_COLUMNS = {"Time_Abs"}       # Horodatage absolu (perf_counter) : float32 n'aurait qu'une résolution de ~0.1 ms
+
+def _header(dtype, n):
+    buf = io.BytesIO()
+    np.lib.format.write_array_header_1_0(buf, {"descr": np.dtype(dtype).str, "fortran_order": False, "shape": (n,)})
+    assert buf.tell() == HEADER_BYTES
+    return buf.getvalue()
+
+def _column_spec(name, values):
+    # Texte / catégories -> codes int16 + liste de catégories ; booléens -> int8 ; entiers -> int8/16/32 ; réels -> float32
+    values = np.asarray(values) if not hasattr(values, "dtype") else values
+    kind = getattr(values.dtype, "kind", "O")
+    if str(values.dtype) == "category" or kind in "OUS" or str(values.dtype) in ("string", "str"):
+        return {"name": name, "dtype": "<i2", "categories": []}
+    if kind == "b": return {"name": name, "dtype": "|i1"}
+    if kind in "iu": return {"name": name, "dtype": "|i1" if values.dtype.itemsize == 1 else "<i2" if values.dtype.itemsize == 2 else "<i4"}
+    return {"name": name, "dtype": "<f8" if name in FLOAT64_COLUMNS else "<f4"}
+
+class ColumnStore:
+    """Table colonne sur disque : ajout par lots (un essai), lecture colonne par colonne sans copie."""
+    def __init__(self, path):
+        self.path = path
+        schema_file = os.path.join(path, "schema.json")
+        self.schema = None
+        if os.path.exists(schema_file):
+            with open(schema_file) as f: self.schema = json.load(f)
+            if self.schema.get("format") != FORMAT: raise ValueError(f"{path} : format inconnu")
+
+    @property
+    def rows(self):
+        return self.schema["rows"] if self.schema else 0
+
+    @property
+    def columns(self):
+        return [c["name"] for c in self.schema["columns"]] if self.schema else []
+
+    # --- ÉCRITURE ---
+    def append(self, data, durable=True):
+        # data : DataFrame ou {colonne: tableau} ; mêmes colonnes à chaque ajout
+        names = list(data.keys()); n = len(data[names[0]])
+        if self.schema is None:
+            os.makedirs(self.path, exist_ok=True)
+            self.schema = {"format": FORMAT, "version": VERSION, "rows": 0, "columns": [_column_spec(k, data[k]) for k in names]}
+        elif set(names) != set(self.columns):
+            raise ValueError(f"{os.path.basename(self.path)} : colonnes {sorted(names)} au lieu de {sorted(self.columns)}")
+        rows = self.rows
+        for col in self.schema["columns"]:
+            arr = self._encode(col, data[col["name"]])
+            with open(self._file(col), 'r+b' if rows else 'wb') as f:
+                f.seek(HEADER_BYTES + rows * arr.itemsize); f.write(arr.tobytes()); f.truncate()
+                f.seek(0); f.write(_header(col["dtype"], rows + n))
+                if durable: f.flush(); os.fsync(f.fileno())
+        self.schema["rows"] = rows + n
+        self._write_schema(durable)
+        return self
+
+    def truncate(self, rows):
+        # Retour à un nombre de lignes validé (reprise de session)
+        if self.schema is None or rows >= self.rows: return
+        for col in self.schema["columns"]:
+            with open(self._file(col), 'r+b') as f:
+                f.truncate(HEADER_BYTES + rows * np.dtype(col["dtype"]).itemsize); f.seek(0); f.write(_header(col["dtype"], rows))
+        self.schema["rows"] = rows
+        self._write_schema(True)
+
+    @classmethod
+    def write(cls, path, frame):
+        # Remplace entièrement la table (écrite à côté puis renommée)
+        tmp = path + ".tmp"
+        if os.path.exists(tmp): shutil.rmtree(tmp)
+        cls(tmp).append(frame, durable=False)
+        if os.path.exists(path): shutil.rmtree(path)
+        os.rename(tmp, path)
+        return cls(path)
+
+    def _encode(self, col, values):
+        if "categories" in col:
+            cats = col["categories"]; index = {c: i for i, c in enumerate(cats)}
+            uniq, inv = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+            for u in uniq.tolist():
+                if u not in index: index[u] = len(cats); cats.append(u)
+            return np.array([index[u] for u in uniq.tolist()], dtype=col["dtype"])[inv.ravel()]
+        return np.ascontiguousarray(values, dtype=col["dtype"])
+
+    def _file(self, col):
+        return os.path.join(self.path, col["name"] + ".npy")
+
+    def _write_schema(self, durable):
+        tmp = os.path.join(self.path, "schema.json.tmp")
+        with open(tmp, 'w') as f:
+            json.dump(self.schema, f)
+            if durable: f.flush(); os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, "schema.json"))
+
+    # --- LECTURE ---
+    def load(self, columns=None, mmap=True, rows=None):
+        # {colonne: tableau} ; réels et entiers en memmap lecture seule, catégories décodées à part (categories())
+        # rows : tranche de lignes (slice) à lire, toutes par défaut
+        out = {}; rows = rows if rows is not None else slice(0, self.rows)
+        for col in self.schema["columns"]:
+            if columns is not None and col["name"] not in columns: continue
+            out[col["name"]] = np.load(self._file(col), mmap_mode='r' if mmap else None)[:self.rows][rows]
+        return out
+
+    def categories(self, name):
+        return next(c.get("categories") for c in self.schema["columns"] if c["name"] == name)
+
+    def to_frame(self, columns=None, mmap=True, rows=None):
+        # DataFrame : colonnes catégorielles en pd.Categorical (codes int16 partagés), float32 conservés
+        import pandas as pd
+        arrays = self.load(columns, mmap, rows)
+        data = {}
+        for name, arr in arrays.items():
+            cats = self.categories(name)
+            data[name] = pd.Categorical.from_codes(np.asarray(arr), cats) if cats is not None else arr
+        return pd.DataFrame(data, copy=False)
+
+    def to_csv(self, path):
+        self.to_frame(mmap=False).to_csv(path, index=False)
+
+def is_store(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, "schema.json"))
+
+def read_frame(path, columns=None):
+    # Lecture indifférente du format : dossier .cols (memory mapping) ou CSV
+    if is_store(path): return ColumnStore(path).to_frame(columns)
+    import pandas as pd
+    return pd.read_csv(path, usecols=columns)
+
+def iter_frames(path, chunk_rows, columns=None):
+    # Lecture par tranches de chunk_rows lignes (mémoire bornée par la tranche) : dossier .cols ou CSV
+    if is_store(path):
+        store = ColumnStore(path)
+        for a in range(0, store.rows, chunk_rows): yield store.to_frame(columns, rows=slice(a, a + chunk_rows))
+        return
+    import pandas as pd
+    yield from pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("export", "info"):
+        print("Usage : python columnar_store.py export <dossier.cols> [sortie.csv] | info <dossier.cols>"); sys.exit(1)
+    store = ColumnStore(sys.argv[2])
+    if sys.argv[1] == "info":
+        print(f"{store.rows} lignes")
+        for c in store.schema["columns"]: print(f"  {c['name']:<16} {c['dtype']}" + (f"  {len(c['categories'])} catégories" if "categories" in c else ""))
+    else:
+        out = sys.argv[3] if len(sys.argv) > 3 else os.path.splitext(sys.argv[2].rstrip("/\\"))[0] + ".csv"
+        store.to_csv(out); print(f"✅ {store.rows} lignes exportées -> {out}")
@@ -0,0 +1,47 @@
+# compact_schema.py - Types compacts déclarés des trajectoires (RAW / CLEAN) et des métriques (option --compact)
+# Réels en float32 (pixels, pressions, métriques : ~7 chiffres significatifs), textes répétés en catégories.
+# Calculs toujours faits en float64 (colonnes converties au moment du calcul) : seul le stockage en mémoire change.
+#
+# Tolérance documentée : un float32 arrondit chaque valeur à ~6e-8 en relatif ; moyennes, écarts-types, t, p et d
+# calculés à partir de ces valeurs restent à COMPACT_RTOL près de ceux du chemin float64 (COMPACT_ATOL pour les
+# valeurs proches de 0, ex. p < 1e-6). Vérifié à chaque passage --compact par analysis_master / analysis_ml.
+import numpy as np
+
+COMPACT_RTOL = 1e-4
+COMPACT_ATOL = 1e-6
+
+# Horodatage absolu (Time_Abs) absent des schémas : reste en float64 (cf. columnar_store.FLOAT64_COLUMNS)
+TRAJECTORY_SCHEMA = {
+    **{c: "category" for c in ("ID", "Bloc")},
+    **{c: "float32" for c in ("Time_Rel", "X", "Y", "P_Raw", "Thickness", "Err_Radiale", "Angle", "X_Tilt", "Y_Tilt", "Rotation")},
+}
+
+FEATURES_SCHEMA = {
+    **{c: "category" for c in ("ID", "Group", "Condition", "Task_Type", "Tache_Type")},
+    **{c: "float32" for c in ("Experience_Years", "IDe", "IPe", "Duration", "Mean_Jerk", "LDLJ", "F95", "Tremor_Power", "Tremor_Pct",
+                              "Error_Rate", "Te", "IDc", "Path_Length", "Mean_Velocity", "Force_SD", "Timing_Degraded",
+                              "Be", "Be_Intercept", "Be_R2", "Be_CI_Low", "Be_CI_High")},
+}
+
+def compact_frame(df, schema=FEATURES_SCHEMA):
+    # Colonnes du schéma présentes dans df converties (les autres inchangées) -> nouveau DataFrame
+    types = {c: t for c, t in schema.items() if c in df.columns and str(df[c].dtype) != t}
+    return df.astype(types) if types else df
+
+def frame_memory(df):
+    # Octets occupés, chaînes comprises
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def memory_report(label, before, after):
+    # before / after : octets -> "label : 12.30 Mo -> 4.10 Mo (-67 %)"
+    saved = (1 - after / before) * 100 if before else 0.0
+    return f"{label} : {before / 1e6:.2f} Mo -> {after / 1e6:.2f} Mo (-{saved:.0f} %)"
+
+def within_tolerance(reference, compact, rtol=COMPACT_RTOL, atol=COMPACT_ATOL):
+    # Résultats du chemin compact comparés au chemin float64 (NaN aux mêmes places) -> (conforme, écart absolu max)
+    ref = np.asarray(reference, dtype=float); new = np.asarray(compact, dtype=float)
+    if ref.shape != new.shape: return False, np.inf
+    both = np.isfinite(ref) & np.isfinite(new)
+    diff = float(np.abs(ref - new)[both].max()) if both.any() else 0.0
+    same_gaps = np.array_equal(np.isnan(ref), np.isnan(new))
+    return same_gaps and bool(np.allclose(ref[both], new[both], rtol=rtol, atol=atol)), diff
@@ -0,0 +1,112 @@
+# online_features.py - Calcul des métriques d'un essai au fil de l'acquisition (sommes courantes, O(1) par échantillon)
+# Mêmes noms de colonnes que process_data.process_single_trial, mais pas les mêmes définitions (filtre causal à la cadence
+# nominale, centre réel, bords du jerk) : écarts observés de l'ordre de 20 % sur Te / Mean_Jerk / tremblement, F95 et LDLJ
+# nettement décalés. Valeurs indicatives (retour en direct) : process_data --online-columns les range à part (Online_*).
+import math
+import numpy as np
+from scipy.signal import butter, sosfilt_zi
+from spectral import spectral_features
+
+# Colonnes du fichier {ID}_FEATURES.csv (une ligne par essai enregistré, après ID / Bloc / Trial_in_Bloc)
+FEATURE_COLUMNS = ["IDe", "IPe", "Duration", "Mean_Jerk", "LDLJ", "F95", "Error_Rate", "Te", "IDc",
+                   "Path_Length", "Mean_Velocity", "Force_SD", "Tremor_Power", "Tremor_Pct"]
+FEATURE_VERSION = 2     # À incrémenter si une définition change (process_data ignore les versions inconnues)
+
+class CausalLowpass:
+    """Butterworth passe-bas appliqué deux fois vers l'avant, un échantillon à la fois.
+
+    Même gain que sosfiltfilt (process_data.filter_trials) mais phase différente (retard) et cadence nominale :
+    dispersion latérale, jerk et spectre ne coïncident pas avec les métriques différées.
+    """
+    def __init__(self, sos, zi):
+        self.sos = sos; self.zi = zi; self.state = None
+
+    @staticmethod
+    def design(cutoff, fs, order=2):
+        sos = np.vstack([butter(order, cutoff, btype='low', fs=fs, output='sos')] * 2)
+        return sos.tolist(), sosfilt_zi(sos).tolist()
+
+    def __call__(self, x):
+        if self.state is None: self.state = [[z0 * x, z1 * x] for z0, z1 in self.zi]   # Régime établi sur le 1er échantillon
+        for (b0, b1, b2, _, a1, a2), z in zip(self.sos, self.state):
+            y = b0 * x + z[0]
+            z[0] = b1 * x - a1 * y + z[1]; z[1] = b2 * x - a2 * y
+            x = y
+        return x
+
+class OnlineFeatures:
+    """Accumulateur par essai : Welford (décalage latéral, force), longueur du chemin, énergie du jerk.
+
+    Position et force passent par le même passe-bas à 10 Hz que process_data (version causale, voir CausalLowpass).
+    Le décalage latéral signé remplace le rayon : pour le cercle, Ri = R + décalage, donc même dispersion (Te)
+    en principe, mais le vrai centre remplace le centre de la boîte englobante : Te et F95 diffèrent du calcul différé.
+    """
+    def __init__(self, capacity=4096, cutoff=10.0):
+        self.cutoff = cutoff
+        self._offsets = np.empty(capacity)   # Seule série conservée : F95 et tremblement demandent le spectre complet
+        self._coeffs = {}
+        self.reset()
+
+    def reset(self, geometry=None, fs=120.0):
+        # fs : cadence attendue des échantillons (coefficients du filtre calculés une fois par cadence)
+        fs = max(fs, 2.5 * self.cutoff)     # butter exige cutoff < fs/2
+        self.geometry = geometry
+        if geometry is None: self.ref_radius = self.ref_length = None; self.idc = np.nan
+        elif geometry.kind == "circle": self.ref_radius = geometry.spec["R"]; self.ref_length = None
+        else: self.ref_radius = None; self.ref_length = geometry.length
+        if geometry is not None: self.idc = geometry.index_of_difficulty
+        if fs not in self._coeffs: self._coeffs[fs] = CausalLowpass.design(self.cutoff, fs)
+        self._fx, self._fy, self._fp = (CausalLowpass(*self._coeffs[fs]) for _ in range(3))
+        self.n = 0; self.t_rel_first = 0.0; self.t_rel_last = 0.0
+        self.off_mean = 0.0; self.off_m2 = 0.0; self.p_mean = 0.0; self.p_m2 = 0.0
+        self.path_length = 0.0
+        # Différences d'ordre 3 en pixels, mises à l'échelle par le pas moyen à la fin (même convention que np.gradient)
+        self.d3_sum = 0.0; self.d3_sq_sum = 0.0; self.n_d3 = 0
+        self.n_out = 0
+        self._hist = []     # 7 dernières positions : dérivée centrée appliquée trois fois = (x[+3] - 3x[+1] + 3x[-1] - x[-3]) / 8
+
+    def update(self, t_rel, x, y, p_raw, thickness):
+        x = self._fx(x); y = self._fy(y); p_raw = self._fp(p_raw)
+        dist, _, half_w, offset = self.geometry.locate(x, y)
+        is_out = (dist + thickness / 2) > half_w
+        if self.n == len(self._offsets):
+            grown = np.empty(2 * len(self._offsets)); grown[:self.n] = self._offsets; self._offsets = grown
+        self._offsets[self.n] = offset
+        self.n += 1
+        if self.n == 1: self.t_rel_first = t_rel
+        self.t_rel_last = t_rel
+
+        # Welford : moyenne et somme des carrés des écarts, sans conserver l'historique
+        d = offset - self.off_mean; self.off_mean += d / self.n; self.off_m2 += d * (offset - self.off_mean)
+        d = p_raw - self.p_mean; self.p_mean += d / self.n; self.p_m2 += d * (p_raw - self.p_mean)
+        self.n_out += is_out
+
+        hist = self._hist
+        if hist: self.path_length += math.hypot(x - hist[-1][0], y - hist[-1][1])
+        hist.append((x, y))
+        if len(hist) > 7: del hist[0]
+        if len(hist) == 7:
+            (xa, ya), _, (xb, yb), _, (xc, yc), _, (xd, yd) = hist
+            d3 = math.hypot(xd - 3 * xc + 3 * xb - xa, yd - 3 * yc + 3 * yb - ya) / 8
+            self.d3_sum += d3; self.d3_sq_sum += d3 * d3; self.n_d3 += 1
+
+    def finish(self):
+        # Ligne complète dans l'ordre de FEATURE_COLUMNS
+        n = self.n
+        if n < 5: return None
+        duration = self.t_rel_last - self.t_rel_first
+        sigma = math.sqrt(self.off_m2 / n)
+        Te = 4.133 * sigma
+        ref = self.ref_length if self.ref_length is not None else 2 * math.pi * (self.ref_radius + self.off_mean)
+        IDe = math.log2(ref / Te) if Te > 0 and ref > 0 else 0.0
+        IPe = IDe / duration if duration > 0 else 0.0
+        dt = duration / (n - 1) if duration > 0 else 1 / 120.0
+        mean_jerk = self.d3_sum / self.n_d3 / dt ** 3 if self.n_d3 else 0.0
+        if self.path_length > 0 and duration > 0:
+            arg_log = (duration ** 5 / self.path_length ** 2) * self.d3_sq_sum / dt ** 5
+            ldlj = math.log(arg_log) if arg_log > 1e-9 else 0.0
+        else: ldlj = 0.0
+        f95, tremor_power, tremor_pct = spectral_features(self._offsets[:n], [0], [n], 1 / dt)[0]
+        return [IDe, IPe, duration, mean_jerk, ldlj, f95, self.n_out / n * 100, Te,
+                self.idc, self.path_length, self.path_length / duration if duration > 0 else 0.0, math.sqrt(self.p_m2 / n),
+                tremor_power, tremor_pct]
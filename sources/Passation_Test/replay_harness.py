@@ -0,0 +1,196 @@
+# replay_harness.py - Banc de test sans écran de SteeringExpe (rejeu de flux stylet + mesures de timing)
+# Exemples :
+#   python replay_harness.py --trials 4 --rate 200
+#   python replay_harness.py --raw ../../data/raw/P01_RAW.cols --rate 120 --json bench.json
+import sys, os, time, math, json, argparse, tempfile
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import Qt, QTimer, QPointF, QEvent
+from PyQt6.QtGui import QTabletEvent, QPointingDevice
+from PyQt6.QtTest import QTest
+
+import steering_task as st
+from columnar_store import read_frame
+
+# --- FLUX STYLET ---
+class SyntheticStream:
+    """Un tour de cercle à vitesse constante, bruit gaussien sur la position et la pression."""
+    def __init__(self, lap_time=3.0, noise_px=1.5, noise_p=0.01, seed=0):
+        self.lap_time = lap_time; self.noise_px = noise_px; self.noise_p = noise_p
+        self.rng = np.random.default_rng(seed)
+
+    def start_trial(self):
+        pass
+
+    def sample(self, tau, R, p_target):
+        # Départ sur la croix (bas de l'écran) puis rotation ; on dépasse légèrement le tour pour le déclencher
+        angle = math.pi / 2 + 2 * math.pi * 1.02 * tau / self.lap_time
+        dx, dy = R * math.cos(angle), R * math.sin(angle)
+        n = self.rng.normal(0, 1, 3)
+        return dx + n[0] * self.noise_px, dy + n[1] * self.noise_px, min(max(p_target + n[2] * self.noise_p, 0.0), 1.0)
+
+class RecordedStream:
+    """Essais d'un RAW (*_RAW.cols ou *_RAW.csv) rejoués l'un après l'autre (interpolés à l'instant demandé, recentrés et remis à l'échelle R)."""
+    def __init__(self, path):
+        df = read_frame(path)
+        keys = [k for k in ["Bloc", "Trial_in_Bloc"] if k in df.columns]
+        self.trials = []
+        for _, d in (df.groupby(keys, sort=False, observed=True) if keys else [(None, df)]):
+            d = d.sort_values("Time_Abs")
+            x, y = d["X"].values, d["Y"].values
+            cx, cy = (x.max() + x.min()) / 2, (y.max() + y.min()) / 2
+            r_rec = d["R"].iloc[0] if "R" in d.columns else np.mean(np.hypot(x - cx, y - cy))
+            p = d["P_Raw"].values / st.CONFIG["RAW_MAX"] if "P_Raw" in d.columns else np.full(len(d), 0.4)
+            self.trials.append((d["Time_Rel"].values - d["Time_Rel"].values[0], (x - cx) / r_rec, (y - cy) / r_rec, p))
+        if not self.trials: raise ValueError(f"Aucun essai exploitable dans {path}")
+        self.k = -1
+
+    def start_trial(self):
+        self.k = (self.k + 1) % len(self.trials)
+
+    def sample(self, tau, R, p_target):
+        t, ux, uy, p = self.trials[self.k]
+        # L'essai enregistré finit pile au tour complet : on reboucle pour que le rejeu (démarré un peu plus tard,
+        # après détection du mouvement) termine aussi son tour
+        if t[-1] > 0: tau = tau % t[-1]
+        return R * np.interp(tau, t, ux), R * np.interp(tau, t, uy), float(np.interp(tau, t, p))
+
+# --- EXPÉRIENCE INSTRUMENTÉE ---
+class BenchExpe(st.SteeringExpe):
+    """SteeringExpe dont la boucle, le rendu, la capture et la fin d'essai sont chronométrés de l'extérieur."""
+    def __init__(self, settings):
+        self.tick_t = []; self.paint_s = []; self.end_trial_s = []
+        self.captured = 0; self.recorded_trials = 0
+        super().__init__(settings)
+
+    def game_loop(self):
+        self.tick_t.append(time.perf_counter()); super().game_loop()
+
+    def paintEvent(self, e):
+        t0 = time.perf_counter(); super().paintEvent(e); self.paint_s.append(time.perf_counter() - t0)
+
+    def collect_data(self, *args, **kwargs):
+        self.captured += 1; super().collect_data(*args, **kwargs)
+
+    def end_trial(self, timeout=False):
+        recorded = not self.is_practice
+        t0 = time.perf_counter(); super().end_trial(timeout)
+        if recorded: self.end_trial_s.append(time.perf_counter() - t0); self.recorded_trials += 1
+
+# --- PILOTE : INJECTION DES ÉVÉNEMENTS TABLETTE ---
+class ReplayDriver:
+    def __init__(self, app, ex, stream, rate, n_trials, max_s):
+        self.app = app; self.ex = ex; self.stream = stream; self.period = 1.0 / rate
+        self.n_trials = n_trials; self.deadline = time.perf_counter() + max_s
+        self.device = QPointingDevice.primaryPointingDevice()
+        self.prev_state = None; self.rec_t0 = 0.0; self.next_emit = time.perf_counter()
+        self.injected = 0; self.captured_t0 = 0; self.trials = []
+        self.timer = QTimer(); self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.tick); self.timer.start(1)
+
+    def tick(self):
+        ex = self.ex; now = time.perf_counter()
+        if ex.state != self.prev_state: self.on_state_change(self.prev_state, ex.state, now)
+        if ex.state == "PRACTICE_END": QTest.keyClick(ex, Qt.Key.Key_Space)
+        if ex.state == "END" or ex.recorded_trials >= self.n_trials or now > self.deadline:
+            self.timer.stop(); ex.close(); self.app.quit(); return
+
+        # Rattrapage à cadence exacte : autant d'événements que de périodes écoulées depuis le dernier tick
+        if now - self.next_emit > 0.25: self.next_emit = now
+        while self.next_emit <= now:
+            self.emit(self.next_emit); self.next_emit += self.period
+
+    def on_state_change(self, old, new, now):
+        if new == "RECORDING":
+            self.rec_t0 = now; self.stream.start_trial(); self.injected = 0; self.captured_t0 = self.ex.captured
+        if old == "RECORDING":
+            self.trials.append({"Practice": bool(self.ex.is_practice and new == "PRACTICE_END"),
+                                "Injected": self.injected, "Captured": self.ex.captured - self.captured_t0})
+        self.prev_state = new
+
+    def emit(self, t_emit):
+        ex = self.ex; cx, cy = ex.width() / 2, ex.height() / 2
+        trial = ex.sequence[min(ex.seq_index, len(ex.sequence) - 1)]; R = trial["R"]
+        p_target = st.CONFIG["TARGET_RAW"] / st.CONFIG["RAW_MAX"]
+        if ex.state == "RECORDING":
+            dx, dy, p = self.stream.sample(t_emit - self.rec_t0, R, p_target); self.injected += 1
+        else:
+            dx, dy, p = 0.0, R, p_target    # Immobile sur la croix de départ
+        pos = QPointF(cx + dx, cy + dy)
+        ev = QTabletEvent(QEvent.Type.TabletMove, self.device, pos, pos, p, 0.0, 0.0, 0.0, 0.0, 0.0,
+                          Qt.KeyboardModifier.NoModifier, Qt.MouseButton.LeftButton, Qt.MouseButton.LeftButton)
+        QApplication.sendEvent(ex, ev)
+
+# --- RAPPORT ---
+def pct(values, scale=1000.0):
+    a = np.asarray(values, dtype=float) * scale
+    if a.size == 0: return {"n": 0}
+    return {"n": int(a.size), "mean": round(float(a.mean()), 3), "p50": round(float(np.percentile(a, 50)), 3),
+            "p95": round(float(np.percentile(a, 95)), 3), "p99": round(float(np.percentile(a, 99)), 3), "max": round(float(a.max()), 3)}
+
+def summarise(ex, driver):
+    intervals = np.diff(ex.tick_t); nominal = ex.timer.interval() / 1000.0
+    recorded = [t for t in driver.trials if not t["Practice"]]
+    inj = sum(t["Injected"] for t in recorded); cap = sum(t["Captured"] for t in recorded)
+    return {
+        "mode": "event" if st.CONFIG["EVENT_CAPTURE"] else "poll",
+        "tick_interval_ms": pct(intervals), "tick_jitter_ms": pct(np.abs(intervals - nominal)),
+        "paint_ms": pct(ex.paint_s), "end_trial_ms": pct(ex.end_trial_s),
+        "samples_injected": inj, "samples_captured": cap,
+        "capture_ratio": round(cap / inj, 4) if inj else None,
+        "writer_max_depth": ex.writer.max_depth, "trials": driver.trials
+    }
+
+def print_report(rep):
+    print(f"\n=== BANC SteeringExpe ({rep['mode']}) ===")
+    for key, label in [("tick_interval_ms", "Intervalle tick"), ("tick_jitter_ms", "Gigue tick"),
+                       ("paint_ms", "paintEvent"), ("end_trial_ms", "end_trial")]:
+        s = rep[key]
+        if s["n"]: print(f"{label:<16}: n={s['n']:<6} p50={s['p50']:.3f} p95={s['p95']:.3f} p99={s['p99']:.3f} max={s['max']:.3f} ms")
+    print(f"Échantillons     : {rep['samples_captured']} capturés / {rep['samples_injected']} injectés (ratio {rep['capture_ratio']})")
+    print(f"File d'écriture  : profondeur max {rep['writer_max_depth']}")
+
+def run(args):
+    st.DATA_RAW_PATH = args.out or tempfile.mkdtemp(prefix="haptimed_bench_")
+    os.makedirs(st.DATA_RAW_PATH, exist_ok=True)     # --out vers un dossier absent : créé avant le journal de session
+    st.CONFIG["EVENT_CAPTURE"] = args.mode == "event"
+    st.CONFIG["TRAJ_CACHE"] = not args.no_cache
+    st.CONFIG["TEMPS_REPOS"] = args.rest; st.CONFIG["TEMPS_DECOMPTE"] = args.countdown
+    st.CONFIG["RESUME_SESSION"] = False     # Chaque banc tire sa propre séquence, même si --out est réutilisé
+    # Les consignes modales bloqueraient la boucle d'événements : acceptées d'office
+    st.InstructionDialog.exec = lambda self: 1
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    ex = BenchExpe({"ID": "BENCH", "TARGET": st.CONFIG["TARGET_RAW"], "TOL_PCT": st.CONFIG["FORCE_TOLERANCE_PCT"], "REPS": args.reps})
+    if args.feedback is not None:
+        for trial in ex.sequence: trial["Feedback"] = args.feedback == "on"
+    ex.show()
+    stream = RecordedStream(args.raw) if args.raw else SyntheticStream(lap_time=args.lap_time, seed=args.seed)
+    driver = ReplayDriver(app, ex, stream, args.rate, args.trials, args.max_time)
+    app.exec()
+
+    rep = summarise(ex, driver); rep["data_dir"] = st.DATA_RAW_PATH
+    print_report(rep)
+    if args.json:
+        with open(args.json, "w") as f: json.dump(rep, f, indent=2)
+    return rep
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rejeu headless de SteeringExpe et mesures de timing de la boucle d'acquisition.")
+    parser.add_argument("--raw", help="RAW à rejouer, *_RAW.cols ou *_RAW.csv (sinon flux synthétique)")
+    parser.add_argument("--rate", type=float, default=200.0, help="Cadence d'injection des événements stylet (Hz)")
+    parser.add_argument("--trials", type=int, default=4, help="Nombre d'essais enregistrés avant arrêt")
+    parser.add_argument("--reps", type=int, default=2, help="Répétitions par condition (séquence générée)")
+    parser.add_argument("--mode", choices=["event", "poll"], default="event", help="Capture événementielle ou échantillonnage au timer")
+    parser.add_argument("--feedback", choices=["on", "off"], help="Force le feedback visuel pour tous les essais")
+    parser.add_argument("--no-cache", action="store_true", help="Désactive le calque de tracé (rendu complet à chaque frame)")
+    parser.add_argument("--lap-time", type=float, default=3.0, help="Durée d'un tour du flux synthétique (s)")
+    parser.add_argument("--rest", type=float, default=0.2, help="TEMPS_REPOS pendant le banc (s)")
+    parser.add_argument("--countdown", type=float, default=0.1, help="Durée d'un pas de décompte pendant le banc (s)")
+    parser.add_argument("--max-time", type=float, default=300.0, help="Durée maximale du banc (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Dossier de sortie des CSV (défaut : dossier temporaire)")
+    parser.add_argument("--json", help="Écrit le rapport au format JSON")
+    run(parser.parse_args())
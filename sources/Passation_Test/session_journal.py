@@ -0,0 +1,76 @@
+# session_journal.py - Journal de session en ajout seul : planning tiré au sort + essais terminés, reprise après crash
+import os
+import json
+import glob
+from columnar_store import ColumnStore, is_store
+
+class SessionJournal:
+    """{ID}_SESSION.jsonl : un enregistrement JSON par ligne.
+
+    - "start"  : séquence complète (chemins de tunnel dédoublonnés) et réglages du participant
+    - "trial"  : essai enregistré (Seq_Index), écrit par TrialWriter.commit après le fsync de ses données
+    - "resume" / "end" : reprise d'une session interrompue / fin de la séquence
+    Chaque validation porte la taille des fichiers du participant ("Sizes") : à la reprise, tout ce qui a été
+    écrit après la dernière validation (essai à moitié écrit) est tronqué, sans relire les RAW. Pour une table
+    colonne (.cols), la taille est son nombre de lignes.
+    "start" et "resume" sont écrits directement (write) : une session ne démarre jamais sans journal.
+    """
+    def __init__(self, out_dir, pid):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir; self.pid = pid
+        self.name = f"{pid}_SESSION.jsonl"; self.path = os.path.join(out_dir, self.name)
+
+    def write(self, record):
+        # Ajout synchrone + fsync, avant toute écriture de la file (TrialWriter) ; OSError propagée à l'appelant
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + "\n"); f.flush(); os.fsync(f.fileno())
+
+    def start_record(self, sequence, settings):
+        paths, keys, seq = [], {}, []
+        for trial in sequence:
+            trial = dict(trial)
+            if "Path" in trial:
+                k = json.dumps(trial["Path"], sort_keys=True)
+                if k not in keys: keys[k] = len(paths); paths.append(trial["Path"])
+                trial["Path"] = keys[k]
+            seq.append(trial)
+        return {"Event": "start", "Settings": settings, "Sequence": seq, "Paths": paths, "Sizes": self.file_sizes()}
+
+    def file_sizes(self):
+        # Fichiers déjà présents pour ce participant (sessions précédentes) : la reprise ne doit pas y toucher
+        return {os.path.basename(p): ColumnStore(p).rows if is_store(p) else os.path.getsize(p)
+                for p in glob.glob(os.path.join(self.out_dir, f"{self.pid}_*"))
+                if os.path.basename(p) != self.name and (is_store(p) or os.path.isfile(p))}
+
+    def load(self):
+        # Dernière session du journal -> dict (sequence, settings, next_index, sizes, finished), ou None
+        if not os.path.exists(self.path): return None
+        state = None; self.valid_size = 0
+        with open(self.path, 'rb') as f:
+            for raw in f:
+                if not raw.endswith(b"\n"): break          # Dernière ligne tronquée par le crash
+                try: rec = json.loads(raw)
+                except ValueError: break
+                self.valid_size += len(raw); ev = rec.get("Event")
+                if ev == "start":
+                    seq = [dict(t, Path=rec["Paths"][t["Path"]]) if "Path" in t else t for t in rec["Sequence"]]
+                    state = {"sequence": seq, "settings": rec["Settings"], "next_index": 0, "sizes": dict(rec["Sizes"]), "finished": False}
+                elif state is None: continue
+                elif ev == "trial": state["next_index"] = max(state["next_index"], rec["Seq_Index"] + 1); state["sizes"].update(rec["Sizes"])
+                elif ev == "end": state["finished"] = True
+        return state
+
+    def restore(self, state):
+        # Ramène chaque fichier du participant à sa taille validée (fichier créé après la validation -> vidé)
+        if os.path.getsize(self.path) > self.valid_size:
+            with open(self.path, 'r+b') as f: f.truncate(self.valid_size)
+        truncated = []
+        for name, size in self.file_sizes().items():
+            committed = state["sizes"].get(name, 0)
+            if size > committed:
+                path = os.path.join(self.out_dir, name)
+                if is_store(path): ColumnStore(path).truncate(committed)
+                else:
+                    with open(path, 'r+b') as f: f.truncate(committed)
+                truncated.append(name)
+        return truncated
@@ -0,0 +1,101 @@
+# spectral.py - Spectres de puissance de nombreux essais à la fois (FFT réelle) : F95 et puissance du tremblement
+# Partagé par online_features (fin d'essai) et process_data (tous les essais d'un participant en quelques appels).
+import os
+import pickle
+import hashlib
+import numpy as np
+
+SPECTRAL_COLUMNS = ["F95", "Tremor_Power", "Tremor_Pct"]
+SPECTRAL_VERSION = 1            # Clé du cache par essai : à incrémenter si une définition change
+TREMOR_BAND_HZ = (8.0, 12.0)    # Tremblement physiologique (process_data : rayon non filtré, au-dessus du passe-bas)
+WELCH_NPERSEG = 256             # ~2 s à 125 Hz : résolution ~0.5 Hz ; essais plus courts -> périodogramme
+SPECTRAL_METHODS = ("periodogram", "welch")
+
+def fft_length(n):
+    # Longueur FFT partagée : puissance de 2 >= n (les essais de longueurs voisines passent dans le même appel)
+    return 1 << max(int(n) - 1, 1).bit_length()
+
+def trial_key(signal, fs, method):
+    # Empreinte d'un essai pour le cache (signal, cadence, méthode, version des définitions)
+    h = hashlib.blake2b(np.ascontiguousarray(signal, dtype=float).tobytes(), digest_size=16)
+    h.update(f"{float(fs):.6f}|{method}|{SPECTRAL_VERSION}|{TREMOR_BAND_HZ}|{WELCH_NPERSEG}".encode())
+    return h.hexdigest()
+
+class SpectrumCache:
+    """Résultats par essai {empreinte: ligne}, conservés d'un passage à l'autre dans un fichier pickle.
+
+    save() ne garde que les essais consultés ou calculés pendant ce passage : le fichier ne grossit pas.
+    """
+    def __init__(self, path=None):
+        self.path = path; self.rows = {}; self.seen = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f: self.rows = pickle.load(f)
+            except Exception: self.rows = {}
+
+    def get(self, key):
+        row = self.rows.get(key)
+        if row is not None: self.seen[key] = row
+        return row
+
+    def put(self, key, row):
+        self.rows[key] = self.seen[key] = row
+
+    def save(self):
+        if not self.path: return
+        tmp = self.path + ".tmp"
+        with open(tmp, 'wb') as f: pickle.dump(self.seen, f)
+        os.replace(tmp, self.path)
+
+def _periodogram(block, lens):
+    # block (essais, nfft) centré et complété par des zéros -> puissance unilatérale par raie, normalisée par la
+    # longueur réelle : la somme des raies vaut la variance du signal, quelle que soit la longueur FFT
+    nfft = block.shape[1]
+    return 2 * np.abs(np.fft.rfft(block, axis=1)) ** 2 / (lens[:, None] * nfft)
+
+def _welch(block, lens):
+    # Welch (fenêtre de Hann, recouvrement 50 %, moyenne retirée par segment) sur tous les essais à la fois :
+    # seuls les segments entièrement dans l'essai comptent dans la moyenne
+    step = WELCH_NPERSEG // 2; win = np.hanning(WELCH_NPERSEG + 1)[:-1]
+    segs = np.lib.stride_tricks.sliding_window_view(block, WELCH_NPERSEG, axis=1)[:, ::step]
+    valid = (np.arange(segs.shape[1]) * step + WELCH_NPERSEG)[None, :] <= lens[:, None]
+    segs = (segs - segs.mean(axis=2, keepdims=True)) * win
+    spec = np.abs(np.fft.rfft(segs, axis=2)) ** 2 * valid[:, :, None]
+    # Même échelle que le périodogramme (puissance par raie)
+    return 2 * spec.sum(axis=1) / valid.sum(axis=1)[:, None] / ((win ** 2).sum() * WELCH_NPERSEG)
+
+def spectral_features(values, starts, ends, fs, method="periodogram", cache=None):
+    # Essais values[starts[i]:ends[i]] échantillonnés à fs[i] -> tableau (essais, 3) dans l'ordre de SPECTRAL_COLUMNS.
+    # Composante continue et fréquence de Nyquist exclues (comme l'ancien calculate_f95). cache : SpectrumCache
+    if method not in SPECTRAL_METHODS: raise ValueError(f"Méthode spectrale inconnue : {method}")
+    starts = np.asarray(starts); ends = np.asarray(ends); fs = np.broadcast_to(np.asarray(fs, dtype=float), starts.shape)
+    out = np.zeros((len(starts), len(SPECTRAL_COLUMNS))); keys = {}; groups = {}
+    for i, (a, b) in enumerate(zip(starts, ends)):
+        if b - a < 2: continue
+        if cache is not None:
+            keys[i] = trial_key(values[a:b], fs[i], method); row = cache.get(keys[i])
+            if row is not None: out[i] = row; continue
+        use_welch = method == "welch" and b - a >= WELCH_NPERSEG
+        nfft = WELCH_NPERSEG if use_welch else fft_length(b - a)
+        groups.setdefault((use_welch, nfft), []).append(i)
+
+    lo, hi = TREMOR_BAND_HZ
+    for (use_welch, nfft), idx in groups.items():
+        idx = np.asarray(idx); lens = (ends[idx] - starts[idx]).astype(float)
+        width = int(lens.max()) if use_welch else nfft
+        block = np.zeros((len(idx), width))
+        for r, i in enumerate(idx):
+            seg = np.asarray(values[starts[i]:ends[i]], dtype=float); block[r, :len(seg)] = seg - seg.mean()
+        psd = _welch(block, lens) if use_welch else _periodogram(block, lens)
+        psd = psd[:, 1:(nfft + 1) // 2]                                  # Fréquences > 0 et < fs/2
+        freqs = np.arange(1, psd.shape[1] + 1)[None, :] * (fs[idx] / nfft)[:, None]
+        cum = np.cumsum(psd, axis=1); total = cum[:, -1]
+        i95 = np.minimum((cum < 0.95 * total[:, None]).sum(axis=1), psd.shape[1] - 1)
+        band = np.where((freqs >= lo) & (freqs <= hi), psd, 0).sum(axis=1)
+        rows = np.column_stack([freqs[np.arange(len(idx)), i95],
+                                band,                                          # Puissance dans la bande (unité du signal ^ 2)
+                                np.where(total > 0, band / np.where(total > 0, total, 1) * 100, 0.0)])
+        out[idx] = rows
+        if cache is not None:
+            for r, i in enumerate(idx): cache.put(keys[i], rows[r])
+    return out
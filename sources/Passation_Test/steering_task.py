@@ -1,10 +1,16 @@
-import sys, os, math, time, csv, random
+import sys, os, math, time, random, json
 import numpy as np
 from PyQt6.QtWidgets import (QApplication, QWidget, QDialog, QFormLayout, QSpinBox, 
                              QLineEdit, QDialogButtonBox, QVBoxLayout, QLabel)
 from PyQt6.QtCore import Qt, QTimer, QPointF
-from PyQt6.QtGui import QPainter, QPen, QColor, QFont, QTabletEvent
+from PyQt6.QtGui import QPainter, QPen, QColor, QFont, QTabletEvent, QPixmap, QPolygonF
 from PyQt6.QtMultimedia import QSoundEffect
+from acquisition import LapTracker, SampleBuffer, StylusQueue
+from trial_writer import TrialWriter
+from timing_profiler import TrialProfiler, TIMING_COLUMNS
+from tunnel_geometry import TunnelGeometry
+from online_features import OnlineFeatures, FEATURE_COLUMNS, FEATURE_VERSION
+from session_journal import SessionJournal
 
 os.environ["QT_AUTO_SCREEN_SCALE_FACTOR"] = "0"
 os.environ["QT_ENABLE_HIGHDPI_SCALING"] = "0"
@@ -15,6 +21,8 @@ DATA_RAW_PATH = os.path.join(BASE_DIR, "data", "raw")
 if not os.path.exists(DATA_RAW_PATH):
     os.makedirs(DATA_RAW_PATH, exist_ok=True)
 
+# Cercle par défaut ; une clé "Path" optionnelle (spécification TunnelGeometry.to_dict(), coordonnées relatives
+# au centre de l'écran) décrit un chemin quelconque à largeur variable W(s)
 TUNNEL_LEVELS = [{"R": 350, "W": 5}] 
 
 CONFIG = {
@@ -27,12 +35,25 @@ CONFIG = {
     "MAX_THICKNESS": 25,        # Épaisseur si la pression est au max (RAW_MAX)
     "TEMPS_MAX_ESSAI": 15, 
     "TEMPS_REPOS": 3, 
+    "TEMPS_DECOMPTE": 1.0,      # Durée de chaque pas du décompte 3-2-1 (s)
     "TEMPS_PAUSE_LONGUE": 20,
     "REPS_PER_ID": 10,          
     "STATIONARY_DELAY": 0.5, 
-    "VELOCITY_THRESHOLD": 10.0
+    "VELOCITY_THRESHOLD": 10.0,
+    "EXPECTED_RATE_HZ": 250,    # Dimensionne le buffer d'échantillons (TEMPS_MAX_ESSAI x cadence)
+    "TRAJ_CACHE": True,         # Tracé de feedback peint de façon incrémentale dans un calque hors écran
+    "TRAJ_WIDTH_STEP": 0.5,     # Quantification de l'épaisseur (px) pour regrouper les changements de stylo
+    "WRITER_WARN_DEPTH": 4,     # Alerte console si la file d'écriture disque dépasse ce nombre de demandes
+    "EVENT_CAPTURE": True,      # Un échantillon par QTabletEvent (horodatage tablette) au lieu d'un par tick du timer
+    "PROFILING": True,          # Histogrammes de timing par essai -> {ID}_TIMING.csv
+    "GRID_CELL": 2.0,           # Pas (px) de la grille de distance précalculée du tunnel
+    "RESUME_SESSION": True,     # Reprend une session interrompue ({ID}_SESSION.jsonl) au lieu de tirer une nouvelle séquence
+    "RAW_FORMAT": "columnar"    # "columnar" : {ID}_RAW.cols (un .npy par colonne, voir columnar_store.py) ; "csv" : {ID}_RAW.csv
 }
 
+# Colonnes constantes d'un essai, placées devant les champs de acquisition.RAW_DTYPE dans le RAW
+RAW_PREFIX = ["ID", "Bloc", "IDc_Lvl", "Rep_Geo", "R", "W", "Trial_in_Bloc"]
+
 # --- ÉTAPE 1 : CONFIGURATION DU PARTICIPANT ---
 class ConfigDialog(QDialog):
     def __init__(self):
@@ -125,11 +146,51 @@ class InstructionDialog(QDialog):
         layout.addWidget(btn)
         self.setLayout(layout)
 
+# --- CALQUE DU TRACÉ DE FEEDBACK ---
+class TrajectoryLayer:
+    """Tracé déjà dessiné conservé dans un QPixmap : chaque frame ne peint que les nouveaux segments."""
+    def __init__(self):
+        self.pixmap = None; self.drawn = 0
+
+    def reset(self):
+        self.drawn = 0
+        if self.pixmap is not None: self.pixmap.fill(Qt.GlobalColor.transparent)
+
+    def render(self, p, traj, size):
+        if self.pixmap is None or self.pixmap.size() != size:
+            self.pixmap = QPixmap(size); self.reset()
+        n = len(traj)
+        if n < self.drawn: self.reset()   # Nouveau buffer (essai suivant) sans reset explicite
+        if n - self.drawn > 0 and n >= 2: self._paint_segments(traj, max(self.drawn - 1, 0), n)
+        self.drawn = n
+        p.drawPixmap(0, 0, self.pixmap)
+
+    def _paint_segments(self, traj, start, end):
+        xs, ys = traj["X"][start:end], traj["Y"][start:end]
+        step = CONFIG["TRAJ_WIDTH_STEP"]
+        # Style d'un segment = celui de son point de départ ; on regroupe les segments consécutifs de même style
+        ins = traj["InT"][start:end - 1]; widths = np.round(traj["Thickness"][start:end - 1] / step) * step
+        breaks = np.flatnonzero((ins[1:] != ins[:-1]) | (widths[1:] != widths[:-1])) + 1
+        bounds = [0] + breaks.tolist() + [len(ins)]
+
+        qp = QPainter(self.pixmap); qp.setRenderHint(QPainter.RenderHint.Antialiasing)
+        pen = QPen(); pen.setCapStyle(Qt.PenCapStyle.RoundCap); pen.setJoinStyle(Qt.PenJoinStyle.RoundJoin)
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            pen.setColor(QColor(Qt.GlobalColor.green if ins[a] else Qt.GlobalColor.red)); pen.setWidthF(float(widths[a]))
+            qp.setPen(pen)
+            qp.drawPolyline(QPolygonF([QPointF(xs[k], ys[k]) for k in range(a, b + 1)]))
+        qp.end()
+
 # --- ÉTAPE 3 : L'EXPÉRIENCE ---
 class SteeringExpe(QWidget):
     def __init__(self, s):
         super().__init__()
         self.pid = s["ID"] if s["ID"] else "TEST"
+        # Session interrompue (crash, mise en veille) : même séquence, mêmes réglages, reprise à l'essai suivant
+        self.journal = SessionJournal(DATA_RAW_PATH, self.pid)
+        resume = self.journal.load() if CONFIG["RESUME_SESSION"] else None
+        if resume is not None and (resume["finished"] or resume["next_index"] >= len(resume["sequence"])): resume = None
+        if resume is not None: s = {**s, **resume["settings"]}
         CONFIG["TARGET_RAW"] = s["TARGET"]
         CONFIG["FORCE_TOLERANCE_PCT"] = s["TOL_PCT"]
         CONFIG["REPS_PER_ID"] = s["REPS"]
@@ -143,41 +204,82 @@ class SteeringExpe(QWidget):
         self.beep = QSoundEffect(self)
         
         self.pos = QPointF(0,0); self.pressure = 0.0
-        self.buffer_raw = []; self.current_trajectory = [] 
-        
-        self.sequence = []
-        conditions = [("VP", False), ("VP", True), ("FVP", False), ("FVP", True)]
-        random.shuffle(conditions) 
+        self.samples = SampleBuffer(CONFIG["TEMPS_MAX_ESSAI"] * CONFIG["EXPECTED_RATE_HZ"])
+        self.lap_tracker = LapTracker()
+        self.online = OnlineFeatures(self.samples.capacity)
+        # Cadence des échantillons pour le filtre des métriques en ligne : nominale, puis mesurée sur l'essai précédent
+        self.sample_rate = CONFIG["EXPECTED_RATE_HZ"] if CONFIG["EVENT_CAPTURE"] else 125
+        self.traj_layer = TrajectoryLayer()
+        self.writer = TrialWriter(DATA_RAW_PATH); self.writer_errors_seen = 0
+        self.stylus_queue = StylusQueue(); self.clock_offset = None
+        self.geometries = {}; self.tunnel_pixmaps = {}; self.tunnel_json = {}; self._geo_last = None
         
-        for task, fb in conditions:
-            essais_bloc = []
-            for rep in range(CONFIG["REPS_PER_ID"]):
-                essais_bloc.append({
-                    "Task": task, "Feedback": fb, "IDc_Level": 1, 
-                    "R": TUNNEL_LEVELS[0]["R"], "W": TUNNEL_LEVELS[0]["W"], "Rep_Geo": rep + 1
-                })
-            random.shuffle(essais_bloc)
-            for index, essai in enumerate(essais_bloc): essai["Trial_in_Block"] = index + 1
-            self.sequence.extend(essais_bloc)
+        if resume is not None:
+            truncated = self.journal.restore(resume)
+            self.sequence = resume["sequence"]; self.seq_index = resume["next_index"]
+            self.journal.write({"Event": "resume", "Seq_Index": self.seq_index, "Truncated": truncated})
+            print(f"♻️ Reprise de la session {self.pid} : essai {self.seq_index + 1}/{len(self.sequence)}"
+                  + (f" (données non validées retirées de {', '.join(truncated)})" if truncated else ""))
+        else:
+            self.sequence = []
+            conditions = [("VP", False), ("VP", True), ("FVP", False), ("FVP", True)]
+            random.shuffle(conditions) 
             
-        self.seq_index = 0
+            for task, fb in conditions:
+                essais_bloc = []
+                for rep in range(CONFIG["REPS_PER_ID"]):
+                    essais_bloc.append({
+                        "Task": task, "Feedback": fb, "IDc_Level": 1, 
+                        "R": TUNNEL_LEVELS[0]["R"], "W": TUNNEL_LEVELS[0]["W"], "Rep_Geo": rep + 1
+                    })
+                    if "Path" in TUNNEL_LEVELS[0]: essais_bloc[-1]["Path"] = TUNNEL_LEVELS[0]["Path"]
+                random.shuffle(essais_bloc)
+                for index, essai in enumerate(essais_bloc): essai["Trial_in_Block"] = index + 1
+                self.sequence.extend(essais_bloc)
+                
+            self.seq_index = 0
+            self.journal.write(self.journal.start_record(self.sequence, s))    # Échec -> OSError : pas de session sans journal
         self.is_practice = True
         self.state = "WAIT_POS" 
         
         self.timer = QTimer(self); self.timer.timeout.connect(self.game_loop); self.timer.start(8)
+        self.profiler = TrialProfiler(self.timer.interval() / 1000.0) if CONFIG["PROFILING"] else None
         self.prev_t = time.perf_counter(); self.prev_pos = QPointF(0,0)
 
     def tabletEvent(self, e: QTabletEvent):
-        self.pressure = e.pressure(); self.pos = e.position(); e.accept()
+        self.pressure = e.pressure(); self.pos = e.position()
+        if CONFIG["EVENT_CAPTURE"]:
+            # Horodatage de l'événement (ms, horloge Qt) recalé sur perf_counter : on garde le décalage
+            # minimal observé, c.-à-d. celui de l'événement livré avec la latence la plus faible
+            now = time.perf_counter(); ts = e.timestamp() / 1000.0
+            if ts > 0:
+                off = now - ts
+                if self.clock_offset is None or off < self.clock_offset: self.clock_offset = off
+                t_evt = ts + self.clock_offset
+            else: t_evt = now
+            self.stylus_queue.push(t_evt, self.pos.x(), self.pos.y(), self.pressure, e.xTilt(), e.yTilt(), e.rotation())
+        e.accept()
+
+    # --- GÉOMÉTRIE DU TUNNEL ---
+    def tunnel(self):
+        # Géométrie de l'essai courant, construite (grille de distance comprise) une seule fois par taille d'écran
+        w, h = self.width(), self.height()
+        if self._geo_last is not None and self._geo_last[:3] == (self.seq_index, w, h): return self._geo_last[3]
+        trial = self.sequence[min(self.seq_index, len(self.sequence) - 1)]; path = trial.get("Path")
+        key = (trial["R"], trial["W"], json.dumps(path, sort_keys=True) if path else None, w, h)
+        geo = self.geometries.get(key)
+        if geo is None:
+            if path: geo = TunnelGeometry.from_dict(path).translated(w/2, h/2)
+            else: geo = TunnelGeometry.circle(w/2, h/2, trial["R"], trial["W"])
+            geo.build_grid(w, h, CONFIG["GRID_CELL"]); self.geometries[key] = geo
+        self._geo_last = (self.seq_index, w, h, geo)
+        return geo
 
     # --- MODIFICATION DE LA COULEUR ---
-    def get_pointer_color(self, px, py, R, W):
-        dist_c = math.sqrt((px - self.width()/2)**2 + (py - self.height()/2)**2)
-        erreur_radiale = abs(dist_c - R)
-        
+    def get_pointer_color(self, px, py):
         # Le trait devient toujours rouge si on sort du tunnel, 
         # sinon il reste vert. On n'utilise plus bleu/orange pour la force.
-        if erreur_radiale > (W / 2): return Qt.GlobalColor.red 
+        if not self.tunnel().inside(px, py): return Qt.GlobalColor.red 
         return Qt.GlobalColor.green
 
     # --- NOUVELLE FONCTION POUR CALCULER L'ÉPAISSEUR ---
@@ -192,11 +294,12 @@ class SteeringExpe(QWidget):
 
     def game_loop(self):
         t = time.perf_counter(); cx, cy = self.width()/2, self.height()/2
+        if self.profiler is not None and self.state == "RECORDING": self.profiler.on_tick(t)
         if self.state in ["WAIT_POS", "COUNTDOWN", "RECORDING"]: 
-            R = self.sequence[self.seq_index]["R"]; sy = cy + R 
+            sx, sy = self.tunnel().start
             
         if self.state == "WAIT_POS":
-            dist = math.sqrt((self.pos.x()-cx)**2 + (self.pos.y()-sy)**2)
+            dist = math.sqrt((self.pos.x()-sx)**2 + (self.pos.y()-sy)**2)
             current_force = self.pressure * CONFIG["RAW_MAX"]
             if dist < 30: 
                 force_ok = (self.f_min <= current_force <= self.f_max) if self.sequence[self.seq_index]["Task"] == "FVP" else (self.pressure > 0.05)
@@ -208,17 +311,20 @@ class SteeringExpe(QWidget):
             else: self.stationary_start_t = None
             
         elif self.state == "COUNTDOWN":
-            if t - self.timer_state >= 1.0:
+            if t - self.timer_state >= CONFIG["TEMPS_DECOMPTE"]:
                 self.cd_val -= 1; self.timer_state = t
                 if self.cd_val == 0: 
                     self.beep.play(); self.state = "RECORDING"
                     self.start_trial_time = t; self.movement_started = False
-                    self.buffer_raw = []; self.current_trajectory = []
+                    self.samples.reset(); self.lap_tracker.reset(); self.traj_layer.reset(); self.stylus_queue.clear()
+                    self.online.reset(self.tunnel(), self.sample_rate)
                     self.go_timer = t
+                    if self.profiler is not None: self.profiler.reset()
                     
         elif self.state == "RECORDING":
             if t - self.start_trial_time > CONFIG["TEMPS_MAX_ESSAI"]: self.end_trial(timeout=True)
-            else: self.collect_data(t)
+            elif CONFIG["EVENT_CAPTURE"]: self.drain_stylus()
+            else: self.collect_data(t, self.pos.x(), self.pos.y(), self.pressure)
             
         elif self.state == "REST":
             if t - self.timer_state >= CONFIG["TEMPS_REPOS"]: self.next_step()
@@ -226,15 +332,23 @@ class SteeringExpe(QWidget):
         elif self.state == "LONG_BREAK":
             if t - self.timer_state >= CONFIG["TEMPS_PAUSE_LONGUE"]: self.state = "WAIT_POS"
             
+        if self.state != "RECORDING": self.stylus_queue.clear()
         self.update()
 
-    def collect_data(self, t):
-        px, py = self.pos.x(), self.pos.y(); cx, cy = self.width()/2, self.height()/2
-        R = self.sequence[self.seq_index]["R"]; W = self.sequence[self.seq_index]["W"]
+    def drain_stylus(self):
+        # Tous les événements reçus depuis le tick précédent, chacun avec son propre horodatage
+        now = time.perf_counter()
+        for t_evt, px, py, pressure, x_tilt, y_tilt, rot in self.stylus_queue.drain().tolist():
+            if self.profiler is not None: self.profiler.add_latency(now - t_evt)
+            self.collect_data(t_evt, px, py, pressure, x_tilt, y_tilt, rot)
+            if self.state != "RECORDING": break
+
+    def collect_data(self, t, px, py, pressure, x_tilt=0.0, y_tilt=0.0, rot=0.0):
+        cx, cy = self.width()/2, self.height()/2
         task_type = self.sequence[self.seq_index]["Task"]
         
         # --- CALCUL DE L'ÉPAISSEUR DYNAMIQUE ---
-        thickness = self.get_pointer_thickness(self.pressure, task_type)
+        thickness = self.get_pointer_thickness(pressure, task_type)
         
         if not self.movement_started:
             dt = t - self.prev_t
@@ -243,54 +357,89 @@ class SteeringExpe(QWidget):
                 if v > CONFIG["VELOCITY_THRESHOLD"]: self.movement_started = True; self.actual_start_t = t
             self.prev_t = t; self.prev_pos = QPointF(px, py); return
             
-        dist_c = math.sqrt((px-cx)**2 + (py-cy)**2); erreur_radiale = abs(dist_c - R)
-        in_t = 1 if erreur_radiale <= (W / 2) else 0 
+        # Distance à la ligne centrale et abscisse curviligne : lecture de grille + projection locale, O(1)
+        geo = self.tunnel(); erreur_radiale, s_path, half_w, _ = geo.locate(px, py)
+        in_t = 1 if erreur_radiale <= half_w else 0 
         angle = math.atan2(py - cy, px - cx)
         
-        # On ne passe plus la pression à get_pointer_color
-        col = self.get_pointer_color(px, py, R, W)
-        
-        self.buffer_raw.append([t, t-self.actual_start_t, px, py, self.pressure * CONFIG["RAW_MAX"], thickness, erreur_radiale, in_t, angle])
-        self.current_trajectory.append((QPointF(px, py), thickness, col))
+        # La couleur du tracé se déduit de InT au moment du rendu (même test que get_pointer_color)
+        self.samples.append(t, t-self.actual_start_t, px, py, pressure * CONFIG["RAW_MAX"], thickness, erreur_radiale, in_t, angle, x_tilt, y_tilt, rot)
+        # Métriques finales (IDe, IPe, LDLJ, F95...) tenues à jour au fil de l'eau
+        self.online.update(t-self.actual_start_t, px, py, pressure * CONFIG["RAW_MAX"], thickness)
         
-        if len(self.buffer_raw) > 10:
-            angles = [row[8] for row in self.buffer_raw]
-            nLaps = abs(np.unwrap(angles)[-1] - np.unwrap(angles)[0]) / (2 * np.pi)
-            if nLaps >= 1.0: self.end_trial(timeout=False)
-
-    def safe_save(self, base_name, data_list, header):
-        path = os.path.join(DATA_RAW_PATH, base_name)
-        file_exists = os.path.isfile(path) and os.path.getsize(path) > 0
-        with open(path, 'a', newline='') as f:
-            w = csv.writer(f)
-            if not file_exists: w.writerow(header)
-            w.writerows(data_list)
+        # Phase le long du chemin déroulée en O(1) : plus de np.unwrap sur tout l'historique à chaque tick
+        if geo.closed:
+            nLaps = self.lap_tracker.update(geo.progress(s_path))
+            if self.lap_tracker.n > 10 and nLaps >= 1.0: self.end_trial(timeout=False)
+        elif geo.progress(s_path) >= 0.995: self.end_trial(timeout=False)
+
+    def safe_save(self, base_name, data_list, header, prefix=None):
+        # Non bloquant : l'écriture (et l'en-tête si le fichier est neuf) est faite par le thread TrialWriter
+        self.writer.submit(base_name, header, data_list, prefix)
+        if self.writer.depth > CONFIG["WRITER_WARN_DEPTH"]:
+            print(f"⚠️ Disque en retard : {self.writer.depth} écritures en attente (max {self.writer.max_depth})")
 
     def end_trial(self, timeout=False):
+        if len(self.samples) > 10:
+            span = self.samples.view()["Time_Rel"]; span = span[-1] - span[0]
+            if span > 0: self.sample_rate = max(10, int(round((len(self.samples) - 1) / span, -1)))
         if self.is_practice:
-            self.buffer_raw = []
-            self.current_trajectory = []
+            self.samples.reset()
             self.state = "PRACTICE_END"
             return
             
         t_info = self.sequence[self.seq_index]; bloc_id = f"{t_info['Task']}_{'FB' if t_info['Feedback'] else 'NoFB'}"
-        if self.buffer_raw:
-            raw_to_save = [[self.pid, bloc_id, t_info["IDc_Level"], t_info["Rep_Geo"], t_info["R"], t_info["W"], t_info["Trial_in_Block"]] + r for r in self.buffer_raw]
-            self.safe_save(f"{self.pid}_RAW.csv", raw_to_save, ["ID", "Bloc", "IDc_Lvl", "Rep_Geo", "R", "W", "Trial_in_Bloc", "Time_Abs", "Time_Rel", "X", "Y", "P_Raw", "Thickness", "Err_Radiale", "InT", "Angle"])
+        if len(self.samples):
+            # Copie unique de l'essai : le buffer est réutilisé dès l'essai suivant pendant que le thread écrit
+            data = self.samples.view().copy()
+            prefix = [self.pid, bloc_id, t_info["IDc_Level"], t_info["Rep_Geo"], t_info["R"], t_info["W"], t_info["Trial_in_Block"]]
+            if CONFIG["RAW_FORMAT"] == "columnar":
+                columns = {name: np.full(len(data), value) for name, value in zip(RAW_PREFIX, prefix)}
+                columns.update((name, data[name]) for name in data.dtype.names)
+                self.writer.submit_columns(f"{self.pid}_RAW.cols", columns)
+            else: self.safe_save(f"{self.pid}_RAW.csv", data, RAW_PREFIX + list(data.dtype.names), prefix=prefix)
             
-            data = np.array(self.buffer_raw); times, pressures, err_rad, in_t = data[:, 1], data[:, 4], data[:, 6], data[:, 7]
+            times, pressures, err_rad, in_t = data["Time_Rel"], data["P_Raw"], data["Err_Radiale"], data["InT"]
             score_row = [[self.pid, bloc_id, t_info["Task"], int(t_info["Feedback"]), t_info["IDc_Level"], t_info["R"], t_info["W"], t_info["Rep_Geo"], t_info["Trial_in_Block"], round(times[-1], 3), round(np.sqrt(np.mean(err_rad**2)), 2), round(np.mean(in_t) * 100, 1), round(np.mean(pressures), 1), round(np.std(pressures), 1), int(timeout)]]
             self.safe_save(f"{self.pid}_SCORES.csv", score_row, ["ID", "Bloc", "Task", "FB", "IDc_Lvl", "R", "W", "Rep_Geo", "Trial_in_Bloc", "MT", "RMSE", "Pct_InT", "Mean_Force", "Std_Force", "Timeout"])
+            # Géométrie sérialisée avec l'essai (JSON mis en cache : un chemin quelconque compte des milliers de points)
+            geo = self.tunnel()
+            if id(geo) not in self.tunnel_json:
+                self.tunnel_json[id(geo)] = f'"IDc": {round(geo.index_of_difficulty, 4)}, "Geometry": {json.dumps(geo.to_dict())}'
+            trial_key = json.dumps({"ID": self.pid, "Bloc": bloc_id, "Trial_in_Bloc": t_info["Trial_in_Block"]})
+            self.writer.submit_text(f"{self.pid}_TUNNEL.jsonl", [trial_key[:-1] + ", " + self.tunnel_json[id(geo)] + "}"])
+            features = self.online.finish()
+            if features is not None:
+                self.safe_save(f"{self.pid}_FEATURES.csv", [[self.pid, bloc_id, t_info["Trial_in_Block"], FEATURE_VERSION] + [round(v, 5) for v in features]],
+                               ["ID", "Bloc", "Trial_in_Bloc", "Feature_Version"] + FEATURE_COLUMNS)
+                f = dict(zip(FEATURE_COLUMNS, features))
+                print(f"📈 {bloc_id} essai {t_info['Trial_in_Block']} : MT={f['Duration']:.2f}s IDe={f['IDe']:.2f} IPe={f['IPe']:.2f} bit/s "
+                      f"LDLJ={f['LDLJ']:.1f} F95={f['F95']:.1f}Hz Err={f['Error_Rate']:.1f}%")
+            if self.profiler is not None:
+                timing_row = [[self.pid, bloc_id, t_info["Trial_in_Block"]] + self.profiler.summary()]
+                self.safe_save(f"{self.pid}_TIMING.csv", timing_row, ["ID", "Bloc", "Trial_in_Bloc"] + TIMING_COLUMNS)
+        # Point de reprise : validé par le thread d'écriture une fois les fichiers de l'essai sur disque
+        self.writer.commit(self.journal.name, {"Event": "trial", "Seq_Index": self.seq_index, "Bloc": bloc_id, "Trial_in_Bloc": t_info["Trial_in_Block"]})
             
-        self.current_trajectory = []; self.state = "REST"; self.timer_state = time.perf_counter()
+        self.samples.reset(); self.state = "REST"; self.timer_state = time.perf_counter()
+
+    def check_writer(self):
+        # Erreurs du thread d'écriture depuis le dernier contrôle : signalées à l'expérimentateur (essais non validés)
+        new = self.writer.errors[self.writer_errors_seen:]; self.writer_errors_seen += len(new)
+        for name, message in new: print(f"⚠️⚠️ ÉCRITURE EN ÉCHEC ({name}) : {message}")
+        if new: print(f"⚠️⚠️ {self.pid} : données non enregistrées, vérifier le dossier {DATA_RAW_PATH} avant de continuer")
+        return not new
 
     def next_step(self):
+        self.check_writer()
         old_bloc = (self.sequence[self.seq_index]["Task"], self.sequence[self.seq_index]["Feedback"])
         self.seq_index += 1
-        if self.seq_index >= len(self.sequence): self.state = "END"
+        if self.seq_index >= len(self.sequence):
+            self.state = "END"; self.writer.commit(self.journal.name, {"Event": "end"})
         else:
             new_bloc = (self.sequence[self.seq_index]["Task"], self.sequence[self.seq_index]["Feedback"])
             if old_bloc != new_bloc:
+                self.writer.sync()
                 instr = InstructionDialog(new_bloc[0], new_bloc[1], is_first=False)
                 instr.exec()
                 self.is_practice = True
@@ -299,9 +448,15 @@ class SteeringExpe(QWidget):
     def closeEvent(self, event):
         if self.state == "RECORDING" and not self.is_practice: 
             self.end_trial(timeout=True)
+        self.writer.close(); self.check_writer()
         event.accept()
 
     def paintEvent(self, e):
+        t0 = time.perf_counter()
+        self.paint_scene()
+        if self.profiler is not None and self.state == "RECORDING": self.profiler.add_paint(time.perf_counter() - t0)
+
+    def paint_scene(self):
         p = QPainter(self); p.setRenderHint(QPainter.RenderHint.Antialiasing); cx, cy = self.width()/2, self.height()/2
         
         if self.state == "END":
@@ -322,7 +477,7 @@ class SteeringExpe(QWidget):
             p.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, f"Essai terminé\n\nProchain essai dans : {time_left}")
             return
 
-        R = self.sequence[self.seq_index]["R"]; W = self.sequence[self.seq_index]["W"]
+        geo = self.tunnel()
         has_feedback = self.sequence[self.seq_index]["Feedback"]
         task_type = self.sequence[self.seq_index]["Task"]
         
@@ -334,19 +489,27 @@ class SteeringExpe(QWidget):
             p.setPen(Qt.GlobalColor.white)
             p.drawText(20, 40, f"Essai {self.seq_index + 1} / {len(self.sequence)}")
         
-        p.setPen(QPen(QColor(100, 100, 100), W)); p.drawEllipse(QPointF(cx, cy), R, R)
+        if geo.kind == "circle":
+            p.setPen(QPen(QColor(100, 100, 100), geo.spec["W"])); p.drawEllipse(QPointF(geo.spec["cx"], geo.spec["cy"]), geo.spec["R"], geo.spec["R"])
+        else:
+            p.drawPixmap(0, 0, self.get_tunnel_pixmap(geo))
         
-        if has_feedback:
-            for i in range(1, len(self.current_trajectory)):
-                p1, th1, col1 = self.current_trajectory[i-1]; p2, th2, col2 = self.current_trajectory[i]
-                p.setPen(QPen(col1, th1, Qt.PenStyle.SolidLine, Qt.PenCapStyle.RoundCap)); p.drawLine(p1, p2)
+        if has_feedback and CONFIG["TRAJ_CACHE"]:
+            self.traj_layer.render(p, self.samples.view(), self.size())
+        elif has_feedback:
+            traj = self.samples.view()
+            xs, ys, ths, ins = traj["X"], traj["Y"], traj["Thickness"], traj["InT"]
+            for i in range(1, len(traj)):
+                col1 = Qt.GlobalColor.green if ins[i-1] else Qt.GlobalColor.red
+                p.setPen(QPen(col1, float(ths[i-1]), Qt.PenStyle.SolidLine, Qt.PenCapStyle.RoundCap))
+                p.drawLine(QPointF(xs[i-1], ys[i-1]), QPointF(xs[i], ys[i]))
             
         if self.state in ["WAIT_POS", "COUNTDOWN", "RECORDING"]:
-            sy = cy + R; current_force = self.pressure * CONFIG["RAW_MAX"]
-            dist = math.sqrt((self.pos.x()-cx)**2 + (self.pos.y()-sy)**2)
+            sx, sy = geo.start; current_force = self.pressure * CONFIG["RAW_MAX"]
+            dist = math.sqrt((self.pos.x()-sx)**2 + (self.pos.y()-sy)**2)
             
             p.setPen(QPen(Qt.GlobalColor.gray, 2))
-            p.drawLine(QPointF(cx-15, sy), QPointF(cx+15, sy)); p.drawLine(QPointF(cx, sy-15), QPointF(cx, sy+15))
+            p.drawLine(QPointF(sx-15, sy), QPointF(sx+15, sy)); p.drawLine(QPointF(sx, sy-15), QPointF(sx, sy+15))
             
             color = Qt.GlobalColor.red 
             if dist < 30:
@@ -354,7 +517,7 @@ class SteeringExpe(QWidget):
                 if is_good_force: color = Qt.GlobalColor.green
                 
             p.setPen(QPen(color, 4))
-            p.drawLine(QPointF(cx-20, sy), QPointF(cx+20, sy)); p.drawLine(QPointF(cx, sy-20), QPointF(cx, sy+20))
+            p.drawLine(QPointF(sx-20, sy), QPointF(sx+20, sy)); p.drawLine(QPointF(sx, sy-20), QPointF(sx, sy+20))
             
             if self.state == "COUNTDOWN":
                 p.setPen(Qt.GlobalColor.yellow)
@@ -367,11 +530,31 @@ class SteeringExpe(QWidget):
         
         # --- MISE À JOUR DE L'AFFICHAGE DU POINTEUR EN DIRECT ---
         current_th = self.get_pointer_thickness(self.pressure, task_type)
-        col_pointer = self.get_pointer_color(self.pos.x(), self.pos.y(), R, W) if has_feedback else Qt.GlobalColor.lightGray
+        col_pointer = self.get_pointer_color(self.pos.x(), self.pos.y()) if has_feedback else Qt.GlobalColor.lightGray
         
         p.setBrush(col_pointer); p.setPen(QPen(Qt.GlobalColor.black, 1))
         p.drawEllipse(self.pos, current_th/2 + 2, current_th/2 + 2)
 
+    def resizeEvent(self, e):
+        # Grille de distance du tunnel construite dès que la taille de l'écran est connue, pas pendant un essai
+        # (showFullScreen() dans __init__ peut déclencher un redimensionnement avant la création de la séquence)
+        if hasattr(self, "seq_index"): self.tunnel()
+        super().resizeEvent(e)
+
+    def get_tunnel_pixmap(self, geo):
+        # Chemin quelconque : peint une seule fois par géométrie (polylignes regroupées par largeur arrondie au pixel)
+        pm = self.tunnel_pixmaps.get(id(geo))
+        if pm is None or pm.size() != self.size():
+            pm = QPixmap(self.size()); pm.fill(Qt.GlobalColor.transparent)
+            qp = QPainter(pm); qp.setRenderHint(QPainter.RenderHint.Antialiasing)
+            pts = np.vstack((geo.points, geo.points[:1])) if geo.closed else geo.points
+            widths = np.round(geo.widths); a = 0
+            for b in list(np.flatnonzero(widths[1:] != widths[:-1]) + 1) + [len(pts) - 1]:
+                qp.setPen(QPen(QColor(100, 100, 100), float(widths[a]), Qt.PenStyle.SolidLine, Qt.PenCapStyle.FlatCap, Qt.PenJoinStyle.RoundJoin))
+                qp.drawPolyline(QPolygonF([QPointF(x, y) for x, y in pts[a:b + 1]])); a = b
+            qp.end(); self.tunnel_pixmaps[id(geo)] = pm
+        return pm
+
     def keyPressEvent(self, e):
         if e.key() == Qt.Key.Key_Space:
             if self.state == "PRACTICE_END":
@@ -381,13 +564,15 @@ class SteeringExpe(QWidget):
             self.close()
 
 if __name__ == "__main__":
+    # Pas de fusion des événements tablette : chaque paquet du stylet doit atteindre tabletEvent
+    QApplication.setAttribute(Qt.ApplicationAttribute.AA_CompressTabletEvents, False)
     app = QApplication(sys.argv)
     d = ConfigDialog()
     if d.exec():
         settings = d.get_settings()
         ex = SteeringExpe(settings)
-        first = ex.sequence[0]
-        instr = InstructionDialog(first['Task'], first['Feedback'], is_first=True)
+        first = ex.sequence[ex.seq_index]
+        instr = InstructionDialog(first['Task'], first['Feedback'], is_first=ex.seq_index == 0)
         instr.exec()
         ex.show()
         sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,61 @@
+# timing_profiler.py - Instrumentation légère du timing (boucle, rendu, latence stylet) par essai
+import numpy as np
+
+# Colonnes du fichier {ID}_TIMING.csv (une ligne par essai enregistré, à côté de la ligne SCORES)
+TIMING_COLUMNS = ["Tick_Nominal_ms", "Ticks", "Tick_P50_ms", "Tick_P95_ms", "Tick_P99_ms", "Missed_Ticks",
+                  "Paint_P50_ms", "Paint_P95_ms", "Paint_P99_ms", "Lat_P50_ms", "Lat_P95_ms", "Lat_P99_ms"]
+
+class FixedHistogram:
+    """Histogramme à pas fixe (+ case de débordement) : ajout O(1), aucune allocation pendant l'essai."""
+    __slots__ = ("width", "counts", "n")
+
+    def __init__(self, width_s=0.0001, max_s=0.1):
+        self.width = width_s
+        self.counts = [0] * (int(round(max_s / width_s)) + 1)
+        self.n = 0
+
+    def reset(self):
+        for i in range(len(self.counts)): self.counts[i] = 0
+        self.n = 0
+
+    def add(self, value):
+        i = int(value / self.width)
+        if i >= len(self.counts): i = len(self.counts) - 1
+        elif i < 0: i = 0
+        self.counts[i] += 1; self.n += 1
+
+    def quantile(self, q):
+        # Borne supérieure de la case qui contient le quantile q (résolution = width)
+        if self.n == 0: return np.nan
+        idx = int(np.searchsorted(np.cumsum(self.counts), q * self.n))
+        return (min(idx, len(self.counts) - 1) + 1) * self.width
+
+class TrialProfiler:
+    """Intervalles de tick, durées de paintEvent et latence événement -> échantillon d'un essai."""
+    def __init__(self, nominal_tick_s):
+        self.nominal = nominal_tick_s
+        self.tick = FixedHistogram(); self.paint = FixedHistogram(); self.latency = FixedHistogram()
+        self.reset()
+
+    def reset(self):
+        self.tick.reset(); self.paint.reset(); self.latency.reset()
+        self.missed = 0; self._last_tick = None
+
+    def on_tick(self, t):
+        if self._last_tick is not None:
+            dt = t - self._last_tick; self.tick.add(dt)
+            # Un intervalle de k périodes nominales = k-1 ticks manqués
+            if dt > 1.5 * self.nominal: self.missed += int(round(dt / self.nominal)) - 1
+        self._last_tick = t
+
+    def add_paint(self, duration):
+        self.paint.add(duration)
+
+    def add_latency(self, delay):
+        self.latency.add(delay)
+
+    def summary(self):
+        ms = lambda h, q: round(h.quantile(q) * 1000, 2)
+        return [round(self.nominal * 1000, 2), self.tick.n, ms(self.tick, .5), ms(self.tick, .95), ms(self.tick, .99), self.missed,
+                ms(self.paint, .5), ms(self.paint, .95), ms(self.paint, .99),
+                ms(self.latency, .5), ms(self.latency, .95), ms(self.latency, .99)]
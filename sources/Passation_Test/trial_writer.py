@@ -0,0 +1,139 @@
+# trial_writer.py - Écriture asynchrone des essais (RAW / SCORES) hors du thread GUI
+import os
+import csv
+import json
+import time
+import queue
+import threading
+from columnar_store import ColumnStore
+
+class TrialWriter:
+    """File d'écriture dédiée : les essais terminés sont écrits par lots dans un thread séparé."""
+    def __init__(self, out_dir):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.max_depth = 0          # Profondeur maximale atteinte par la file (retard du disque)
+        self.batches = 0; self.last_batch_s = 0.0
+        self.errors = []            # (fichier, message) : lu par SteeringExpe pour alerter l'expérimentateur
+        self._failed = set()        # Fichiers en échec depuis la dernière validation : la suivante n'est pas écrite
+        self._q = queue.Queue(); self._dirty = set()
+        self._sizes = {}            # Taille de chaque fichier écrit, pour les enregistrements de validation
+        self._headers = set()       # CSV dont l'en-tête existant a été comparé à celui des lignes soumises
+        self._thread = threading.Thread(target=self._run, name="TrialWriter", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self):
+        # Nombre de demandes encore en attente d'écriture
+        return self._q.qsize()
+
+    def submit(self, base_name, header, rows, prefix=None):
+        # rows : liste de lignes, ou tableau structuré si prefix est fourni (prefix + champs de chaque ligne)
+        self._q.put(("rows", base_name, header, rows, prefix))
+        self.max_depth = max(self.max_depth, self.depth)
+
+    def submit_columns(self, base_name, columns):
+        # {colonne: tableau} ajouté à la table colonne <base_name> (dossier .cols)
+        self._q.put(("columns", base_name, None, columns, None))
+        self.max_depth = max(self.max_depth, self.depth)
+
+    def submit_text(self, base_name, lines):
+        # Lignes de texte brutes (ex. JSON Lines), ajoutées telles quelles
+        self._q.put(("text", base_name, None, lines, None))
+        self.max_depth = max(self.max_depth, self.depth)
+
+    def commit(self, base_name, record):
+        # Enregistrement de validation (journal de session) : ajouté en JSON une fois que toutes les données soumises
+        # avant lui sont sur disque, avec la taille de chaque fichier écrit ("Sizes"), puis fsyncé lui-même
+        self._q.put(("commit", base_name, record))
+
+    def sync(self):
+        # Point de durabilité (fin de bloc) : fsync de tous les fichiers écrits depuis le dernier sync
+        self._q.put(("sync", None))
+
+    def flush(self, timeout=None):
+        done = threading.Event(); self._q.put(("sync", done))
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        if not self._thread.is_alive(): return
+        self.flush(timeout); self._q.put(None); self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._q.get()]
+            while True:
+                try: batch.append(self._q.get_nowait())
+                except queue.Empty: break
+            if self._write_batch(batch): return
+
+    def _write_batch(self, batch):
+        t0 = time.perf_counter(); per_file = {}; durable = False; waiters = []; stop = False
+        for job in batch:
+            if job is None: stop = True
+            elif job[0] == "sync":
+                durable = True
+                if job[1] is not None: waiters.append(job[1])
+            elif job[0] == "commit":
+                # Les données soumises après la validation ne doivent pas être comptées dans ses tailles
+                self._write_files(per_file); per_file = {}; self._fsync_dirty()
+                if self._failed:
+                    # Données de l'essai absentes ou incomplètes : pas de validation, la reprise refera l'essai
+                    failed = ", ".join(sorted(self._failed)); self._failed.clear()
+                    self.errors.append((job[1], f"validation {job[2].get('Event')} non écrite (échec : {failed})"))
+                    print(f"❌ Validation non écrite dans {job[1]} : échec d'écriture de {failed}")
+                else: self._write_commit(job[1], job[2])
+            else:
+                kind, base_name, header, rows, prefix = job
+                per_file.setdefault(base_name, (header, []))[1].append((kind, rows, prefix))
+
+        self._write_files(per_file)
+        if durable: self._fsync_dirty()
+
+        self.batches += 1; self.last_batch_s = time.perf_counter() - t0
+        for done in waiters: done.set()
+        return stop
+
+    def _write_files(self, per_file):
+        for base_name, (header, chunks) in per_file.items():
+            path = os.path.join(self.out_dir, base_name)
+            try:
+                if chunks[0][0] == "columns":
+                    # Table colonne : fsync groupé avec les autres fichiers (les lignes au-delà d'une validation sont tronquées à la reprise)
+                    store = ColumnStore(path)
+                    for _, columns, _ in chunks: store.append(columns, durable=False)
+                    self._sizes[base_name] = store.rows
+                    self._dirty.update([store._file(c) for c in store.schema["columns"]] + [os.path.join(path, "schema.json")])
+                    continue
+                file_exists = os.path.isfile(path) and os.path.getsize(path) > 0
+                if file_exists and header is not None and base_name not in self._headers:
+                    # Fichier d'une version précédente (ex. RAW.csv sans X_Tilt / Y_Tilt / Rotation) : rien n'est ajouté dessous
+                    with open(path, newline='') as f: existing = next(csv.reader(f), [])
+                    if existing != [str(h) for h in header]:
+                        raise ValueError(f"{base_name} : colonnes {existing} au lieu de {list(header)} (ancien format, fichier à renommer)")
+                self._headers.add(base_name)
+                with open(path, 'a', newline='') as f:
+                    w = csv.writer(f)
+                    if not file_exists and header is not None: w.writerow(header)
+                    for kind, rows, prefix in chunks:
+                        if kind == "text": f.writelines(line + "\n" for line in rows)
+                        else: w.writerows(rows if prefix is None else (prefix + list(r) for r in rows.tolist()))
+                    self._sizes[base_name] = f.tell()
+                self._dirty.add(path)
+            except (OSError, ValueError) as e:
+                self.errors.append((base_name, str(e))); self._failed.add(base_name); print(f"❌ Écriture impossible ({base_name}) : {e}")
+
+    def _fsync_dirty(self):
+        for path in self._dirty:
+            try:
+                with open(path, 'a') as f: f.flush(); os.fsync(f.fileno())
+            except OSError as e: self.errors.append((os.path.basename(path), str(e))); self._failed.add(os.path.basename(path))
+        self._dirty.clear()
+
+    def _write_commit(self, base_name, record):
+        record = {**record, "Sizes": {**record.get("Sizes", {}), **self._sizes}}
+        try:
+            with open(os.path.join(self.out_dir, base_name), 'a') as f:
+                f.write(json.dumps(record) + "\n"); f.flush(); os.fsync(f.fileno())
+        except OSError as e:
+            self.errors.append((base_name, str(e))); print(f"❌ Journal impossible à écrire ({base_name}) : {e}")
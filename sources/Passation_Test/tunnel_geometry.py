@@ -0,0 +1,158 @@
+# tunnel_geometry.py - Géométrie du tunnel (chemin paramétrique + largeur variable W(s), cas général Accot-Zhai)
+# Partagé par l'acquisition (steering_task.py) et l'analyse (process_data.py). Aucune dépendance Qt.
+import math
+import numpy as np
+from scipy.spatial import cKDTree
+
+class TunnelGeometry:
+    """Ligne centrale échantillonnée finement + demi-largeur par sommet.
+
+    - locate(px, py)  : requête O(1) via une grille précalculée (acquisition, un point à la fois)
+    - project(x, y)   : version vectorisée (analyse, tous les points d'un essai)
+    Le décalage latéral est signé positif à droite du sens de parcours (vers l'extérieur pour le cercle).
+    """
+    def __init__(self, points, widths, closed=True, spec=None):
+        self.points = np.asarray(points, dtype=float)
+        self.widths = np.broadcast_to(np.asarray(widths, dtype=float), (len(self.points),)).copy()
+        self.half_w = self.widths / 2
+        self.closed = closed
+        self.spec = spec
+        if len(self.points) < 2: raise ValueError("Un tunnel nécessite au moins 2 points")
+
+        # Segments k -> k+1 (le dernier referme la boucle si closed)
+        nxt = np.roll(self.points, -1, axis=0) if closed else self.points[1:]
+        seg = nxt - (self.points if closed else self.points[:-1])
+        self.seg_vec = seg; self.seg_len = np.hypot(seg[:, 0], seg[:, 1])
+        self.s = np.concatenate(([0.0], np.cumsum(self.seg_len)))   # Abscisse curviligne de chaque sommet (+ fin)
+        self.length = self.s[-1]
+        self._tree = cKDTree(self.points)
+        self.grid = None; self.grid_sdf = None; self.cell = None
+
+    # --- CONSTRUCTEURS ---
+    @classmethod
+    def circle(cls, cx, cy, R, W, spacing=0.5):
+        # Premier sommet en bas (croix de départ), parcours dans le sens des angles croissants (écran, y vers le bas)
+        n = max(64, int(math.ceil(2 * math.pi * R / spacing)))
+        theta = math.pi / 2 + np.arange(n) * (2 * math.pi / n)
+        pts = np.column_stack((cx + R * np.cos(theta), cy + R * np.sin(theta)))
+        return cls(pts, W, closed=True, spec={"kind": "circle", "cx": cx, "cy": cy, "R": R, "W": W})
+
+    @classmethod
+    def from_function(cls, path_fn, width_fn, closed=True, n=4000):
+        # path_fn(u) -> (x, y) et width_fn(u) -> W pour u dans [0, 1] (vectorisés)
+        u = np.linspace(0, 1, n, endpoint=not closed)
+        x, y = path_fn(u)
+        pts = np.column_stack((x, y)); w = np.broadcast_to(width_fn(u), (n,))
+        return cls(pts, w, closed=closed, spec={"kind": "polyline", "points": pts.tolist(), "widths": np.asarray(w, dtype=float).tolist(), "closed": closed})
+
+    @classmethod
+    def from_dict(cls, spec):
+        if spec["kind"] == "circle": return cls.circle(spec["cx"], spec["cy"], spec["R"], spec["W"])
+        return cls(spec["points"], spec["widths"], closed=spec.get("closed", True), spec=spec)
+
+    def to_dict(self):
+        if self.spec is not None: return self.spec
+        return {"kind": "polyline", "points": self.points.tolist(), "widths": self.widths.tolist(), "closed": self.closed}
+
+    def translated(self, dx, dy):
+        # Chemin défini relativement au centre de l'écran -> coordonnées écran
+        if self.spec and self.spec["kind"] == "circle":
+            return TunnelGeometry.circle(self.spec["cx"] + dx, self.spec["cy"] + dy, self.spec["R"], self.spec["W"])
+        return TunnelGeometry(self.points + (dx, dy), self.widths, self.closed)
+
+    @property
+    def kind(self):
+        return self.spec["kind"] if self.spec else "polyline"
+
+    @property
+    def start(self):
+        return float(self.points[0, 0]), float(self.points[0, 1])
+
+    @property
+    def index_of_difficulty(self):
+        # Loi d'Accot-Zhai : ID = intégrale de ds / W(s) (trapèzes sur les segments)
+        w0 = self.widths; w1 = np.roll(self.widths, -1) if self.closed else self.widths[1:]
+        if not self.closed: w0 = w0[:-1]
+        return float(np.sum(self.seg_len * 0.5 * (1 / w0 + 1 / w1)))
+
+    # --- GRILLE DE RECHERCHE (ACQUISITION) ---
+    def build_grid(self, width, height, cell=2.0, band=None):
+        # Sommet le plus proche + distance signée au bord du tunnel (négative dedans) au centre de chaque cellule.
+        # Recherche exacte dans une bande autour du chemin ; au-delà, sommet approché (arbre grossier), affiné par locate()
+        nx, ny = int(math.ceil(width / cell)), int(math.ceil(height / cell))
+        gx, gy = np.meshgrid((np.arange(nx) + 0.5) * cell, (np.arange(ny) + 0.5) * cell)
+        q = np.column_stack((gx.ravel(), gy.ravel()))
+        band = band if band is not None else max(40.0, 4 * float(self.half_w.max()))
+        d, k = self._tree.query(q, distance_upper_bound=band)
+        far = ~np.isfinite(d)
+        if far.any():
+            step = max(1, len(self.points) // 256)
+            d[far], kc = cKDTree(self.points[::step]).query(q[far]); k[far] = kc * step
+        self.grid = k.astype(np.int32).reshape(ny, nx)
+        self.grid_sdf = (d - self.half_w[k]).astype(np.float32).reshape(ny, nx)
+        self.cell = cell
+        return self
+
+    def locate(self, px, py):
+        # -> (distance à la ligne centrale, abscisse s, demi-largeur locale, décalage latéral signé) ; exact à la
+        # projection sur segment près
+        if self.grid is None: raise RuntimeError("build_grid() doit être appelé avant locate()")
+        ny, nx = self.grid.shape
+        i = min(max(int(py / self.cell), 0), ny - 1); j = min(max(int(px / self.cell), 0), nx - 1)
+        k = int(self.grid[i, j]); n = len(self.points); pts = self.points
+        # La cellule donne un sommet proche : descente locale jusqu'au sommet le plus proche du point exact
+        d2 = (pts[k, 0] - px) ** 2 + (pts[k, 1] - py) ** 2
+        for step in (1, -1):
+            while True:
+                kk = k + step
+                if self.closed: kk %= n
+                elif kk < 0 or kk >= n: break
+                dd = (pts[kk, 0] - px) ** 2 + (pts[kk, 1] - py) ** 2
+                if dd >= d2: break
+                k, d2 = kk, dd
+        best = None
+        for seg_k in ((k - 1) % n, k) if self.closed else (max(k - 1, 0), min(k, len(self.seg_len) - 1)):
+            res = self._project_segment(seg_k, px, py)
+            if best is None or res[0] < best[0]: best = res
+        return best
+
+    def _project_segment(self, k, px, py):
+        ax, ay = self.points[k]; vx, vy = self.seg_vec[k]; L2 = self.seg_len[k] ** 2
+        u = 0.0 if L2 == 0 else min(max(((px - ax) * vx + (py - ay) * vy) / L2, 0.0), 1.0)
+        fx, fy = ax + u * vx, ay + u * vy
+        k1 = (k + 1) % len(self.points)
+        dist = math.hypot(px - fx, py - fy)
+        offset = -dist if vx * (py - fy) - vy * (px - fx) > 0 else dist
+        return dist, self.s[k] + u * self.seg_len[k], self.half_w[k] + u * (self.half_w[k1] - self.half_w[k]), offset
+
+    def inside(self, px, py, margin=0.0):
+        dist, _, half_w, _ = self.locate(px, py)
+        return dist + margin <= half_w
+
+    def progress(self, s):
+        # Phase dans [-pi, pi[ pour un chemin fermé (compatible LapTracker), fraction [0, 1] sinon
+        if self.closed: return 2 * math.pi * (s / self.length) - math.pi
+        return s / self.length
+
+    # --- PROJECTION VECTORISÉE (ANALYSE) ---
+    def project(self, x, y):
+        # -> (distance, s, demi-largeur, décalage latéral signé) pour tous les points
+        x = np.asarray(x, dtype=float); y = np.asarray(y, dtype=float)
+        _, k = self._tree.query(np.column_stack((x, y)))
+        n = len(self.points); n_seg = len(self.seg_len)
+        cand = [(k - 1) % n, k % n_seg] if self.closed else [np.clip(k - 1, 0, n_seg - 1), np.clip(k, 0, n_seg - 1)]
+        best = None
+        for seg_k in cand:
+            a = self.points[seg_k]; v = self.seg_vec[seg_k]; L2 = self.seg_len[seg_k] ** 2
+            u = np.clip(((x - a[:, 0]) * v[:, 0] + (y - a[:, 1]) * v[:, 1]) / np.where(L2 > 0, L2, 1), 0, 1)
+            fx, fy = a[:, 0] + u * v[:, 0], a[:, 1] + u * v[:, 1]
+            dist = np.hypot(x - fx, y - fy)
+            cross = v[:, 0] * (y - fy) - v[:, 1] * (x - fx)
+            k1 = (seg_k + 1) % n
+            res = (dist, self.s[seg_k] + u * self.seg_len[seg_k], self.half_w[seg_k] + u * (self.half_w[k1] - self.half_w[seg_k]),
+                   -np.sign(cross) * dist)
+            if best is None: best = res
+            else:
+                closer = res[0] < best[0]
+                best = tuple(np.where(closer, r, b) for r, b in zip(res, best))
+        return best
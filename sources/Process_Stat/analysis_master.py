@@ -1,19 +1,27 @@
 # analysis_master.py - VERSION FINALE OPTIMISÉE (APA, H1/H2/H3, Fitts Regression & Be)
 import os
+import sys
+import argparse
 import pandas as pd
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
 from scipy import stats
-import warnings
 
 # --- CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 FEATURES_FILE = os.path.join(BASE_DIR, "data", "features", "dataset_features.csv")
+SUBJECTS_FILE = os.path.join(BASE_DIR, "data", "features", "dataset_subjects.csv")   # Be par participant et tâche
 DOC_PATH = os.path.join(BASE_DIR, "results")
 
 if not os.path.exists(DOC_PATH): os.makedirs(DOC_PATH)
 
+# Schéma compact partagé avec process_data (--compact)
+sys.path.append(os.path.join(BASE_DIR, "sources", "Passation_Test"))
+from compact_schema import compact_frame, frame_memory, memory_report, within_tolerance, FEATURES_SCHEMA, COMPACT_RTOL
+from group_stats import contrast_stats, resampling_stats, GLOBAL_CONDITION, RESAMPLES, RESAMPLE_SEED, RESAMPLE_CI
+from figure_render import render_figures
+
 sns.set_theme(style="whitegrid", context="paper", font_scale=1.2)
 
 METRICS_MAP = {
@@ -24,74 +32,70 @@ METRICS_MAP = {
     'Error_Rate': ('Taux d\'Erreur', '%'),
     'Te': ('Largeur Effective (Te)', 'px'),
     'LDLJ': ('Fluidité (LDLJ)', 'UA'),
-    'Force_SD': ('Stabilité Force (SD)', 'Raw')
+    'Force_SD': ('Stabilité Force (SD)', 'Raw'),
+    'Tremor_Pct': ('Tremblement (8-12 Hz)', '%')
 }
 
 # ==========================================
 # 1. OUTILS STATISTIQUES
 # ==========================================
-def cohen_d(x, y):
-    nx, ny = len(x), len(y)
-    dof = nx + ny - 2
-    if dof <= 0: return 0
-    pool_sd = np.sqrt(((nx-1)*np.std(x, ddof=1)**2 + (ny-1)*np.std(y, ddof=1)**2) / dof)
-    return (np.mean(x) - np.mean(y)) / pool_sd if pool_sd > 0 else 0
+def draw_apa_table(df_table, title):
+    fig, ax = plt.subplots(figsize=(12 + 2 * (len(df_table.columns) - 7), len(df_table)*0.8 + 2))
+    ax.axis('off')
+    tbl = ax.table(cellText=df_table.values, colLabels=df_table.columns, loc='center', cellLoc='center')
+    tbl.auto_set_font_size(False); tbl.set_fontsize(11); tbl.scale(1.1, 2.2)
+    for (row, col), cell in tbl.get_celld().items():
+        if row == 0:
+            cell.set_text_props(weight='bold', color='white')
+            cell.set_facecolor('#2c3e50')
+        elif row % 2 == 0: cell.set_facecolor('#ecf0f1')
+    plt.title(title, fontsize=15, weight='bold', pad=25)
 
-def create_apa_table(df, condition_prefix, hypothesis_name, file_suffix):
-    df_cond = df[df['Task_Type'] == condition_prefix]
-    if df_cond.empty: return
+def create_apa_table(results, condition_prefix, hypothesis_name, file_suffix):
+    # Tableau APA d'une condition, rendu depuis contrast_stats (aucun calcul ici) : Excel écrit, spec de la figure PNG rendue
+    res = results[(results['Condition'] == condition_prefix) & (results['Groupe_1'] == 'Novice') & (results['Groupe_2'] == 'Expert')]
+    if res.empty: return
 
     table_rows = []
-    for col, (label, unit) in METRICS_MAP.items():
-        if col not in df_cond.columns: continue
-        if condition_prefix == "VP" and col == 'Force_SD': continue 
-        
-        nov = df_cond[df_cond['Group'] == 'Novice'][col].dropna()
-        exp = df_cond[df_cond['Group'] == 'Expert'][col].dropna()
-        if len(nov) < 2 or len(exp) < 2: continue
-        
-        m_n, s_n = np.mean(nov), np.std(nov, ddof=1)
-        m_e, s_e = np.mean(exp), np.std(exp, ddof=1)
-        
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            t_stat, p_val = stats.ttest_ind(nov, exp, equal_var=False)
-        
-        d_val = cohen_d(nov, exp)
-        sig = "***" if p_val < 0.001 else "**" if p_val < 0.01 else "*" if p_val < 0.05 else "ns"
-        p_str = "< .001" if p_val < 0.001 else f"{p_val:.3f}"
+    for r in res.itertuples(index=False):
+        if condition_prefix == "VP" and r.Metrique == 'Force_SD': continue
+        if r.N_1 < 2 or r.N_2 < 2: continue
+        label, unit = METRICS_MAP[r.Metrique]
+        sig = "***" if r.p < 0.001 else "**" if r.p < 0.01 else "*" if r.p < 0.05 else "ns"
+        p_str = "< .001" if r.p < 0.001 else f"{r.p:.3f}"
 
         table_rows.append({
             "Métrique": label, "Unité": unit,
-            "Novice (M±SD)": f"{m_n:.2f} ± {s_n:.2f}",
-            "Expert (M±SD)": f"{m_e:.2f} ± {s_e:.2f}",
-            "t-stat": f"{t_stat:.2f}", "p-value": f"{p_str} {sig}", "Cohen's d": f"{abs(d_val):.2f}"
+            "Novice (M±SD)": f"{r.M_1:.2f} ± {r.SD_1:.2f}",
+            "Expert (M±SD)": f"{r.M_2:.2f} ± {r.SD_2:.2f}",
+            "t-stat": f"{r.t:.2f}", "p-value": f"{p_str} {sig}", "Cohen's d": f"{abs(r.d):.2f}"
         })
+        if 'p_perm' in res.columns:
+            # --resamples : p de permutation et IC bootstrap de la différence Novice - Expert (participants, pas essais)
+            table_rows[-1]["p perm."] = "< .001" if r.p_perm < 0.001 else f"{r.p_perm:.3f}"
+            table_rows[-1][f"IC{RESAMPLE_CI} N-E"] = f"[{r.IC_Low:.2f} ; {r.IC_High:.2f}]"
 
     df_table = pd.DataFrame(table_rows)
     df_table.to_excel(os.path.join(DOC_PATH, f"Tableau_APA_{file_suffix}.xlsx"), index=False)
-    
-    fig, ax = plt.subplots(figsize=(12, len(df_table)*0.8 + 2))
-    ax.axis('off')
-    tbl = ax.table(cellText=df_table.values, colLabels=df_table.columns, loc='center', cellLoc='center')
-    tbl.auto_set_font_size(False); tbl.set_fontsize(11); tbl.scale(1.1, 2.2)
-    for (row, col), cell in tbl.get_celld().items():
-        if row == 0:
-            cell.set_text_props(weight='bold', color='white')
-            cell.set_facecolor('#2c3e50')
-        elif row % 2 == 0: cell.set_facecolor('#ecf0f1')
-    plt.title(f"{hypothesis_name} ({condition_prefix})", fontsize=15, weight='bold', pad=25)
-    plt.savefig(os.path.join(DOC_PATH, f"Tableau_APA_{file_suffix}.png"), dpi=300, bbox_inches='tight')
-    plt.close()
+
+    return {"file": os.path.join(DOC_PATH, f"Tableau_APA_{file_suffix}.png"), "draw": draw_apa_table, "data": df_table,
+            "params": {"title": f"{hypothesis_name} ({condition_prefix})"}, "save": {"dpi": 300, "bbox_inches": 'tight'}}
+
+def significance_table(results):
+    # Tableau_Significativite_Global.csv : p (Welch) et d de Cohen Novice vs Expert, toutes conditions confondues
+    res = results[(results['Condition'] == GLOBAL_CONDITION) & (results['Groupe_1'] == 'Novice') & (results['Groupe_2'] == 'Expert')]
+    return pd.DataFrame({'Metrique': res['Metrique'], 'P-Value': res['p'], 'Cohen_d': res['d']}).reset_index(drop=True)
+
+def compact_check_values(results):
+    # Sorties comparées entre le chemin float64 et --compact : tous les nombres de contrast_stats (M, SD, t, ddl, p, d)
+    return results.select_dtypes('number').to_numpy(float).ravel()
 
 # ==========================================
 # 2. GÉNÉRATION DES GRAPHIQUES
 # ==========================================
-def generate_graphs(df):
-    print("\n=== GÉNÉRATION DES GRAPHIQUES SCIENTIFIQUES ===")
-
+# Une fonction de dessin par figure (données déjà réduites aux colonnes utiles), appelée par figure_render.render_figures
+def draw_fitts_metrics(df_vp):
     # --- H1 : Performance ISO (Boxplot IPe & Be) ---
-    df_vp = df[df['Task_Type'] == 'VP']
     fig, axes = plt.subplots(1, 2, figsize=(12, 5))
     
     sns.boxplot(x="Group", y="IPe", data=df_vp, ax=axes[0], palette="Set2")
@@ -103,74 +107,116 @@ def generate_graphs(df):
     axes[1].set_ylabel("Pente (s/bit) - Plus bas = Meilleur")
     
     plt.tight_layout()
-    plt.savefig(os.path.join(DOC_PATH, "Graph_H1_Fitts_Metrics.png"), dpi=300)
-    plt.close()
 
-    # --- NOUVEAU : La Droite de Fitts (MT vs IDe) ---
-    plt.figure(figsize=(7, 6))
+def draw_fitts_regression(df_vp):
+    # --- La Droite de Fitts (MT vs IDe) ---
     sns.lmplot(x="IDe", y="Duration", hue="Group", data=df_vp, 
                palette={"Expert": "#2ecc71", "Novice": "#e74c3c"}, 
-               markers=["s", "o"], scatter_kws={'alpha':0.4})
+               markers=["s", "o"], scatter_kws={'alpha':0.4}, seed=0)   # Bande de confiance bootstrap reproductible
     plt.title("Loi de Fitts : MT = A + Be * IDe")
     plt.xlabel("Index de Difficulté Effectif (bits)")
     plt.ylabel("Temps par tour (MT/lap) [s]")
-    plt.savefig(os.path.join(DOC_PATH, "Graph_H1_Fitts_Regression.png"), dpi=300, bbox_inches='tight')
-    plt.close()
 
+def draw_degradation(df):
     # --- H2 : Interaction & Résilience (IPe) ---
     plt.figure(figsize=(8, 6))
     sns.pointplot(x="Task_Type", y="IPe", hue="Group", data=df, markers=["o", "s"], capsize=.1, errorbar="sd")
     plt.title("H2 : Résilience à la contrainte de Force")
     plt.ylabel("Performance (IPe)")
-    plt.savefig(os.path.join(DOC_PATH, "Graph_H2_Degradation_Interaction.png"), dpi=300)
-    plt.close()
 
+def draw_fluidity(df):
     # --- H3 : Fluidité LDLJ ---
     plt.figure(figsize=(6, 5))
     sns.boxplot(x="Group", y="LDLJ", data=df, palette="coolwarm")
     plt.title("H3 : Fluidité (Log Dimensionless Jerk)")
     plt.ylabel("LDLJ (Plus bas = Plus Fluide)")
-    plt.savefig(os.path.join(DOC_PATH, "Graph_H3_Fluidity.png"), dpi=300)
-    plt.close()
 
+def draw_experience(df_subj):
     # --- VALIDITÉ CLINIQUE (Ancienneté) ---
+    plt.figure(figsize=(6, 6))
+    sns.regplot(x="Experience_Years", y="IPe", data=df_subj, color="#27ae60", seed=0)
+    r, p = stats.pearsonr(df_subj['Experience_Years'].dropna(), df_subj['IPe'].dropna())
+    plt.title(f"Validation : Expérience vs Performance\nr = {r:.2f} (p={p:.3f})")
+    plt.xlabel("Années de Pratique Chirurgicale")
+    plt.ylabel("Performance Globale (IPe)")
+
+def graph_specs(df):
+    # Specs des graphiques : fichier, fonction de dessin, tranche de données utilisée (empreinte du cache)
+    df_vp = df[df['Task_Type'] == 'VP']
+    png = lambda name: os.path.join(DOC_PATH, name)
+    specs = [
+        {"file": png("Graph_H1_Fitts_Metrics.png"), "draw": draw_fitts_metrics, "data": df_vp[['Group', 'IPe', 'Be']], "save": {"dpi": 300}},
+        {"file": png("Graph_H1_Fitts_Regression.png"), "draw": draw_fitts_regression, "data": df_vp[['Group', 'IDe', 'Duration']],
+         "save": {"dpi": 300, "bbox_inches": 'tight'}},
+        {"file": png("Graph_H2_Degradation_Interaction.png"), "draw": draw_degradation, "data": df[['Task_Type', 'Group', 'IPe']], "save": {"dpi": 300}},
+        {"file": png("Graph_H3_Fluidity.png"), "draw": draw_fluidity, "data": df[['Group', 'LDLJ']], "save": {"dpi": 300}},
+    ]
     df_subj = df.groupby('ID').mean(numeric_only=True).reset_index()
     if 'Experience_Years' in df_subj.columns:
-        plt.figure(figsize=(6, 6))
-        sns.regplot(x="Experience_Years", y="IPe", data=df_subj, color="#27ae60")
-        r, p = stats.pearsonr(df_subj['Experience_Years'].dropna(), df_subj['IPe'].dropna())
-        plt.title(f"Validation : Expérience vs Performance\nr = {r:.2f} (p={p:.3f})")
-        plt.xlabel("Années de Pratique Chirurgicale")
-        plt.ylabel("Performance Globale (IPe)")
-        plt.savefig(os.path.join(DOC_PATH, "Graph_Correl_Experience_Perf.png"), dpi=300)
-        plt.close()
+        specs.append({"file": png("Graph_Correl_Experience_Perf.png"), "draw": draw_experience,
+                      "data": df_subj[['Experience_Years', 'IPe']], "save": {"dpi": 300}})
+    return specs
+
+def generate_graphs(df, specs=(), jobs=1):
+    # Graphiques (+ specs déjà prêtes, ex. tableaux APA) : seules les figures dont les données ou le dessin ont changé
+    # sont redessinées, en parallèle si jobs > 1
+    print("\n=== GÉNÉRATION DES GRAPHIQUES SCIENTIFIQUES ===")
+    rendered, skipped = render_figures(list(specs) + graph_specs(df), jobs)
+    print(f"{rendered} figure(s) générée(s)" + (f", {skipped} inchangée(s) reprise(s) telle(s) quelle(s)" if skipped else ""))
 
 # ==========================================
 # EXÉCUTION
 # ==========================================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tableaux APA, significativité globale et graphiques (H1 / H2 / H3).")
+    parser.add_argument("--compact", action="store_true",
+                        help="Dataset gardé en float32 / catégories (compact_schema.py) ; rapport mémoire et vérification face au float64")
+    parser.add_argument("--resamples", type=int, default=0,
+                        help=f"Ajoute aux tableaux APA un p de permutation et un IC bootstrap par contraste (ex. {RESAMPLES}) ; 0 = sans")
+    parser.add_argument("--seed", type=int, default=RESAMPLE_SEED, help="Graine des permutations / du bootstrap (résultats reproductibles)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Nombre de processus pour le rééchantillonnage et le rendu des figures (0 = tous les cœurs)")
+    args = parser.parse_args()
     if not os.path.exists(FEATURES_FILE):
         print("ERREUR: dataset_features.csv introuvable.")
     else:
         df_all = pd.read_csv(FEATURES_FILE)
+        # Be n'est plus répété sur chaque essai : repris de la table par participant (même valeur sur chaque essai qu'avant)
+        if 'Be' not in df_all.columns and os.path.exists(SUBJECTS_FILE):
+            subjects = pd.read_csv(SUBJECTS_FILE, dtype={'ID': str})      # Be absent si process_data --features ne l'a pas demandé
+            subjects = subjects[['ID', 'Task_Type'] + [c for c in ('Be',) if c in subjects.columns]]
+            df_all = df_all.astype({'ID': str}).merge(subjects, on=['ID', 'Task_Type'], how='left')
+        # process_data --features peut n'avoir produit qu'une partie des métriques : tableaux et figures lisent toutes celles de METRICS_MAP
+        missing = [c for c in METRICS_MAP if c not in df_all.columns]
+        if missing:
+            print(f"Métriques absentes du dataset : {', '.join(missing)} (process_data.py --features {','.join(METRICS_MAP)})"); sys.exit(1)
         df_all = df_all[df_all['Group'].isin(['Novice', 'Expert'])]
+
+        # Toutes les comparaisons (métrique x condition x contraste) en une passe
+        results = contrast_stats(df_all, list(METRICS_MAP))
+        if args.compact:
+            # Résultats du chemin float64 gardés pour la vérification, puis seul le dataset compact reste en mémoire
+            before = frame_memory(df_all); df_all = compact_frame(df_all, FEATURES_SCHEMA)
+            df_all['Group'] = df_all['Group'].cat.remove_unused_categories()
+            print(memory_report("Métriques en mémoire", before, frame_memory(df_all)))
+            reference, results = results, contrast_stats(df_all, list(METRICS_MAP))
+            ok, diff = within_tolerance(compact_check_values(reference), compact_check_values(results))
+            print(f"{'✅' if ok else '⚠️'} Statistiques float32 vs float64 : écart max {diff:.2e} (tolérance relative {COMPACT_RTOL:g})")
         
+        jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+        if args.resamples > 0:
+            resampled = resampling_stats(df_all, list(METRICS_MAP), n_resamples=args.resamples, seed=args.seed, jobs=jobs)
+            results = results.merge(resampled.drop(columns='Diff'), on=['Condition', 'Groupe_1', 'Groupe_2', 'Metrique'], how='left')
+            print(f"Permutations / bootstrap au niveau des participants : {args.resamples} tirages par contraste (graine {args.seed})")
+
         # 1. Tableaux APA
-        create_apa_table(df_all, "VP", "H1 : Discrimination Vitesse/Précision", "H1_VP")
-        create_apa_table(df_all, "FVP", "H2 : Discrimination avec Force", "H2_FVP")
+        apa_specs = [create_apa_table(results, "VP", "H1 : Discrimination Vitesse/Précision", "H1_VP"),
+                     create_apa_table(results, "FVP", "H2 : Discrimination avec Force", "H2_FVP")]
         
         # 2. Grand CSV Global avec P-values
-        res_list = []
-        for col in METRICS_MAP.keys():
-            if col in df_all.columns:
-                n = df_all[df_all['Group'] == 'Novice'][col].dropna()
-                e = df_all[df_all['Group'] == 'Expert'][col].dropna()
-                _, p = stats.ttest_ind(n, e, equal_var=False)
-                res_list.append({'Metrique': col, 'P-Value': p, 'Cohen_d': cohen_d(n, e)})
-        
-        pd.DataFrame(res_list).to_csv(os.path.join(DOC_PATH, "Tableau_Significativite_Global.csv"), index=False)
+        significance_table(results).to_csv(os.path.join(DOC_PATH, "Tableau_Significativite_Global.csv"), index=False)
         
         # 3. Graphiques
-        generate_graphs(df_all)
+        generate_graphs(df_all, [s for s in apa_specs if s], jobs)
         
         print(f"\n[SUCCÈS] Analyse terminée. Tous les documents sont dans {DOC_PATH}")
\ No newline at end of file
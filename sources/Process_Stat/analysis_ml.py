@@ -1,5 +1,7 @@
 # analysis_ml.py - MACHINE LEARNING COMPLET (Version IPe / Be)
 import os
+import sys
+import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -10,8 +12,17 @@ from sklearn.metrics import confusion_matrix, accuracy_score
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 FEATURES_FILE = os.path.join(BASE_DIR, "data", "features", "dataset_features.csv")
+SUBJECTS_FILE = os.path.join(BASE_DIR, "data", "features", "dataset_subjects.csv")   # Be par participant et tâche
 DOC_PATH = os.path.join(BASE_DIR, "results")
 
+# Seules métriques utilisées par les modèles : python sources/Clean_Data/process_data.py --features IPe,Be,LDLJ,Te,Force_SD
+# suffit à les produire (les autres métriques ne sont pas calculées)
+ML_FEATURES = ['IPe', 'Be', 'LDLJ', 'Te', 'Force_SD']
+
+# Schéma compact partagé avec process_data (--compact)
+sys.path.append(os.path.join(BASE_DIR, "sources", "Passation_Test"))
+from compact_schema import compact_frame, frame_memory, memory_report, within_tolerance, FEATURES_SCHEMA, COMPACT_RTOL
+
 # Style seaborn
 sns.set_theme(style="whitegrid", context="paper", font_scale=1.2)
 
@@ -45,15 +56,8 @@ def train_and_evaluate(df, features, feature_names, model_name):
     
     return acc, cm, fi_df
 
-def run_ml_classification():
-    print("\n--- ENTRAÎNEMENT DES MODÈLES IA (Random Forest) ---")
-    if not os.path.exists(FEATURES_FILE): 
-        print("Fichier features introuvable."); return
-    
-    df = pd.read_csv(FEATURES_FILE)
-    df = df[df['Group'].isin(['Novice', 'Expert'])]
-    
-    df['Tache_Type'] = df['Condition'].apply(lambda x: 'FVP' if str(x).startswith('FVP') else 'VP')
+def train_models(df):
+    # Modèle 1 (VP, sans force) et modèle 2 (FVP, avec Force_SD) -> ((acc, cm, fi) VP, (acc, cm, fi) FVP)
     df_vp = df[df['Tache_Type'] == 'VP']
     df_fvp = df[df['Tache_Type'] == 'FVP']
 
@@ -61,13 +65,49 @@ def run_ml_classification():
     features_vp = ['IPe', 'Be', 'LDLJ', 'Te']
     names_vp = ['Performance (IPe)', 'Pente (Be)', 'Fluidité (LDLJ)', 'Précision (Te)']
     print("Entraînement Modèle 1 (VP - Sans Force)...")
-    acc_vp, cm_vp, fi_vp = train_and_evaluate(df_vp, features_vp, names_vp, "VP")
+    vp = train_and_evaluate(df_vp, features_vp, names_vp, "VP")
 
     # --- MODÈLE 2 : FVP (Ajout Force_SD) ---
     features_fvp = ['IPe', 'Be', 'LDLJ', 'Te', 'Force_SD']
     names_fvp = ['Performance (IPe)', 'Pente (Be)', 'Fluidité (LDLJ)', 'Précision (Te)', 'Stabilité Force']
     print("Entraînement Modèle 2 (FVP - Avec Force)...")
-    acc_fvp, cm_fvp, fi_fvp = train_and_evaluate(df_fvp, features_fvp, names_fvp, "FVP")
+    fvp = train_and_evaluate(df_fvp, features_fvp, names_fvp, "FVP")
+    return vp, fvp
+
+def compact_check_values(models):
+    # Sorties comparées entre le chemin float64 et --compact : accuracy et importances (triées par variable) de chaque modèle
+    values = []
+    for acc, _, fi in models:
+        values.append(acc)
+        if not fi.empty: values.extend(fi.sort_values('Variable')['Importance'])
+    return np.array(values, dtype=float)
+
+def run_ml_classification(compact=False):
+    print("\n--- ENTRAÎNEMENT DES MODÈLES IA (Random Forest) ---")
+    if not os.path.exists(FEATURES_FILE): 
+        print("Fichier features introuvable."); return
+    
+    df = pd.read_csv(FEATURES_FILE, usecols=lambda c: c in ['ID', 'Group', 'Condition'] + ML_FEATURES, dtype={'ID': str})
+    df['Tache_Type'] = df['Condition'].apply(lambda x: 'FVP' if str(x).startswith('FVP') else 'VP')
+    # Be : table par participant et tâche (plus répété sur chaque essai)
+    if 'Be' not in df.columns and os.path.exists(SUBJECTS_FILE):
+        subjects = pd.read_csv(SUBJECTS_FILE, dtype={'ID': str})          # Be absent si process_data --features ne l'a pas demandé
+        subjects = subjects[['ID', 'Task_Type'] + [c for c in ('Be',) if c in subjects.columns]]
+        df = df.merge(subjects.rename(columns={'Task_Type': 'Tache_Type'}), on=['ID', 'Tache_Type'], how='left')
+    missing = [c for c in ML_FEATURES if c not in df.columns]
+    if missing:
+        print(f"Métriques absentes du dataset : {', '.join(missing)} (process_data.py --features {','.join(ML_FEATURES)})"); return
+    df = df[df['Group'].isin(['Novice', 'Expert'])]
+
+    if compact:
+        # Modèles entraînés sur le float64 puis sur le compact : sorties réelles comparées (accuracy, importances)
+        before = frame_memory(df); reference = compact_check_values(train_models(df))
+        df = compact_frame(df, FEATURES_SCHEMA)
+        print(memory_report("Métriques en mémoire", before, frame_memory(df)))
+    (acc_vp, cm_vp, fi_vp), (acc_fvp, cm_fvp, fi_fvp) = models = train_models(df)
+    if compact:
+        ok, diff = within_tolerance(reference, compact_check_values(models))
+        print(f"{'✅' if ok else '⚠️'} Résultats des modèles float32 vs float64 : écart max {diff:.2e} (tolérance relative {COMPACT_RTOL:g})")
 
     # --- GRAPHIQUES ---
     if acc_vp > 0 or acc_fvp > 0:
@@ -94,4 +134,7 @@ def run_ml_classification():
     print(f"✅ Graphiques IA générés dans {DOC_PATH}")
 
 if __name__ == "__main__":
-    run_ml_classification()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Classification Novice / Expert (Random Forest, validation LOO).")
+    parser.add_argument("--compact", action="store_true",
+                        help="Dataset gardé en float32 / catégories (compact_schema.py) ; rapport mémoire et vérification face au float64")
+    run_ml_classification(parser.parse_args().compact)
\ No newline at end of file
@@ -0,0 +1,54 @@
+# figure_render.py - Rendu des figures d'analyse à partir de specs, en parallèle, avec cache par empreinte
+# Spec d'une figure : {"file": chemin PNG, "draw": fonction(data, **params) qui dessine avec plt, "data": DataFrame
+# (colonnes utilisées seulement), "params": paramètres de dessin, "save": paramètres de plt.savefig (dpi...)}.
+# L'empreinte (données + paramètres + code de la fonction) est écrite dans les métadonnées du PNG : une figure dont
+# l'empreinte n'a pas changé n'est pas redessinée.
+import os
+import json
+import hashlib
+import inspect
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import matplotlib.pyplot as plt
+
+FINGERPRINT_KEY = "HaptiMed-Fingerprint"
+
+def figure_fingerprint(spec):
+    h = hashlib.blake2b(digest_size=16)
+    data = spec["data"]
+    h.update(json.dumps([list(map(str, data.columns)), [str(t) for t in data.dtypes]]).encode())
+    h.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    h.update(json.dumps([spec.get("params", {}), spec.get("save", {})], sort_keys=True, default=str).encode())
+    h.update(inspect.getsource(spec["draw"]).encode())
+    return h.hexdigest()
+
+def png_fingerprint(path):
+    # Empreinte enregistrée dans un PNG existant (None : absent, illisible ou produit par une autre version)
+    if not os.path.exists(path): return None
+    try:
+        from PIL import Image
+        with Image.open(path) as im: return im.text.get(FINGERPRINT_KEY)
+    except Exception: return None
+
+def render_figure(spec, fingerprint=None):
+    # Exécutable dans un processus séparé : dessine, enregistre avec l'empreinte, ferme toutes les figures
+    spec["draw"](spec["data"], **spec.get("params", {}))
+    plt.savefig(spec["file"], metadata={FINGERPRINT_KEY: fingerprint or figure_fingerprint(spec)}, **spec.get("save", {}))
+    plt.close('all')
+    return spec["file"]
+
+def _render_task(task):
+    return render_figure(*task)
+
+def render_figures(specs, jobs=1):
+    # Figures dont le PNG porte déjà la même empreinte : ignorées ; les autres rendues (pool de processus si jobs > 1)
+    # -> (nombre rendu, nombre repris tel quel)
+    tasks = []
+    for spec in specs:
+        fp = figure_fingerprint(spec)
+        if png_fingerprint(spec["file"]) != fp: tasks.append((spec, fp))
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool: list(pool.map(_render_task, tasks))
+    else:
+        for task in tasks: _render_task(task)
+    return len(tasks), len(specs) - len(tasks)
@@ -0,0 +1,164 @@
+# group_stats.py - Comparaisons de groupes (Novice vs Expert) de toutes les métriques et conditions en une passe
+# Effectifs, moyennes et SD par (condition, groupe) en un seul groupby ; toutes conditions confondues (Global) déduit
+# de ces mêmes sommes. Welch (t, ddl, p) et d de Cohen vectorisés. Les tableaux APA et Tableau_Significativite_Global.csv
+# d'analysis_master.py sont rendus à partir de ce seul résultat.
+# resampling_stats : p de permutation et IC bootstrap de la différence des moyennes au niveau des participants
+# (petits effectifs, non normaux).
+import zlib
+import warnings
+from math import comb
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+GLOBAL_CONDITION = "Global"              # Toutes conditions confondues
+CONTRASTS = [("Novice", "Expert")]       # (groupe 1, groupe 2) : différence = groupe 1 - groupe 2
+
+RESAMPLES = 10_000                       # Permutations et rééchantillonnages bootstrap par contraste
+RESAMPLE_SEED = 0
+RESAMPLE_CI = 95                         # IC percentile (%)
+RESAMPLE_CHUNK_CELLS = 4_000_000         # Taille max d'une matrice de tirages (tirages x participants)
+
+def describe_groups(df, metrics, condition_col="Task_Type", group_col="Group"):
+    # -> (conditions, groupes, n, moyenne, variance) ; tableaux [condition, groupe, métrique], Global en dernière condition.
+    # NaN ignorés métrique par métrique (comme dropna() colonne par colonne)
+    values = df[metrics].astype(float)
+    g = values.groupby([df[condition_col].astype(str), df[group_col].astype(str)], observed=True, sort=True).agg(['count', 'mean', 'var'])
+    conditions = sorted(g.index.get_level_values(0).unique()); groups = sorted(g.index.get_level_values(1).unique())
+    g = g.reindex(pd.MultiIndex.from_product([conditions, groups]))
+    shape = (len(conditions), len(groups), len(metrics))
+    n = np.nan_to_num(g.xs('count', axis=1, level=1)[metrics].to_numpy().reshape(shape))
+    mean = g.xs('mean', axis=1, level=1)[metrics].to_numpy().reshape(shape)
+    var = g.xs('var', axis=1, level=1)[metrics].to_numpy().reshape(shape)
+
+    # Global : combinaison des sommes par condition (moyenne pondérée, somme des carrés intra + inter)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n_all = n.sum(axis=0)
+        mean_all = np.where(n > 0, n * np.nan_to_num(mean), 0).sum(axis=0) / n_all
+        m2 = np.where(n > 1, (n - 1) * np.nan_to_num(var), 0) + np.where(n > 0, n * (np.nan_to_num(mean) - mean_all) ** 2, 0)
+        var_all = m2.sum(axis=0) / (n_all - 1)
+    var_all = np.where(n_all > 1, var_all, np.nan); mean_all = np.where(n_all > 0, mean_all, np.nan)
+    return (conditions + [GLOBAL_CONDITION], groups, np.concatenate([n, n_all[None]]),
+            np.concatenate([mean, mean_all[None]]), np.concatenate([var, var_all[None]]))
+
+def contrast_stats(df, metrics, condition_col="Task_Type", group_col="Group", contrasts=CONTRASTS):
+    # Une ligne par condition x contraste x métrique : N, M, SD des deux groupes, t et ddl de Welch, p bilatéral, d de Cohen
+    # (SD poolée ; 0 si moins de 3 essais au total ou SD nulle). Contraste dont un groupe est absent : ignoré
+    metrics = [m for m in metrics if m in df.columns]
+    conditions, groups, n, mean, var = describe_groups(df, metrics, condition_col, group_col)
+    frames = []
+    for a, b in contrasts:
+        if a not in groups or b not in groups: continue
+        i, j = groups.index(a), groups.index(b)
+        n1, n2, m1, m2, v1, v2 = n[:, i], n[:, j], mean[:, i], mean[:, j], var[:, i], var[:, j]
+        with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+            warnings.simplefilter("ignore")
+            t, p = stats.ttest_ind_from_stats(m1, np.sqrt(v1), n1, m2, np.sqrt(v2), n2, equal_var=False)
+            se1, se2 = v1 / n1, v2 / n2
+            ddl = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+            dof = n1 + n2 - 2
+            pool = np.sqrt(((n1 - 1) * v1 + (n2 - 1) * v2) / dof)
+            d = np.where((dof > 0) & (pool > 0), (m1 - m2) / pool, 0.0)
+        cond = np.repeat(conditions, len(metrics))
+        frames.append(pd.DataFrame({
+            "Condition": cond, "Groupe_1": a, "Groupe_2": b, "Metrique": np.tile(metrics, len(conditions)),
+            "N_1": n1.ravel().astype(int), "M_1": m1.ravel(), "SD_1": np.sqrt(v1).ravel(),
+            "N_2": n2.ravel().astype(int), "M_2": m2.ravel(), "SD_2": np.sqrt(v2).ravel(),
+            "t": np.asarray(t).ravel(), "ddl": ddl.ravel(), "p": np.asarray(p).ravel(), "d": d.ravel()}))
+    columns = ["Condition", "Groupe_1", "Groupe_2", "Metrique", "N_1", "M_1", "SD_1", "N_2", "M_2", "SD_2", "t", "ddl", "p", "d"]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+def _mean_diffs(labels, x0, w):
+    # labels (tirages, participants) : 1 = groupe 1 -> différence des moyennes (tirages, métriques) par produit matriciel
+    sa, ca = labels @ x0, labels @ w
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return sa / ca - (x0.sum(axis=0) - sa) / (w.sum(axis=0) - ca)
+
+def _exceedances(diff, observed):
+    # -> (tirages où |diff| >= |diff observée|, tirages valides) par métrique
+    ok = np.isfinite(diff)
+    return (ok & (np.abs(diff) >= np.abs(observed) * (1 - 1e-12))).sum(axis=0), ok.sum(axis=0)
+
+def _resample_chunk(task):
+    # Une tranche de tirages d'un contraste, toutes les métriques à la fois (x : moyennes par participant, NaN exclus
+    # métrique par métrique). -> (dépassements, permutations valides, différences bootstrap (tirages, métriques))
+    x, valid, is_a, observed, size, seed, permute = task
+    rng_perm, rng_boot = (np.random.default_rng(s) for s in seed.spawn(2))
+    x0 = np.where(valid, x, 0.0); w = valid.astype(float)
+
+    # Permutations des étiquettes de groupe entre participants (sauté si toutes les répartitions sont énumérées)
+    exceed, n_ok = np.zeros(x.shape[1], int), np.zeros(x.shape[1], int)
+    if permute: exceed, n_ok = _exceedances(_mean_diffs(rng_perm.permuted(np.tile(is_a.astype(float), (size, 1)), axis=1), x0, w), observed)
+
+    # Bootstrap : participants tirés avec remise dans chaque groupe (matrices (tirages, participants) d'indices),
+    # convertis en nombre de tirages de chaque participant -> sommes de toutes les métriques par produit matriciel
+    means = []; offsets = (np.arange(size) * len(x))[:, None]
+    for rows in (np.flatnonzero(is_a), np.flatnonzero(~is_a)):
+        idx = rows[rng_boot.integers(0, len(rows), size=(size, len(rows)))]
+        counts = np.bincount((offsets + idx).ravel(), minlength=size * len(x)).reshape(size, len(x)).astype(float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means.append((counts @ x0) / (counts @ w))
+    return exceed, n_ok, means[0] - means[1]
+
+def resampling_stats(df, metrics, condition_col="Task_Type", group_col="Group", subject_col="ID", contrasts=CONTRASTS,
+                     n_resamples=RESAMPLES, seed=RESAMPLE_SEED, ci=RESAMPLE_CI, jobs=1):
+    # Une ligne par condition (dont Global) x contraste x métrique : différence des moyennes, p de permutation bilatéral
+    # et IC percentile bootstrap de la différence. Unité statistique = le participant (essais d'un même participant
+    # non indépendants, Be constant par participant) : chaque participant est résumé par sa moyenne, les étiquettes de
+    # groupe sont permutées entre participants et le bootstrap tire des participants.
+    # Répartitions possibles <= n_resamples : toutes énumérées, p exact = dépassements / répartitions (4 vs 4 :
+    # 70 répartitions, p minimal 2/70) ; sinon permutations aléatoires, p = (1 + dépassements) / (1 + permutations).
+    # Tirages par tranches (RESAMPLE_CHUNK_CELLS) ; graine de chaque tranche dérivée de seed, de la condition et du
+    # contraste : mêmes résultats quel que soit jobs (tranches réparties sur un pool de processus si jobs > 1)
+    metrics = [m for m in metrics if m in df.columns]
+    cond = df[condition_col].astype(str).to_numpy(); grp = df[group_col].astype(str).to_numpy()
+    subj = df[subject_col].astype(str).to_numpy()
+    values = df[metrics].to_numpy(dtype=float)
+    keys, tasks = [], []
+    for condition in sorted(set(cond)) + [GLOBAL_CONDITION]:
+        in_cond = np.ones(len(df), bool) if condition == GLOBAL_CONDITION else cond == condition
+        for a, b in contrasts:
+            rows = in_cond & np.isin(grp, [a, b])
+            if not rows.any(): continue
+            # Moyenne de chaque participant (NaN ignorés) et son groupe
+            codes = pd.factorize(subj[rows])[0]
+            x = pd.DataFrame(values[rows]).groupby(codes).mean().to_numpy()
+            is_a = pd.Series(grp[rows]).groupby(codes).first().to_numpy() == a
+            if not is_a.any() or is_a.all(): continue
+            valid = ~np.isnan(x)
+            with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+                warnings.simplefilter("ignore", RuntimeWarning)
+                observed = np.nanmean(x[is_a], axis=0) - np.nanmean(x[~is_a], axis=0)
+
+            exact = None
+            if comb(len(x), int(is_a.sum())) <= n_resamples:
+                labels = np.zeros((comb(len(x), int(is_a.sum())), len(x)))
+                for r, members in enumerate(combinations(range(len(x)), int(is_a.sum()))): labels[r, list(members)] = 1
+                exact = _exceedances(_mean_diffs(labels, np.where(valid, x, 0.0), valid.astype(float)), observed)
+            size = max(1, RESAMPLE_CHUNK_CELLS // len(x))
+            sizes = [min(size, n_resamples - b0) for b0 in range(0, n_resamples, size)]
+            seeds = np.random.SeedSequence([seed, zlib.crc32(f"{condition}|{a}|{b}".encode())]).spawn(len(sizes))
+            keys.append((condition, a, b, observed, len(sizes), exact, len(x)))
+            tasks.extend((x, valid, is_a, observed, n, s, exact is None) for n, s in zip(sizes, seeds))
+
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool: chunks = list(pool.map(_resample_chunk, tasks))
+    else: chunks = list(map(_resample_chunk, tasks))
+
+    frames, alpha = [], (100 - ci) / 2
+    for condition, a, b, observed, n_chunks, exact, n_subjects in keys:
+        part, chunks = chunks[:n_chunks], chunks[n_chunks:]
+        boot = np.concatenate([c[2] for c in part])
+        if exact is not None: exceed, n_ok = exact; p_perm = exceed / np.maximum(n_ok, 1)
+        else:
+            exceed = sum(c[0] for c in part); n_ok = sum(c[1] for c in part); p_perm = (1 + exceed) / (1 + n_ok)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)     # Métrique sans aucune valeur dans un groupe -> NaN
+            low, high = np.nanpercentile(boot, [alpha, 100 - alpha], axis=0)
+        frames.append(pd.DataFrame({
+            "Condition": condition, "Groupe_1": a, "Groupe_2": b, "Metrique": metrics, "N_Sujets": n_subjects, "Diff": observed,
+            "p_perm": np.where(np.isfinite(observed) & (n_ok > 0), p_perm, np.nan), "IC_Low": low, "IC_High": high}))
+    columns = ["Condition", "Groupe_1", "Groupe_2", "Metrique", "N_Sujets", "Diff", "p_perm", "IC_Low", "IC_High"]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
@@ -0,0 +1,53 @@
+# Tests de columnar_store.ColumnStore : ajout par essai, retour à un nombre de lignes validé, relecture
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sources", "Passation_Test"))
+from columnar_store import ColumnStore, read_frame, iter_frames, is_store
+
+def trial(bloc, n, start=0.0):
+    return {"Bloc": np.full(n, bloc), "Trial_in_Bloc": np.full(n, 1, dtype=np.int16),
+            "Time_Abs": start + np.arange(n) / 120.0, "X": np.linspace(0, 1, n)}
+
+def test_append_and_load_round_trip():
+    path = os.path.join(tempfile.mkdtemp(), "P_RAW.cols")
+    ColumnStore(path).append(trial("VP_FB", 4)).append(trial("FVP_NoFB", 3, start=1e5))
+    store = ColumnStore(path)
+    assert is_store(path) and store.rows == 7
+    frame = read_frame(path)
+    assert list(frame['Bloc']) == ["VP_FB"] * 4 + ["FVP_NoFB"] * 3
+    assert frame['X'].dtype == np.float32 and frame['Time_Abs'].dtype == np.float64
+    assert frame['Time_Abs'].iloc[-1] == 1e5 + 2 / 120.0       # Horodatage absolu gardé en float64
+    assert [len(c) for c in iter_frames(path, 3)] == [3, 3, 1]
+
+def test_truncate_to_committed_rows_then_append():
+    path = os.path.join(tempfile.mkdtemp(), "P_RAW.cols")
+    ColumnStore(path).append(trial("VP_FB", 5)).append(trial("VP_FB", 5))
+    ColumnStore(path).truncate(5)
+    assert ColumnStore(path).rows == 5
+    for name in ("Bloc", "X", "Time_Abs"): assert len(np.load(os.path.join(path, f"{name}.npy"))) == 5
+    ColumnStore(path).append(trial("FVP_FB", 2))
+    assert list(read_frame(path)['Bloc']) == ["VP_FB"] * 5 + ["FVP_FB"] * 2
+
+def test_bytes_past_rows_are_ignored():
+    # Ajout interrompu avant la mise à jour du schéma : "rows" fait foi
+    path = os.path.join(tempfile.mkdtemp(), "P_RAW.cols")
+    ColumnStore(path).append(trial("VP_FB", 4))
+    with open(os.path.join(path, "X.npy"), "ab") as f: f.write(np.zeros(3, dtype=np.float32).tobytes())
+    assert len(ColumnStore(path).load()["X"]) == 4
+
+def test_append_with_other_columns_is_refused():
+    path = os.path.join(tempfile.mkdtemp(), "P_RAW.cols")
+    ColumnStore(path).append(trial("VP_FB", 4))
+    with pytest.raises(ValueError): ColumnStore(path).append({**trial("VP_FB", 2), "X_Tilt": np.zeros(2)})
+    assert ColumnStore(path).rows == 4
+
+def test_write_replaces_the_whole_table():
+    path = os.path.join(tempfile.mkdtemp(), "P_CLEAN.cols")
+    ColumnStore.write(path, pd.DataFrame(trial("VP_FB", 6)))
+    ColumnStore.write(path, pd.DataFrame(trial("VP_FB", 2)))
+    assert ColumnStore(path).rows == 2 and not os.path.exists(path + ".tmp")
@@ -0,0 +1,38 @@
+# Tests de group_stats.resampling_stats : unité statistique = le participant (pas l'essai)
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sources", "Process_Stat"))
+from group_stats import resampling_stats
+
+def design_4_vs_4(trials_per_subject):
+    # 4 novices / 4 experts parfaitement séparés ; Be constant par participant, IPe bruité d'un essai à l'autre
+    rng = np.random.default_rng(0); rows = []
+    for s in range(8):
+        group = "Novice" if s < 4 else "Expert"
+        for _ in range(trials_per_subject):
+            rows.append({"ID": f"P{s}", "Group": group, "Task_Type": "VP", "Be": 0.1 * s,
+                         "IPe": (1.0 if s < 4 else 3.0) + rng.normal(0, 0.1)})
+    return pd.DataFrame(rows)
+
+def test_smallest_p_for_4_vs_4_is_two_over_70():
+    res = resampling_stats(design_4_vs_4(30), ["Be", "IPe"], n_resamples=10_000)
+    assert (res["N_Sujets"] == 8).all()
+    # Séparation complète : seules la répartition observée et son miroir atteignent |diff| -> p exact 2/70
+    assert np.allclose(res["p_perm"], 2 / 70)
+
+def test_more_trials_do_not_lower_p():
+    few = resampling_stats(design_4_vs_4(2), ["IPe"], n_resamples=10_000)
+    many = resampling_stats(design_4_vs_4(200), ["IPe"], n_resamples=10_000)
+    assert np.allclose(few["p_perm"], many["p_perm"])
+
+def test_random_permutations_respect_the_minimum():
+    # Moins de tirages que de répartitions : permutations aléatoires, jamais en dessous de 1 / (1 + tirages)
+    res = resampling_stats(design_4_vs_4(5), ["IPe"], n_resamples=50, seed=1)
+    assert (res["p_perm"] >= 1 / 51).all() and (res["p_perm"] <= 1).all()
+
+def test_bootstrap_interval_contains_difference():
+    res = resampling_stats(design_4_vs_4(10), ["IPe"], n_resamples=2_000)
+    assert ((res["IC_Low"] <= res["Diff"]) & (res["Diff"] <= res["IC_High"])).all()
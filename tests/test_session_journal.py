@@ -0,0 +1,69 @@
+# Tests de session_journal + trial_writer : reprise après crash (ligne tronquée, retour aux tailles validées)
+import os
+import sys
+import json
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sources", "Passation_Test"))
+from session_journal import SessionJournal
+from trial_writer import TrialWriter
+from columnar_store import ColumnStore
+
+SCORES_HEADER = ["ID", "Trial_in_Bloc", "MT"]
+N_SAMPLES = 50
+
+def write_trial(writer, journal, i, commit=True):
+    # Un essai : RAW en table colonne + ligne de SCORES, puis validation dans le journal
+    writer.submit_columns("P_RAW.cols", {"Trial_in_Bloc": np.full(N_SAMPLES, i + 1), "X": np.arange(N_SAMPLES, dtype=float)})
+    writer.submit("P_SCORES.csv", SCORES_HEADER, [["P", i + 1, 1.5 + i]])
+    if commit: writer.commit(journal.name, {"Event": "trial", "Seq_Index": i})
+
+def start_session(out_dir):
+    journal = SessionJournal(out_dir, "P")
+    journal.write(journal.start_record([{"Task": "VP", "Trial_in_Block": k + 1} for k in range(4)], {"ID": "P"}))
+    return journal, TrialWriter(out_dir)
+
+def test_restore_after_torn_third_trial():
+    out_dir = os.path.join(tempfile.mkdtemp(), "raw")       # Dossier absent : créé par le journal
+    journal, writer = start_session(out_dir)
+    write_trial(writer, journal, 0); write_trial(writer, journal, 1); writer.flush()
+    scores_size = os.path.getsize(os.path.join(out_dir, "P_SCORES.csv"))
+    # Crash pendant le 3e essai : données écrites mais pas validées, dernière ligne du journal coupée
+    write_trial(writer, journal, 2, commit=False); writer.close()
+    with open(journal.path, "a") as f: f.write('{"Event": "trial", "Seq_In')
+    assert ColumnStore(os.path.join(out_dir, "P_RAW.cols")).rows == 3 * N_SAMPLES
+
+    resumed = SessionJournal(out_dir, "P"); state = resumed.load()
+    assert state["next_index"] == 2 and len(state["sequence"]) == 4 and not state["finished"]
+    truncated = resumed.restore(state)
+    assert sorted(truncated) == ["P_RAW.cols", "P_SCORES.csv"]
+    raw = ColumnStore(os.path.join(out_dir, "P_RAW.cols"))
+    assert raw.rows == 2 * N_SAMPLES and list(raw.load()["Trial_in_Bloc"][-N_SAMPLES:]) == [2] * N_SAMPLES
+    assert os.path.getsize(os.path.join(out_dir, "P_SCORES.csv")) == scores_size
+    assert open(journal.path, "rb").read().endswith(b"\n")
+    assert SessionJournal(out_dir, "P").load()["next_index"] == 2
+
+def test_files_of_previous_sessions_are_kept():
+    out_dir = tempfile.mkdtemp()
+    with open(os.path.join(out_dir, "P_NOTES.csv"), "w") as f: f.write("note\n")
+    journal, writer = start_session(out_dir)
+    write_trial(writer, journal, 0); writer.close()
+    journal = SessionJournal(out_dir, "P"); journal.restore(journal.load())
+    assert open(os.path.join(out_dir, "P_NOTES.csv")).read() == "note\n"
+
+def test_commit_records_sizes_of_data_written_before_it():
+    out_dir = tempfile.mkdtemp()
+    journal, writer = start_session(out_dir)
+    write_trial(writer, journal, 0); write_trial(writer, journal, 1, commit=False); writer.close()
+    trial = [json.loads(line) for line in open(journal.path)][-1]
+    assert trial["Event"] == "trial" and trial["Sizes"]["P_RAW.cols"] == N_SAMPLES     # Essai 2 soumis après : non compté
+
+def test_failed_write_is_not_committed():
+    out_dir = tempfile.mkdtemp()
+    with open(os.path.join(out_dir, "P_SCORES.csv"), "w") as f: f.write("ID,MT\nP,1.0\n")     # Ancien en-tête
+    journal, writer = start_session(out_dir)
+    write_trial(writer, journal, 0); writer.close()
+    assert [name for name, _ in writer.errors] == ["P_SCORES.csv", journal.name]
+    assert [json.loads(line)["Event"] for line in open(journal.path)] == ["start"]
+    assert SessionJournal(out_dir, "P").load()["next_index"] == 0
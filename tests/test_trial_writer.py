@@ -0,0 +1,40 @@
+# Tests de trial_writer.TrialWriter : écriture en arrière-plan, ordre des demandes, en-têtes CSV
+import os
+import sys
+import csv
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sources", "Passation_Test"))
+from trial_writer import TrialWriter
+
+def read_rows(path):
+    with open(path, newline='') as f: return list(csv.reader(f))
+
+def test_header_written_once_and_rows_in_submission_order():
+    out_dir = tempfile.mkdtemp()
+    writer = TrialWriter(out_dir)
+    samples = np.array([(0.0, 1.0), (0.5, 2.0)], dtype=[("Time_Rel", "f8"), ("X", "f8")])
+    for trial in (1, 2, 3):
+        writer.submit("P_RAW.csv", ["ID", "Trial", "Time_Rel", "X"], samples, prefix=["P", trial])
+    writer.submit_text("P_TUNNEL.jsonl", ['{"Trial": 1}', '{"Trial": 2}'])
+    writer.close()
+    rows = read_rows(os.path.join(out_dir, "P_RAW.csv"))
+    assert rows[0] == ["ID", "Trial", "Time_Rel", "X"] and len(rows) == 1 + 3 * len(samples)
+    assert [r[1] for r in rows[1:]] == ["1", "1", "2", "2", "3", "3"]
+    assert open(os.path.join(out_dir, "P_TUNNEL.jsonl")).read().splitlines() == ['{"Trial": 1}', '{"Trial": 2}']
+    assert writer.errors == []
+
+def test_existing_file_is_continued_by_a_new_writer():
+    out_dir = tempfile.mkdtemp()
+    for mt in (1.0, 2.0):
+        writer = TrialWriter(out_dir); writer.submit("P_SCORES.csv", ["ID", "MT"], [["P", mt]]); writer.close()
+    assert read_rows(os.path.join(out_dir, "P_SCORES.csv")) == [["ID", "MT"], ["P", "1.0"], ["P", "2.0"]]
+
+def test_csv_with_an_older_header_is_not_appended_to():
+    out_dir = tempfile.mkdtemp(); path = os.path.join(out_dir, "P_RAW.csv")
+    with open(path, "w") as f: f.write("ID,Time_Rel,X\nP,0.0,1.0\n")      # Ancien format, sans X_Tilt
+    writer = TrialWriter(out_dir)
+    writer.submit("P_RAW.csv", ["ID", "Time_Rel", "X", "X_Tilt"], [["P", 0.1, 2.0, 0.3]]); writer.close()
+    assert read_rows(path) == [["ID", "Time_Rel", "X"], ["P", "0.0", "1.0"]]
+    assert [name for name, _ in writer.errors] == ["P_RAW.csv"]